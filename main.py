@@ -3,15 +3,24 @@ Contact Automation System - Main CLI Entry Point
 """
 import sys
 import argparse
+from datetime import datetime, timezone
 from pathlib import Path
 
+from googleapiclient.errors import HttpError
+
 from services.auth_service import configure
+from services.beat_cache_service import AttachmentStore, BeatFileCache
 from services.database_service import DatabaseService
 from services.google_drive_service import GoogleDriveService
 from services.beat_parser_service import BeatParser
 from services.beat_selection_service import BeatSelectionService
 from services.email_template_service import EmailTemplateService
 from services.gmail_service import GmailService
+from services.pack_planner_service import PackPlanner
+from services.prefetch_service import BeatPrefetcher
+from services.send_executor_service import SendExecutor
+from services.spool_service import MessageSpool
+from services.vault_sync_service import VaultSyncService
 from utils.logger import setup_logger
 
 logger = setup_logger(__name__)
@@ -33,11 +42,7 @@ def cmd_list_artists():
 
     # Sync to database for later use
     db = DatabaseService()
-    for a in artists:
-        try:
-            db.add_artist(a["name"], a["email"])
-        except Exception:
-            pass  # already exists
+    db.upsert_artists(artists)
     db.close()
 
     try:
@@ -70,7 +75,7 @@ def cmd_show_history(limit: int = 50):
             rows.append([
                 h.get("artist_name", ""),
                 h.get("artist_email", ""),
-                h["timestamp"][:19] if h.get("timestamp") else "",
+                datetime.fromtimestamp(h["sent_at"]).strftime("%Y-%m-%d %H:%M:%S"),
                 h["pack_number"],
                 beats_str,
                 h["status"],
@@ -84,12 +89,15 @@ def cmd_show_history(limit: int = 50):
     return 0
 
 
-def cmd_check_beats():
+def cmd_check_beats(full_sync: bool = False):
     """List all beats in vault and show which need filename formatting."""
-    print("\n[INFO] Fetching beat files from vault...")
+    print("\n[INFO] Syncing beat files from vault...")
     try:
         drive = GoogleDriveService()
-        files = drive.list_beat_files()
+        db = DatabaseService()
+        VaultSyncService(drive, db).sync(full=full_sync)
+        files = db.get_vault_files()
+        db.close()
     except Exception as e:
         print(f"[ERROR] Failed to fetch beats: {e}")
         return 1
@@ -163,76 +171,161 @@ def _suggest_beat_rename(filename: str):
     return None
 
 
-def cmd_send_beats(dry_run: bool = False):
-    """Send beat packs to all artists."""
+def _pack_message_id(entry: dict, part: int) -> str:
+    """Deterministic Message-ID for one email of an outbox entry.
+
+    A send interrupted by a crash can be found again by this ID.
+    """
+    # Same digits as the former CURRENT_TIMESTAMP text, so IDs survive the
+    # epoch migration
+    created_at = datetime.fromtimestamp(entry["created_at"], timezone.utc)
+    created = created_at.strftime("%Y%m%d%H%M%S")
+    pack = f"{entry['artist_id']}-{entry['pack_number']}-{part}"
+    return f"<pack-{pack}.{entry['id']}.{created}@contact-automation>"
+
+
+def _recover_sent_parts(gmail, db, entry: dict, parts) -> bool:
+    """
+    Look up parts an interrupted run may have sent and record the ones found.
+
+    Args:
+        gmail: GmailService
+        db: DatabaseService
+        entry: Outbox entry left in 'composing' (or held for review)
+        parts: Part numbers not yet recorded as sent
+
+    Returns:
+        False if the sent state could not be checked; the entry is then held
+        as 'needs_review' and must not be sent again
+    """
+    for n in parts:
+        try:
+            found = gmail.find_sent_message(_pack_message_id(entry, n))
+        except HttpError as error:
+            logger.error(
+                f"Could not check whether pack #{entry['pack_number']} "
+                f"part {n} was sent: {error}"
+            )
+            db.mark_outbox_needs_review(
+                entry["id"], f"Sent state of part {n} unknown: {error}"
+            )
+            return False
+        if found:
+            db.mark_outbox_part_sent(entry["id"], n, found)
+            entry["sent_parts"][n] = found
+    return True
+
+
+def _release_dropped_packs(db, plan, dropped) -> int:
+    """
+    Return packs whose queued sends were all dropped on abort to the queue.
+
+    Args:
+        db: DatabaseService
+        plan: Send plan the job IDs index into
+        dropped: (pack index, part) job IDs returned by SendExecutor.shutdown
+
+    Returns:
+        Number of packs put back to 'planned'
+    """
+    released = 0
+    for i in sorted({i for i, _ in dropped}):
+        # Packs with a part already sent stay 'composing' for recovery on resume
+        if db.release_outbox_entry(plan[i]["outbox"]["id"]):
+            released += 1
+    if released:
+        logger.info(f"Returned {released} unsent pack(s) to the queue")
+    return released
+
+
+def cmd_send_beats(dry_run: bool = False, full_sync: bool = False, delivery: str = None,
+                   resume: bool = False, compose_only: bool = False,
+                   spooled_only: bool = False):
+    """
+    Send beat packs to all artists.
+
+    With resume, only packs already queued in the outbox are finished. With
+    compose_only, messages are built into the spool instead of sent; with
+    spooled_only (drain-spool), only queued packs that have spooled messages
+    are sent.
+    """
     print("\n" + "=" * 60)
     print("Contact Automation - Send Beats")
     print("=" * 60)
 
     if dry_run:
         print("[DRY RUN] No emails will be sent.\n")
+    elif compose_only:
+        print(
+            "[COMPOSE ONLY] Messages are written to the spool; "
+            "send them with drain-spool.\n"
+        )
 
     try:
-        drive = GoogleDriveService()
+        drive = GoogleDriveService(cache=BeatFileCache.from_config())
+        attachment_store = AttachmentStore.from_config(drive)
         db = DatabaseService()
         beat_selector = BeatSelectionService.from_config(db)
         email_tpl = EmailTemplateService()
+        planner = PackPlanner.from_config()
+        spool = MessageSpool.from_config()
         config_path = Path(__file__).parent / "config" / "config.yaml"
         import yaml
         with open(config_path, "r") as f:
             config = yaml.safe_load(f)
         subject_tpl = config["email"]["subject_template"]
         agreement_path = Path(__file__).parent / config["email"]["agreement_path"]
+        prefetch_ahead = (config.get("downloads") or {}).get("artists_ahead", 3)
+        delivery = delivery or config["email"].get("delivery_mode", "attachments")
+        grant_link_access = config["email"].get("grant_link_access", False)
+        outbox_config = config.get("outbox") or {}
+        retry_base = outbox_config.get("retry_base_seconds", 300)
+        retry_max = outbox_config.get("max_retry_seconds", 6 * 3600)
+        db_config = config.get("database") or {}
+        group_packs = db_config.get("group_commit_packs", 20)
+        group_seconds = db_config.get("group_commit_seconds", 5)
     except Exception as e:
         print(f"[ERROR] Initialization failed: {e}")
         return 1
 
-    # 1. Fetch artists
-    print("[1/5] Fetching artists...")
-    try:
-        artists = drive.get_folder_permissions()
-    except Exception as e:
-        print(f"[ERROR] Failed to fetch artists: {e}")
-        return 1
-    if not artists:
-        print("[WARN] No artists found. Exiting.")
-        return 0
-
-    for a in artists:
+    artists = []
+    if resume:
+        # Queued packs already hold their beats, so Drive listing and sync are skipped
+        print("[1/5] Resuming queued packs (artist fetch skipped)...")
+        print("[2/5] Vault sync skipped.")
+    else:
+        # 1. Fetch artists
+        print("[1/5] Fetching artists...")
         try:
-            db.add_artist(a["name"], a["email"])
-        except Exception:
-            pass
-    print(f"      Found {len(artists)} artists.")
-
-    # 2. Fetch and sync beats
-    print("[2/5] Fetching beats from vault...")
-    try:
-        drive_files = drive.list_beat_files()
-    except Exception as e:
-        print(f"[ERROR] Failed to list beats: {e}")
-        return 1
-    if not drive_files:
-        print("[ERROR] No MP3 files found in vault.")
-        return 1
-
-    file_id_by_name = {f["name"]: f["id"] for f in drive_files}
-    for f in drive_files:
-        parsed = BeatParser.parse_filename(f["name"])
-        if parsed:
-            try:
-                db.add_beat(
-                    filename=f["name"],
-                    beat_name=parsed["beat_name"],
-                    bpm=BeatParser.parse_bpm(parsed["bpm"]),
-                    key=parsed.get("key"),
-                    style_category=parsed.get("style_category"),
-                    file_type=parsed.get("file_type", "mp3"),
-                    file_size=int(f["size"]) if f.get("size") else None,
-                )
-            except Exception:
-                pass
-    print(f"      Found {len(drive_files)} beats.")
+            artists = drive.get_folder_permissions()
+        except Exception as e:
+            print(f"[ERROR] Failed to fetch artists: {e}")
+            return 1
+        if not artists:
+            print("[WARN] No artists found. Exiting.")
+            return 0
+
+        synced = db.upsert_artists(artists)
+        print(
+            f"      Found {len(artists)} artists "
+            f"({synced['inserted']} new, {synced['revoked']} revoked)."
+        )
+
+        # 2. Sync beats (incremental via the Drive changes feed)
+        print("[2/5] Syncing beats from vault...")
+        try:
+            counts = VaultSyncService(drive, db).sync(full=full_sync)
+        except Exception as e:
+            print(f"[ERROR] Failed to sync beats: {e}")
+            return 1
+        beat_count = len(db.get_all_beats())
+        if not beat_count:
+            print("[ERROR] No MP3 files found in vault.")
+            return 1
+        print(
+            f"      {beat_count} beats ({counts['added']} added, "
+            f"{counts['updated']} updated, {counts['removed']} removed)."
+        )
 
     # 3. Load agreement
     print("[3/5] Loading Beat Agreement...")
@@ -243,64 +336,339 @@ def cmd_send_beats(dry_run: bool = False):
         agreement_content = agreement_path.read_text(encoding="utf-8").encode("utf-8")
     print("      Done.")
 
-    # 4. Gmail service (only if not dry run)
+    # 4. Gmail service (only if sending)
     gmail = None
-    if not dry_run:
+    if not dry_run and not compose_only:
         try:
             gmail = GmailService.from_config()
         except Exception as e:
             print(f"[ERROR] Gmail init failed: {e}")
             return 1
 
-    # 5. Send to each artist
+    # 5. Plan every pack up front so downloads can run ahead of the send loop
     print("[4/5] Preparing and sending emails...")
+    use_links = delivery == "links"
+    agreement_filename = "Beat_Usage_Agreement.txt"
+    agreement_bytes = planner.beat_bytes(
+        {"filename": agreement_filename, "file_size": len(agreement_content)}
+    )
     results = []
-    for i, a in enumerate(artists):
-        artist = db.get_artist_by_email(a["email"])
-        if not artist:
+    plan = []
+
+    # Everything the plan needs is loaded up front: a fixed number of queries
+    # for any artist count
+    beats_by_id = db.get_beats_map()
+    artists_by_email = db.get_artists_by_emails(a["email"] for a in artists)
+    recently_sent = db.get_recently_sent_beats_for_all(
+        (artist["id"] for artist in artists_by_email.values()),
+        days=beat_selector.duplicate_prevention_days,
+    )
+
+    # Unfinished packs from earlier runs go first, with the beats they were planned with
+    def known_beats(ids):
+        return [beats_by_id[bid] for bid in ids if bid in beats_by_id]
+
+    queued_artists = set()
+    for entry in db.get_pending_outbox():
+        queued_artists.add(entry["artist_id"])
+        if not entry["due"]:
+            results.append((
+                entry["artist_name"], entry["artist_email"], "RETRY",
+                f"Pack #{entry['pack_number']} backing off: {entry['error_message']}",
+            ))
+            continue
+        plan.append({
+            "name": entry["artist_name"],
+            "email": entry["artist_email"],
+            "artist_id": entry["artist_id"],
+            "pack_number": entry["pack_number"],
+            "beat_ids": entry["beat_ids"],
+            "pack": {
+                "beats": known_beats(entry["beat_ids"]),
+                "messages": [known_beats(part) for part in entry["parts"]],
+                "linked": known_beats(entry["linked"]),
+            },
+            "outbox": entry,
+            # Set when a crash hit after history was written but before the entry closed
+            "recorded": entry["last_pack_number"] >= entry["pack_number"],
+        })
+    if spooled_only:
+        spooled_ids = {outbox_id for outbox_id, _ in spool.records()}
+        plan = [item for item in plan if item["outbox"]["id"] in spooled_ids]
+    if plan:
+        print(f"      Resuming {len(plan)} queued pack(s).")
+
+    # Every new pack is selected in one batch
+    selected = beat_selector.select_packs(
+        [
+            artist["id"] for artist in artists_by_email.values()
+            if artist["id"] not in queued_artists
+        ],
+        recently_sent,
+    )
+
+    for a in artists:
+        artist = artists_by_email.get(a["email"])
+        if not artist or artist["id"] in queued_artists:
             continue
         artist_id = artist["id"]
         pack_number = artist["last_pack_number"] + 1
-        beat_ids = beat_selector.select_beats_for_artist(artist_id)
+        beat_ids = selected[artist_id]
         if not beat_ids:
             results.append((a["name"], a["email"], "SKIP", "No beats selected"))
             continue
-
-        beats_data = db.get_beats_by_ids(beat_ids)
-        beat_names = [b["beat_name"] for b in beats_data]
-        body = email_tpl.generate_body(a["name"], beat_names)
-        subject = subject_tpl.replace("{pack_number}", str(pack_number))
-
-        if dry_run:
-            results.append((a["name"], a["email"], "DRY", f"Pack #{pack_number}, {len(beat_ids)} beats"))
-            continue
-
-        # Build attachments: agreement + beat files
-        attachments = [{"filename": "Beat_Usage_Agreement.txt", "content": agreement_content}]
-        for b in beats_data:
-            fn = b["filename"]
-            fid = file_id_by_name.get(fn)
-            if fid:
-                try:
-                    content = drive.download_file(fid)
-                    attachments.append({"filename": fn, "content": content})
-                except Exception as ex:
-                    logger.warning(f"Could not download {fn}: {ex}")
-
-        sent_id = gmail.send_email(to=a["email"], subject=subject, body=body, attachments=attachments)
-        if sent_id:
-            db.add_email_history(artist_id, pack_number, beat_ids, "sent")
-            for bid in beat_ids:
-                db.add_artist_beat_history(artist_id, bid)
-            db.update_artist_pack_number(artist_id, pack_number)
-            results.append((a["name"], a["email"], "SENT", f"Pack #{pack_number}"))
+        beats_data = [beats_by_id[bid] for bid in beat_ids]
+        if use_links:
+            pack = {
+                "delivery": "links", "beats": beats_data, "messages": [[]],
+                "linked": list(beats_data),
+            }
         else:
-            db.add_email_history(artist_id, pack_number, beat_ids, "failed", "Send failed")
-            results.append((a["name"], a["email"], "FAIL", "Send failed"))
-
-        gmail.apply_rate_limit(i)
+            # Checked on stored file sizes, so oversized packs are fixed pre-download
+            alternatives = None
+            too_big = not planner.fits(beats_data, agreement_bytes)
+            if planner.strategy == "repick" and too_big:
+                alternatives = beat_selector.get_alternative_beats(
+                    artist_id, beat_ids, recently_sent[artist_id]
+                )
+            pack = planner.plan(beats_data, agreement_bytes, alternatives)
+            beat_ids = [b["id"] for b in pack["beats"]]
+        entry = None
+        if not dry_run:
+            # Written before any send, so a crash leaves a resumable record
+            entry = db.add_outbox_entry(
+                artist_id, pack_number, beat_ids,
+                [[b["id"] for b in part] for part in pack["messages"]],
+                [b["id"] for b in pack["linked"]],
+            )
+        plan.append({
+            "name": a["name"],
+            "email": a["email"],
+            "artist_id": artist_id,
+            "pack_number": pack_number,
+            "beat_ids": beat_ids,
+            "pack": pack,
+            "outbox": entry,
+            "recorded": False,
+        })
+
+    if use_links:
+        print("      Delivery: Drive links (no MP3 attachments)")
+    sender = None if gmail is None else SendExecutor(gmail, workers=gmail.send_workers)
+    # Pack bookkeeping is committed in groups; the outbox already tracks every sent part
+    bookkeeping = db.group_commit(group_packs, group_seconds)
+
+    # A split pack only counts as sent once every part went out
+    pending_parts = {}
+
+    def finish_pack(item):
+        """History bookkeeping for a fully sent pack, then close its outbox entry."""
+        if item["recorded"]:
+            db.mark_outbox_sent(item["outbox"]["id"])
+        else:
+            bookkeeping.record_pack_sent(
+                item["artist_id"], item["pack_number"], item["beat_ids"],
+                outbox_id=item["outbox"]["id"],
+            )
+        spool.discard_entry(item["outbox"]["id"])
+        results.append(
+            (item["name"], item["email"], "SENT", f"Pack #{item['pack_number']}")
+        )
+
+    def record_result(result):
+        """Bookkeeping for a finished send, run on the main thread."""
+        i, n = result["job_id"]
+        item = plan[i]
+        state = pending_parts[i]
+        state["remaining"] -= 1
+        if result["message_id"]:
+            db.mark_outbox_part_sent(item["outbox"]["id"], n, result["message_id"])
+            spool.remove(item["outbox"]["id"], n)
+        else:
+            state["errors"].append(result["error"])
+        if state["remaining"]:
+            return
+        if not state["errors"]:
+            finish_pack(item)
+        else:
+            error = "; ".join(state["errors"])
+            attempts = item["outbox"]["attempts"] + 1
+            retry_in = min(retry_max, retry_base * 2 ** (attempts - 1))
+            bookkeeping.record_pack_sent(
+                item["artist_id"], item["pack_number"], item["beat_ids"],
+                status="failed", error_message=error,
+                outbox_id=item["outbox"]["id"], retry_in_seconds=retry_in,
+            )
+            results.append((
+                item["name"], item["email"], "FAIL", f"{error} (retry in {retry_in}s)",
+            ))
+
+    def unsent_parts(item):
+        sent = item["outbox"]["sent_parts"] if item["outbox"] else {}
+        parts = enumerate(item["pack"]["messages"], start=1)
+        return [(n, part) for n, part in parts if n not in sent]
+
+    def parts_to_build(item):
+        # Parts already sent or composed in the spool are never downloaded again
+        todo = unsent_parts(item)
+        if item["outbox"]:
+            outbox_id = item["outbox"]["id"]
+            todo = [(n, part) for n, part in todo if not spool.has(outbox_id, n)]
+        return todo
+
+    def prefetch_pack(item):
+        for _, part in parts_to_build(item):
+            for b in part:
+                if b.get("drive_file_id"):
+                    prefetcher.prefetch(
+                        b["drive_file_id"], b.get("modified_time"), b.get("file_size")
+                    )
+
+    needs_downloads = not dry_run and any(
+        part for item in plan for _, part in parts_to_build(item)
+    )
+    prefetcher = None
+    if needs_downloads:
+        prefetcher = BeatPrefetcher.from_config(attachment_store.get)
 
+    try:
+        for i, item in enumerate(plan):
+            pack = item["pack"]
+            beats_data = pack["beats"]
+            beat_names = [b["beat_name"] for b in beats_data]
+            beat_links = None
+            if pack["linked"]:
+                # Only beats that are not attached get a Drive link
+                beat_links = [
+                    (b["beat_name"], drive.get_file_link(b["drive_file_id"]))
+                    for b in pack["linked"] if b.get("drive_file_id")
+                ]
+            body = email_tpl.generate_body(item["name"], beat_names, beat_links)
+            subject = subject_tpl.replace("{pack_number}", str(item["pack_number"]))
+
+            parts = pack["messages"]
+            if dry_run:
+                detail = f"Pack #{item['pack_number']}, {len(item['beat_ids'])} beats"
+                if len(parts) > 1:
+                    detail += f" in {len(parts)} emails"
+                if pack["linked"] and not use_links:
+                    detail += f", {len(pack['linked'])} as links"
+                results.append((item["name"], item["email"], "DRY", detail))
+                continue
+
+            entry = item["outbox"]
+            todo = unsent_parts(item)
+            if entry["status"] in ("composing", "needs_review") and gmail is not None:
+                # The last run died mid-send: parts it may have sent are looked up
+                if not _recover_sent_parts(gmail, db, entry, [n for n, _ in todo]):
+                    results.append((
+                        item["name"], item["email"], "REVIEW",
+                        f"Pack #{item['pack_number']} may have been sent; "
+                        "check Sent mail, then run resolve-pack",
+                    ))
+                    continue
+                todo = unsent_parts(item)
+            if not todo:
+                finish_pack(item)
+                continue
+            if compose_only:
+                todo = parts_to_build(item)
+                if not todo:
+                    results.append(
+                        (item["name"], item["email"], "SPOOLED", "Already composed")
+                    )
+                    continue
+
+            if grant_link_access:
+                for b in pack["linked"]:
+                    if b.get("drive_file_id"):
+                        drive.grant_read_access(b["drive_file_id"], item["email"])
+            if prefetcher is not None:
+                # Keep downloads for the next few artists in flight while this one sends
+                for ahead in plan[i:i + 1 + prefetch_ahead]:
+                    prefetch_pack(ahead)
+
+            if not compose_only:
+                db.mark_outbox_composing(entry["id"])
+                pending_parts[i] = {"remaining": len(todo), "errors": []}
+            for n, part in todo:
+                part_subject = subject
+                if len(parts) > 1:
+                    part_subject = f"{subject} ({n}/{len(parts)})"
+                message_id = _pack_message_id(entry, n)
+                if not compose_only and spool.has(entry["id"], n):
+                    # Composed by an earlier --compose-only run: send the file as is
+                    spooled_path = str(spool.path_for(entry["id"], n))
+                    sender.submit_file((i, n), item["email"], spooled_path)
+                    for result in sender.completed():
+                        record_result(result)
+                    continue
+
+                # Stable keys let GmailService reuse each attachment's encoded MIME part
+                attachments = [{
+                    "filename": agreement_filename,
+                    "content": agreement_content,
+                    "key": "agreement",
+                }]
+                for b in part:
+                    fn = b["filename"]
+                    if b.get("drive_file_id"):
+                        try:
+                            content = prefetcher.get(
+                                b["drive_file_id"], b.get("modified_time"),
+                                b.get("file_size"),
+                            )
+                            attachments.append({
+                                "filename": fn,
+                                "content": content,
+                                "key": f"{b['drive_file_id']}:{b.get('modified_time')}",
+                            })
+                        except Exception as ex:
+                            logger.warning(f"Could not download {fn}: {ex}")
+
+                if compose_only:
+                    spool.write(
+                        entry["id"], n, item["email"], part_subject, body,
+                        attachments, message_id,
+                    )
+                    continue
+                # Blocks only while the send queue is full; uploads overlap on workers
+                sender.submit(
+                    (i, n), item["email"], part_subject, body, attachments,
+                    message_id=message_id,
+                )
+                for result in sender.completed():
+                    record_result(result)
+            if compose_only:
+                results.append((
+                    item["name"], item["email"], "SPOOLED",
+                    f"Pack #{item['pack_number']}, {len(todo)} email(s)",
+                ))
+
+        if sender is not None:
+            for result in sender.drain():
+                record_result(result)
+    finally:
+        if prefetcher is not None:
+            prefetcher.shutdown(cancel_pending=True)
+        if sender is not None:
+            # On abort, queued sends are dropped; ones that went out are still recorded
+            dropped = sender.shutdown(cancel_pending=True)
+            for result in sender.completed():
+                record_result(result)
+        bookkeeping.flush()
+        if sender is not None:
+            _release_dropped_packs(db, plan, dropped)
+
+    spooled = spool.compact()
     db.close()
+    if spooled:
+        print(f"      {spooled} composed message(s) waiting in the spool.")
+    logger.info(
+        f"Attachment store: {attachment_store.downloads} downloads, "
+        f"{attachment_store.hits} reuses"
+    )
+    attachment_store.clear()
 
     # Summary
     print("[5/5] Summary")
@@ -316,6 +684,39 @@ def cmd_send_beats(dry_run: bool = False):
     return 0
 
 
+def cmd_boost_beat(filename: str, off: bool = False):
+    """Flag a beat (or clear the flag) for weighted selection."""
+    db = DatabaseService()
+    found = db.set_beat_boosted(filename, not off)
+    db.close()
+    if not found:
+        print(f"[ERROR] No beat with filename: {filename}")
+        return 1
+    print(f"[OK] {'Cleared boost on' if off else 'Boosted'} {filename}")
+    return 0
+
+
+def cmd_resolve_pack(email: str, pack_number: int, sent: bool):
+    """Settle a pack held for review because its sent state was unknown."""
+    db = DatabaseService()
+    artist = db.get_artists_by_emails([email]).get(email)
+    found = artist is not None and db.resolve_outbox_review(
+        artist["id"], pack_number, sent
+    )
+    db.close()
+    if not found:
+        print(f"[ERROR] No pack #{pack_number} waiting for review for {email}")
+        return 1
+    action = "will be recorded as sent" if sent else "will be sent again"
+    print(f"[OK] Pack #{pack_number} for {email} {action} on the next send-beats run")
+    return 0
+
+
+def cmd_drain_spool():
+    """Send messages composed by send-beats --compose-only."""
+    return cmd_send_beats(resume=True, spooled_only=True)
+
+
 def main():
     """Main entry point for the CLI application."""
     parser = argparse.ArgumentParser(
@@ -326,10 +727,58 @@ def main():
     subparsers.add_parser("configure", help="Set up Google API authentication")
     send_parser = subparsers.add_parser("send-beats", help="Send beats to all artists")
     send_parser.add_argument("--dry-run", action="store_true", help="Test run without sending emails")
+    send_parser.add_argument(
+        "--full-sync", action="store_true",
+        help="Rescan the whole vault instead of only changes",
+    )
+    send_parser.add_argument(
+        "--delivery", choices=["attachments", "links"], default=None,
+        help="Attach MP3s or send Drive links (default: email.delivery_mode in config)",
+    )
+    send_parser.add_argument(
+        "--resume", action="store_true",
+        help="Only finish packs queued by an earlier run "
+             "(retrying failures whose backoff has passed)",
+    )
+    send_parser.add_argument(
+        "--compose-only", action="store_true",
+        help="Build messages into the spool without sending "
+             "(send later with drain-spool)",
+    )
+    subparsers.add_parser(
+        "drain-spool", help="Send messages composed by send-beats --compose-only"
+    )
     history_parser = subparsers.add_parser("show-history", help="Display sending history")
     history_parser.add_argument("-n", "--limit", type=int, default=50, help="Max records to show")
     subparsers.add_parser("list-artists", help="List all artists in vault folder")
-    subparsers.add_parser("check-beats", help="List beats that need filename formatting")
+    check_parser = subparsers.add_parser(
+        "check-beats", help="List beats that need filename formatting"
+    )
+    check_parser.add_argument(
+        "--full-sync", action="store_true",
+        help="Rescan the whole vault instead of only changes",
+    )
+    boost_parser = subparsers.add_parser(
+        "boost-beat", help="Favour a beat in weighted selection",
+    )
+    boost_parser.add_argument("filename", help="Beat filename as stored in the vault")
+    boost_parser.add_argument(
+        "--off", action="store_true", help="Clear the boost instead",
+    )
+    resolve_parser = subparsers.add_parser(
+        "resolve-pack", help="Settle a pack whose sent state could not be checked",
+    )
+    resolve_parser.add_argument("email", help="Artist email")
+    resolve_parser.add_argument(
+        "pack_number", type=int, help="Pack number shown by send-beats"
+    )
+    resolve_choice = resolve_parser.add_mutually_exclusive_group(required=True)
+    resolve_choice.add_argument(
+        "--sent", action="store_true", help="It was sent: record it"
+    )
+    resolve_choice.add_argument(
+        "--resend", action="store_true", help="It was not sent: send it again"
+    )
 
     args = parser.parse_args()
 
@@ -341,9 +790,21 @@ def main():
     if args.command == "show-history":
         return cmd_show_history(limit=getattr(args, "limit", 50))
     if args.command == "send-beats":
-        return cmd_send_beats(dry_run=getattr(args, "dry_run", False))
+        return cmd_send_beats(
+            dry_run=getattr(args, "dry_run", False),
+            full_sync=getattr(args, "full_sync", False),
+            delivery=getattr(args, "delivery", None),
+            resume=getattr(args, "resume", False),
+            compose_only=getattr(args, "compose_only", False),
+        )
+    if args.command == "drain-spool":
+        return cmd_drain_spool()
     if args.command == "check-beats":
-        return cmd_check_beats()
+        return cmd_check_beats(full_sync=getattr(args, "full_sync", False))
+    if args.command == "boost-beat":
+        return cmd_boost_beat(args.filename, off=args.off)
+    if args.command == "resolve-pack":
+        return cmd_resolve_pack(args.email, args.pack_number, sent=args.sent)
     parser.print_help()
     return 0
 
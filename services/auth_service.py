@@ -4,7 +4,11 @@ Handles OAuth 2.0 flow and token management.
 """
 import os
 import json
+import threading
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
+import google_auth_httplib2
+import httplib2
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
@@ -87,6 +91,122 @@ def get_credentials():
     return creds
 
 
+# ========== Shared API Client Factory ==========
+
+# Refresh the access token when it has less than this left, so a scheduled
+# run never starts with a token that expires mid-send
+REFRESH_MARGIN = timedelta(minutes=5)
+HTTP_TIMEOUT = 120
+
+_credentials = None
+_credentials_lock = threading.Lock()
+_local = threading.local()
+
+
+def _save_token(creds):
+    """Persist refreshed credentials to token.json."""
+    token_path = Path(__file__).parent.parent / 'config' / 'token.json'
+    try:
+        with open(token_path, 'w') as token:
+            token.write(creds.to_json())
+    except Exception as e:
+        print(f"[WARNING] Could not save token: {e}")
+
+
+def _needs_refresh(creds) -> bool:
+    """True if the credentials are expired or expire within REFRESH_MARGIN."""
+    if not creds.refresh_token:
+        return False
+    if not creds.valid:
+        return True
+    expiry = getattr(creds, 'expiry', None)
+    if not isinstance(expiry, datetime):
+        return False
+    if expiry.tzinfo is None:
+        # google-auth stores expiry as naive UTC
+        expiry = expiry.replace(tzinfo=timezone.utc)
+    return expiry - datetime.now(timezone.utc) < REFRESH_MARGIN
+
+
+def get_shared_credentials():
+    """
+    Get process-wide credentials, loading config and token.json only once.
+
+    Tokens close to expiry are refreshed ahead of time and saved back.
+    Returns Credentials object or None if authentication fails.
+    """
+    global _credentials
+    with _credentials_lock:
+        if _credentials is None:
+            _credentials = get_credentials()
+        creds = _credentials
+        if creds is not None and _needs_refresh(creds):
+            try:
+                creds.refresh(Request())
+                _save_token(creds)
+            except Exception as e:
+                print(f"Error refreshing token: {e}")
+        return creds
+
+
+def get_authorized_http():
+    """
+    Get the authorized HTTP transport for the calling thread.
+
+    httplib2 keeps connections alive per host, so every service built on the
+    same thread reuses its TLS connections. The transport is not thread-safe,
+    so each thread gets its own.
+    """
+    http = getattr(_local, 'http', None)
+    if http is None:
+        creds = get_shared_credentials()
+        if not creds:
+            raise ValueError(
+                "Authentication required. Run 'python main.py configure' first."
+            )
+        http = google_auth_httplib2.AuthorizedHttp(
+            creds, http=httplib2.Http(timeout=HTTP_TIMEOUT)
+        )
+        _local.http = http
+    return http
+
+
+def build_service(api: str, version: str):
+    """
+    Get a Google API client, built once per thread and reused.
+
+    Uses the discovery documents bundled with google-api-python-client, so
+    no discovery request is made at startup.
+
+    Args:
+        api: API name (e.g. 'drive', 'gmail')
+        version: API version (e.g. 'v3', 'v1')
+
+    Returns:
+        googleapiclient Resource
+
+    Raises:
+        ValueError: If no valid credentials are available
+    """
+    services = getattr(_local, 'services', None)
+    if services is None:
+        services = _local.services = {}
+    service = services.get((api, version))
+    if service is None:
+        service = build(api, version, http=get_authorized_http(),
+                        static_discovery=True, cache_discovery=False)
+        services[(api, version)] = service
+    return service
+
+
+def reset_clients():
+    """Drop cached credentials and clients (e.g. after re-running configure)."""
+    global _credentials
+    with _credentials_lock:
+        _credentials = None
+    _local.__dict__.clear()
+
+
 def test_connection():
     """
     Test the connection to Google APIs.
@@ -101,13 +221,13 @@ def test_connection():
     try:
         # Test Drive API
         print("   Testing Google Drive API...", end=" ")
-        drive_service = build('drive', 'v3', credentials=creds)
+        drive_service = build_service('drive', 'v3')
         drive_service.files().list(pageSize=1).execute()
         print("[OK]")
 
         # Test Gmail API
         print("   Testing Gmail API...", end=" ")
-        gmail_service = build('gmail', 'v1', credentials=creds)
+        build_service('gmail', 'v1')
         # Use a simpler test that only requires gmail.send scope
         # getProfile requires gmail.readonly scope, but we only have gmail.send
         # So we'll just verify the service can be built (which means auth works)
@@ -146,6 +266,7 @@ def configure():
     print(f"\n[OK] Found credentials.json")
 
     # Run authentication
+    reset_clients()
     creds = get_credentials()
     if not creds:
         return False
@@ -0,0 +1,345 @@
+"""
+Beat cache service for keeping downloaded beat files on local disk.
+Avoids re-downloading unchanged beats from Google Drive across runs, and
+shares each downloaded beat between all artists within a single run.
+"""
+import hashlib
+import mmap
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Optional, Union
+import yaml
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+Buffer = Union[bytes, mmap.mmap]
+
+# Temp files older than this are leftovers of a crashed or aborted run
+STALE_TEMP_SECONDS = 3600
+
+
+class BeatFileCache:
+    """On-disk LRU cache of beat file contents keyed by Drive file ID and version."""
+
+    def __init__(
+        self, cache_dir: str = "cache/beats", max_size_bytes: int = 2 * 1024 ** 3
+    ):
+        """
+        Initialize beat file cache.
+
+        Args:
+            cache_dir: Directory for cached files (relative paths resolve from
+                project root)
+            max_size_bytes: Total size cap; least recently used files are
+                evicted above it
+        """
+        cache_path = Path(cache_dir)
+        if not cache_path.is_absolute():
+            cache_path = Path(__file__).parent.parent / cache_path
+        self.cache_dir = cache_path
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_size_bytes = max_size_bytes
+        self._sweep_temps()
+
+    @classmethod
+    def from_config(cls) -> "BeatFileCache":
+        """Create cache from config.yaml."""
+        config_path = Path(__file__).parent.parent / "config" / "config.yaml"
+        with open(config_path, "r") as f:
+            config = yaml.safe_load(f)
+        cache_config = config.get("cache") or {}
+        return cls(
+            cache_dir=cache_config.get("dir", "cache/beats"),
+            max_size_bytes=int(cache_config.get("max_size_mb", 2048)) * 1024 * 1024,
+        )
+
+    def _path_for(self, file_id: str, version: str) -> Path:
+        """Cache path for a file ID and version (md5Checksum or modifiedTime)."""
+        digest = hashlib.sha1(version.encode("utf-8")).hexdigest()[:16]
+        return self.cache_dir / f"{file_id}.{digest}.bin"
+
+    def get(self, file_id: str, version: str) -> Optional[bytes]:
+        """
+        Read a cached file.
+
+        Args:
+            file_id: Google Drive file ID
+            version: Drive md5Checksum or modifiedTime of the wanted revision
+
+        Returns:
+            File contents, or None on a cache miss
+        """
+        path = self._path_for(file_id, version)
+        try:
+            content = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        # Bump mtime so eviction treats this entry as recently used
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        logger.debug(f"Cache hit for file {file_id} ({len(content)} bytes)")
+        return content
+
+    def open_mapped(self, file_id: str, version: str) -> Optional[Buffer]:
+        """
+        Map a cached file read-only instead of reading it into memory.
+
+        Args:
+            file_id: Google Drive file ID
+            version: Drive md5Checksum or modifiedTime of the wanted revision
+
+        Returns:
+            Read-only mmap of the file (b"" for empty files), or None on a cache miss
+        """
+        path = self._path_for(file_id, version)
+        try:
+            buffer = map_file_readonly(path)
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return buffer
+
+    def reserve_temp(self) -> str:
+        """
+        Create an empty temp file inside the cache directory for streaming writes.
+
+        Returns:
+            Path of the temp file; pass it to commit_temp or delete it
+        """
+        fd, tmp_name = tempfile.mkstemp(
+            dir=self.cache_dir, prefix=".tmp-", suffix=".part"
+        )
+        os.close(fd)
+        return tmp_name
+
+    def commit_temp(self, file_id: str, version: str, tmp_name: str) -> Path:
+        """
+        Atomically move a fully written temp file into the cache.
+
+        Args:
+            file_id: Google Drive file ID
+            version: Drive md5Checksum or modifiedTime of this revision
+            tmp_name: Path returned by reserve_temp
+
+        Returns:
+            Final cache path, or tmp_name itself if the file is larger than the
+            cache (it is then not cached and the caller removes it)
+        """
+        if os.path.getsize(tmp_name) > self.max_size_bytes:
+            logger.debug(f"File {file_id} larger than cache cap, not caching")
+            return Path(tmp_name)
+        path = self._path_for(file_id, version)
+        os.replace(tmp_name, path)
+        self._drop_stale(file_id, path)
+        self._evict()
+        return path
+
+    def put(self, file_id: str, version: str, content: bytes) -> None:
+        """
+        Store a file atomically and evict stale versions and LRU entries.
+
+        Args:
+            file_id: Google Drive file ID
+            version: Drive md5Checksum or modifiedTime of this revision
+            content: File contents
+        """
+        if len(content) > self.max_size_bytes:
+            logger.debug(f"File {file_id} larger than cache cap, not caching")
+            return
+
+        path = self._path_for(file_id, version)
+        fd, tmp_name = tempfile.mkstemp(
+            dir=self.cache_dir, prefix=".tmp-", suffix=".part"
+        )
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_name, path)
+        except OSError as e:
+            logger.warning(f"Could not write cache entry for {file_id}: {e}")
+            if os.path.exists(tmp_name):
+                os.unlink(tmp_name)
+            return
+
+        self._drop_stale(file_id, path)
+        self._evict()
+
+    def _sweep_temps(self) -> None:
+        """Delete temp files left behind by earlier runs (in-flight ones are kept)."""
+        cutoff = time.time() - STALE_TEMP_SECONDS
+        for p in self.cache_dir.glob(".tmp-*.part"):
+            try:
+                if p.stat().st_mtime < cutoff:
+                    _unlink_quietly(p)
+            except FileNotFoundError:
+                continue
+
+    def _drop_stale(self, file_id: str, current: Path) -> None:
+        """Delete older revisions of a file; they will never be read again."""
+        for stale in self.cache_dir.glob(f"{file_id}.*.bin"):
+            if stale != current:
+                _unlink_quietly(stale)
+
+    def size_bytes(self) -> int:
+        """Total size of cached files in bytes."""
+        return sum(p.stat().st_size for p in self.cache_dir.glob("*.bin"))
+
+    def _evict(self) -> None:
+        """Remove least recently used files until the cache is under its size cap."""
+        entries = []
+        total = 0
+        for p in self.cache_dir.glob("*.bin"):
+            try:
+                st = p.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+            total += st.st_size
+
+        if total <= self.max_size_bytes:
+            return
+
+        entries.sort(key=lambda e: e[0])
+        for _, size, p in entries:
+            if total <= self.max_size_bytes:
+                break
+            _unlink_quietly(p)
+            total -= size
+            logger.debug(f"Evicted cached file {p.name}")
+
+
+def map_file_readonly(path: Union[str, Path]) -> Buffer:
+    """
+    Memory-map a file read-only.
+
+    Args:
+        path: File to map
+
+    Returns:
+        Read-only mmap, or b"" for an empty file (which cannot be mapped)
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _unlink_quietly(path: Path) -> None:
+    """Delete a file, ignoring files already gone or still mapped (Windows)."""
+    try:
+        path.unlink(missing_ok=True)
+    except OSError as e:
+        logger.debug(f"Could not remove cached file {path.name}: {e}")
+
+
+class AttachmentStore:
+    """Run-scoped in-memory store that downloads each beat at most once per run."""
+
+    def __init__(
+        self, drive: Any, max_bytes: int = 256 * 1024 * 1024, streaming: bool = False
+    ):
+        """
+        Initialize attachment store.
+
+        Args:
+            drive: GoogleDriveService (anything with
+                download_file(file_id, version=...))
+            max_bytes: Memory budget; least recently used beats are dropped above it
+            streaming: Use drive.download_stream, holding read-only mmaps
+                instead of bytes (drive must then also have remove_temp_files)
+        """
+        self.drive = drive
+        self.max_bytes = max_bytes
+        self.streaming = streaming
+        self._entries: "OrderedDict[str, Buffer]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.downloads = 0
+        self.hits = 0
+
+    @classmethod
+    def from_config(cls, drive: Any) -> "AttachmentStore":
+        """Create store from config.yaml."""
+        config_path = Path(__file__).parent.parent / "config" / "config.yaml"
+        with open(config_path, "r") as f:
+            config = yaml.safe_load(f)
+        cache_config = config.get("cache") or {}
+        downloads_config = config.get("downloads") or {}
+        return cls(
+            drive=drive,
+            max_bytes=int(cache_config.get("memory_budget_mb", 256)) * 1024 * 1024,
+            streaming=downloads_config.get("streaming", True),
+        )
+
+    def get(self, file_id: str, version: Optional[str] = None) -> Buffer:
+        """
+        Return the contents of a beat, downloading it only on first use.
+
+        Every caller asking for the same file receives the same immutable
+        buffer (bytes, or a read-only mmap in streaming mode), so no
+        per-artist copies are made.
+
+        Args:
+            file_id: Google Drive file ID
+            version: md5Checksum or modifiedTime, passed through to the download
+
+        Returns:
+            File contents as a read-only buffer
+
+        Raises:
+            HttpError: If the download fails
+        """
+        with self._lock:
+            content = self._entries.get(file_id)
+            if content is not None:
+                self._entries.move_to_end(file_id)
+                self.hits += 1
+                return content
+
+        if self.streaming:
+            content = self.drive.download_stream(file_id, version=version)
+        else:
+            content = self.drive.download_file(file_id, version=version)
+
+        with self._lock:
+            self.downloads += 1
+            if file_id in self._entries:
+                # Another thread stored it meanwhile; hand out the shared copy
+                self._entries.move_to_end(file_id)
+                return self._entries[file_id]
+            if len(content) <= self.max_bytes:
+                self._entries[file_id] = content
+                self._size += len(content)
+                while self._size > self.max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._size -= len(evicted)
+        return content
+
+    @property
+    def size_bytes(self) -> int:
+        """Bytes currently held in memory."""
+        return self._size
+
+    def clear(self) -> None:
+        """Release all held buffers (mappings are closed, so none may be in use)."""
+        with self._lock:
+            for content in self._entries.values():
+                if isinstance(content, mmap.mmap):
+                    content.close()
+            self._entries.clear()
+            self._size = 0
+        if self.streaming:
+            # Temp files Windows kept while they were mapped can go now
+            self.drive.remove_temp_files()
@@ -2,15 +2,137 @@
 Beat selection service for randomly selecting 3-5 beats per artist.
 Implements duplicate prevention (30-day rule).
 """
+import heapq
 import random
-from typing import List, Optional
+import time
+from array import array
+from datetime import datetime, timezone
+from itertools import chain
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, List, Optional, Set
 from pathlib import Path
 import yaml
 from services.database_service import DatabaseService
+from services.pack_cohesion_service import CohesionIndex
 from utils.logger import setup_logger
 
+try:
+    import numpy as np
+except ImportError:  # optional: select_packs falls back to per-artist sampling
+    np = None
+
 logger = setup_logger(__name__)
 
+# Eligibility matrix cells (artists x beats) processed per select_packs block
+SELECT_PACKS_CHUNK_CELLS = 1 << 22
+SELECTION_MODES = ("random", "balanced", "weighted", "cohesive")
+
+
+class BeatCatalog:
+    """
+    Immutable snapshot of the active beats, loaded once per run.
+
+    Beat IDs are kept in a compact array with an id -> position map, so
+    per-artist selection is a few set lookups instead of a pass over every
+    beat.
+    """
+
+    __slots__ = ("beats", "ids", "index")
+
+    def __init__(self, beats: Iterable[Dict[str, Any]]):
+        """
+        Build the catalog.
+
+        Args:
+            beats: Beat dictionaries (each needs 'id')
+        """
+        self.beats = tuple(beats)
+        self.ids = array("q", (b["id"] for b in self.beats))
+        self.index = MappingProxyType(
+            {beat_id: pos for pos, beat_id in enumerate(self.ids)}
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, beat_id: int) -> bool:
+        return beat_id in self.index
+
+    def sample(self, count: int, excluded: Set[int], rng: Any = random) -> List[int]:
+        """
+        Pick distinct beat IDs uniformly from those not excluded.
+
+        While most of the catalog is eligible, random positions are drawn and
+        rejected if excluded or already picked, which costs about count set
+        lookups; otherwise the eligible IDs are listed and sampled directly.
+
+        Args:
+            count: Number of beats wanted (fewer are returned if fewer are eligible)
+            excluded: Beat IDs that must not be picked
+            rng: random.Random-like source
+
+        Returns:
+            List of beat IDs
+        """
+        n = len(self.ids)
+        blocked = sum(1 for beat_id in excluded if beat_id in self.index)
+        count = min(count, n - blocked)
+        if count <= 0:
+            return []
+        if blocked * 2 > n or count * 2 > n - blocked:
+            eligible = [beat_id for beat_id in self.ids if beat_id not in excluded]
+            return rng.sample(eligible, count)
+        picked: List[int] = []
+        seen: Set[int] = set()
+        while len(picked) < count:
+            beat_id = self.ids[rng.randrange(n)]
+            if beat_id in excluded or beat_id in seen:
+                continue
+            seen.add(beat_id)
+            picked.append(beat_id)
+        return picked
+
+
+class AliasTable:
+    """
+    Walker/Vose alias table: O(n) to build, O(1) per weighted draw.
+
+    Each of n slots holds a probability and an alias; a draw picks a slot
+    uniformly, then keeps it or takes its alias with one coin flip.
+    """
+
+    __slots__ = ("prob", "alias")
+
+    def __init__(self, weights: List[float]):
+        """
+        Build the table.
+
+        Args:
+            weights: Non-negative weights (all zero means uniform)
+        """
+        n = len(weights)
+        total = float(sum(weights))
+        scaled = [w * n / total for w in weights] if total > 0 else [1.0] * n
+        self.prob = array("d", [1.0] * n)
+        self.alias = array("q", range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            lo, hi = small.pop(), large.pop()
+            self.prob[lo] = scaled[lo]
+            self.alias[lo] = hi
+            scaled[hi] -= 1.0 - scaled[lo]
+            (small if scaled[hi] < 1.0 else large).append(hi)
+        # Leftovers are 1.0 up to rounding error and keep their own slot
+
+    def __len__(self) -> int:
+        return len(self.prob)
+
+    def draw(self, rng: Any = random) -> int:
+        """Index drawn with probability proportional to its weight."""
+        i = rng.randrange(len(self.prob))
+        return i if rng.random() < self.prob[i] else self.alias[i]
+
 
 class BeatSelectionService:
     """Service for selecting random beats per artist with duplicate prevention."""
@@ -21,6 +143,13 @@ class BeatSelectionService:
         min_beats: int = 3,
         max_beats: int = 5,
         duplicate_prevention_days: int = 30,
+        seed: Optional[int] = None,
+        mode: str = "random",
+        max_artists_per_beat: Optional[int] = None,
+        recency_half_life_days: float = 90.0,
+        recency_weight: float = 1.0,
+        boost_factor: float = 3.0,
+        bpm_tolerance: int = 6,
     ):
         """
         Initialize beat selection service.
@@ -30,11 +159,43 @@ class BeatSelectionService:
             min_beats: Minimum beats per email
             max_beats: Maximum beats per email
             duplicate_prevention_days: Days to exclude recently sent beats
+            seed: Seed for select_packs, making plans reproducible (None = random)
+            mode: How select_packs picks beats:
+                'random': uniform per artist
+                'balanced': across the roster, least exposed beats first
+                'weighted': favouring new uploads and boosted beats
+                'cohesive': matching style, key and BPM within each pack
+            max_artists_per_beat: In 'balanced' mode, most artists a beat may
+                go to within the duplicate prevention window (None = no cap)
+            recency_half_life_days: In 'weighted' mode, age at which a beat's
+                recency bonus halves
+            recency_weight: In 'weighted' mode, extra weight of a brand new beat
+                (1.0 makes it twice as likely as an old one)
+            boost_factor: In 'weighted' mode, weight multiplier for boosted beats
+            bpm_tolerance: In 'cohesive' mode, largest BPM difference from the
+                pack's first beat (two beats may differ by up to twice this)
         """
+        if mode not in SELECTION_MODES:
+            raise ValueError(
+                f"Unknown selection mode '{mode}', expected one of {SELECTION_MODES}"
+            )
         self.db = db
         self.min_beats = min_beats
         self.max_beats = max_beats
         self.duplicate_prevention_days = duplicate_prevention_days
+        self.seed = seed
+        self.mode = mode
+        self.max_artists_per_beat = max_artists_per_beat
+        self.recency_half_life_days = recency_half_life_days
+        self.recency_weight = recency_weight
+        self.boost_factor = boost_factor
+        self.bpm_tolerance = bpm_tolerance
+        self._alias_table: Optional[AliasTable] = None
+        self._alias_catalog: Optional[BeatCatalog] = None
+        self._cohesion_index: Optional[CohesionIndex] = None
+        self._cohesion_catalog: Optional[BeatCatalog] = None
+        self._catalog: Optional[BeatCatalog] = None
+        self._catalog_source: Optional[Dict[int, Dict[str, Any]]] = None
 
     @classmethod
     def from_config(cls, db: DatabaseService) -> "BeatSelectionService":
@@ -43,45 +204,378 @@ class BeatSelectionService:
         with open(config_path, "r") as f:
             config = yaml.safe_load(f)
         beats_config = config["beats"]
+        weighting = beats_config.get("weighting") or {}
         return cls(
             db=db,
             min_beats=beats_config.get("min_beats_per_email", 3),
             max_beats=beats_config.get("max_beats_per_email", 5),
             duplicate_prevention_days=beats_config.get("duplicate_prevention_days", 30),
+            seed=beats_config.get("selection_seed"),
+            mode=beats_config.get("selection_mode", "random"),
+            max_artists_per_beat=beats_config.get("max_artists_per_beat"),
+            recency_half_life_days=weighting.get("recency_half_life_days", 90),
+            recency_weight=weighting.get("recency_weight", 1.0),
+            boost_factor=weighting.get("boost_factor", 3.0),
+            bpm_tolerance=beats_config.get("bpm_tolerance", 6),
         )
 
-    def select_beats_for_artist(self, artist_id: int) -> List[int]:
+    def _recently_sent(
+        self, artist_id: int, recently_sent: Optional[Set[int]]
+    ) -> Set[int]:
+        if recently_sent is not None:
+            return recently_sent
+        return set(self.db.get_recently_sent_beats(
+            artist_id, days=self.duplicate_prevention_days
+        ))
+
+    @property
+    def catalog(self) -> BeatCatalog:
+        """
+        Active beats for this run.
+
+        Built from DatabaseService.get_beats_map() and rebuilt only when that
+        cache was replaced, i.e. after beats were written.
+        """
+        beats_map = self.db.get_beats_map()
+        if self._catalog is None or beats_map is not self._catalog_source:
+            self._catalog = BeatCatalog(b for b in beats_map.values() if b["is_active"])
+            self._catalog_source = beats_map
+        return self._catalog
+
+    def beat_weight(self, beat: Dict[str, Any], now: Optional[float] = None) -> float:
+        """
+        Selection weight of a beat in 'weighted' mode.
+
+        Newer uploads (Drive createdTime, else the date the beat was added)
+        get a bonus that halves every recency_half_life_days, and boosted
+        beats are multiplied by boost_factor.
+
+        Args:
+            beat: Beat dictionary
+            now: Current epoch time (defaults to time.time())
+
+        Returns:
+            Positive weight
+        """
+        weight = 1.0
+        # Not modifiedTime: renames and edits would make old beats look new
+        uploaded = _parse_time(beat.get("created_time") or beat.get("added_date"))
+        if uploaded is not None and self.recency_half_life_days > 0:
+            age_days = max(0.0, ((now or time.time()) - uploaded) / 86400)
+            half_lives = age_days / self.recency_half_life_days
+            weight += self.recency_weight * 0.5 ** half_lives
+        if beat.get("is_boosted"):
+            weight *= self.boost_factor
+        return weight
+
+    @property
+    def alias_table(self) -> AliasTable:
+        """Alias table over the catalog's beat weights, built once per catalog."""
+        catalog = self.catalog
+        if self._alias_table is None or self._alias_catalog is not catalog:
+            now = time.time()
+            self._alias_table = AliasTable(
+                [self.beat_weight(b, now) for b in catalog.beats]
+            )
+            self._alias_catalog = catalog
+        return self._alias_table
+
+    @property
+    def cohesion_index(self) -> CohesionIndex:
+        """Style/key/BPM index over the catalog, built once per catalog."""
+        catalog = self.catalog
+        if self._cohesion_index is None or self._cohesion_catalog is not catalog:
+            self._cohesion_index = CohesionIndex(catalog.beats, self.bpm_tolerance)
+            self._cohesion_catalog = catalog
+        return self._cohesion_index
+
+    def _weighted_sample(self, catalog, table, count, excluded, rng) -> List[int]:
+        """
+        Draw distinct beats by weight, rejecting excluded ones.
+
+        Draws come from the alias table, so a pack costs O(count) while
+        exclusions are sparse; if too many draws are rejected the rest of the
+        pack is drawn from the explicit eligible weights instead.
+        """
+        picked: List[int] = []
+        seen: Set[int] = set()
+        attempts = 8 * count + 32
+        while len(picked) < count and attempts:
+            attempts -= 1
+            beat_id = catalog.ids[table.draw(rng)]
+            if beat_id in excluded or beat_id in seen:
+                continue
+            seen.add(beat_id)
+            picked.append(beat_id)
+        if len(picked) < count:
+            pool = [
+                (beat_id, self.beat_weight(beat))
+                for beat_id, beat in zip(catalog.ids, catalog.beats)
+                if beat_id not in excluded and beat_id not in seen
+            ]
+            while pool and len(picked) < count:
+                pos = rng.choices(range(len(pool)), weights=[w for _, w in pool])[0]
+                picked.append(pool.pop(pos)[0])
+        return picked
+
+    def select_beats_for_artist(self, artist_id: int,
+                                recently_sent: Optional[Set[int]] = None) -> List[int]:
         """
         Select 3-5 random beats for an artist, excluding recently sent beats.
 
         Args:
             artist_id: Artist ID
+            recently_sent: Beat IDs sent to the artist within the prevention
+                window, if already loaded (see get_recently_sent_beats_for_all)
 
         Returns:
             List of beat IDs (3-5 beats)
         """
-        all_beats = self.db.get_all_beats()
-        if not all_beats:
+        catalog = self.catalog
+        if not len(catalog):
             logger.warning("No beats in database")
             return []
 
-        all_beat_ids = [b["id"] for b in all_beats]
-        recently_sent = self.db.get_recently_sent_beats(
-            artist_id, days=self.duplicate_prevention_days
-        )
-        available_ids = [bid for bid in all_beat_ids if bid not in recently_sent]
+        recently_sent = self._recently_sent(artist_id, recently_sent)
+        count = random.randint(self.min_beats, self.max_beats)
+        selected = catalog.sample(count, recently_sent)
 
-        if not available_ids:
+        if not selected:
             logger.warning(
                 f"Artist {artist_id}: no beats available (all sent in last {self.duplicate_prevention_days} days)"
             )
-            available_ids = all_beat_ids
+            selected = catalog.sample(count, set())
+        logger.debug(f"Selected {len(selected)} beats for artist {artist_id}")
+        return selected
+
+    def select_packs(
+        self,
+        artist_ids: List[int],
+        recently_sent: Optional[Dict[int, Set[int]]] = None,
+        seed: Optional[int] = None,
+    ) -> Dict[int, List[int]]:
+        """
+        Select a pack for every artist in one pass.
 
-        count = min(
-            random.randint(self.min_beats, self.max_beats),
-            len(available_ids),
+        Modes:
+            random: uniform sample of each artist's eligible beats
+            balanced: roster-wide, least recently exposed beats first
+            weighted: drawn by beat_weight from a per-catalog alias table
+            cohesive: shared style, compatible keys and BPM (CohesionIndex)
+
+        Results are reproducible for a given seed, catalog and history.
+
+        Args:
+            artist_ids: Artists to select packs for
+            recently_sent: Beat IDs sent to each artist within the prevention
+                window (loaded with get_recently_sent_beats_for_all if omitted)
+            seed: Random seed (defaults to the service's seed)
+
+        Returns:
+            Dict mapping artist ID to selected beat IDs (empty if there are no beats)
+        """
+        artist_ids = list(artist_ids)
+        seed = self.seed if seed is None else seed
+        catalog = self.catalog
+        if not len(catalog):
+            logger.warning("No beats in database")
+            return {artist_id: [] for artist_id in artist_ids}
+        if recently_sent is None:
+            recently_sent = self.db.get_recently_sent_beats_for_all(
+                artist_ids, days=self.duplicate_prevention_days
+            )
+
+        if self.mode == "balanced":
+            packs = self._select_packs_balanced(
+                catalog, artist_ids, recently_sent, random.Random(seed)
+            )
+        elif self.mode == "cohesive":
+            rng = random.Random(seed)
+            index = self.cohesion_index
+            packs = {}
+            for artist_id in artist_ids:
+                count = rng.randint(self.min_beats, self.max_beats)
+                packs[artist_id] = (
+                    index.build_pack(count, recently_sent.get(artist_id, set()), rng)
+                    or index.build_pack(count, set(), rng)
+                )
+        elif self.mode == "weighted":
+            rng = random.Random(seed)
+            table = self.alias_table
+            packs = {}
+            for artist_id in artist_ids:
+                count = rng.randint(self.min_beats, self.max_beats)
+                exclude = recently_sent.get(artist_id, set())
+                packs[artist_id] = (
+                    self._weighted_sample(catalog, table, count, exclude, rng)
+                    or self._weighted_sample(catalog, table, count, set(), rng)
+                )
+        elif np is not None:
+            packs = self._select_packs_numpy(
+                catalog, artist_ids, recently_sent, np.random.default_rng(seed)
+            )
+        else:
+            rng = random.Random(seed)
+            packs = {}
+            for artist_id in artist_ids:
+                count = rng.randint(self.min_beats, self.max_beats)
+                packs[artist_id] = (
+                    catalog.sample(count, recently_sent.get(artist_id, set()), rng)
+                    or catalog.sample(count, set(), rng)
+                )
+        logger.info(
+            f"Selected packs for {len(packs)} artists from {len(catalog)} beats"
         )
-        count = max(1, count)
-        selected = random.sample(available_ids, count)
-        logger.info(f"Selected {len(selected)} beats for artist {artist_id}")
-        return selected
+        return packs
+
+    def _select_packs_numpy(
+        self, catalog, artist_ids, recently_sent, rng
+    ) -> Dict[int, List[int]]:
+        """
+        Random mode over a boolean eligibility matrix per block of artists.
+
+        Positions are drawn for the whole block at once and the first
+        eligible, distinct ones kept; rows with too few hits fall back to
+        argpartition over random keys. Uses a different random stream than
+        the pure-Python path.
+        """
+        n = len(catalog)
+        kmax = min(self.max_beats, n)
+        draws = 4 * kmax
+        ids = np.asarray(catalog.ids, dtype=np.int64)
+        # Beat ID -> catalog position (-1 for beats not in the catalog)
+        position = np.full(int(ids.max()) + 2, -1, dtype=np.int64)
+        position[ids] = np.arange(n)
+        sizes = rng.integers(self.min_beats, self.max_beats + 1, size=len(artist_ids))
+        block_rows = max(1, SELECT_PACKS_CHUNK_CELLS // n)
+        packs: Dict[int, List[int]] = {}
+        for start in range(0, len(artist_ids), block_rows):
+            block = artist_ids[start:start + block_rows]
+            sent = [recently_sent.get(artist_id, ()) for artist_id in block]
+            lengths = np.fromiter(map(len, sent), dtype=np.int64, count=len(block))
+            sent_ids = np.fromiter(
+                chain.from_iterable(sent), dtype=np.int64, count=int(lengths.sum())
+            )
+            rows = np.repeat(np.arange(len(block)), lengths)
+            cols = position[np.clip(sent_ids, 0, len(position) - 1)]
+            eligible = np.ones((len(block), n), dtype=bool)
+            eligible[rows[cols >= 0], cols[cols >= 0]] = False
+            counts = eligible.sum(axis=1)
+            # Everything was sent recently: fall back to the whole catalog
+            eligible[counts == 0] = True
+            counts[counts == 0] = n
+            take = np.minimum(sizes[start:start + len(block)], counts)
+
+            # A few random positions per artist; the first eligible, not yet
+            # drawn ones form a uniform sample, without touching every beat
+            cand = rng.integers(0, n, size=(len(block), draws))
+            ok = np.take_along_axis(eligible, cand, axis=1)
+            order = np.argsort(cand, axis=1, kind="stable")
+            sorted_cand = np.take_along_axis(cand, order, axis=1)
+            repeat_sorted = np.zeros_like(ok)
+            repeat_sorted[:, 1:] = sorted_cand[:, 1:] == sorted_cand[:, :-1]
+            repeat = np.empty_like(ok)
+            np.put_along_axis(repeat, order, repeat_sorted, axis=1)
+            ok &= ~repeat
+            ok &= np.cumsum(ok, axis=1) <= take[:, None]
+            short = ok.sum(axis=1) < take
+
+            chosen = {}
+            if short.any():
+                # Mostly excluded rows: random keys over the whole row,
+                # eligible beats first
+                keys = rng.random((int(short.sum()), n), dtype=np.float32)
+                keys[~eligible[short]] = 2.0
+                top = np.argpartition(keys, kmax - 1, axis=1)[:, :kmax]
+                ranked = np.take_along_axis(keys, top, axis=1).argsort(axis=1)
+                top = np.take_along_axis(top, ranked, axis=1)
+                for row, picks in zip(np.flatnonzero(short), top):
+                    chosen[row] = picks[:take[row]]
+            for row, artist_id in enumerate(block):
+                picks = chosen[row] if row in chosen else cand[row, ok[row]]
+                packs[artist_id] = ids[picks].tolist()
+        return packs
+
+    def _select_packs_balanced(
+        self, catalog, artist_ids, recently_sent, rng
+    ) -> Dict[int, List[int]]:
+        """
+        Greedy roster-wide assignment: every pick takes the least exposed beat.
+
+        Exposure is the number of artists a beat reached within the window,
+        plus the artists it is assigned to in this run. Beats sit in a min-heap
+        keyed by (exposure, random tie-break); an artist pops beats until its
+        pack is full, setting aside beats it received recently, and the picked
+        beats go back with their exposure raised unless they hit the cap.
+        Each pick costs O(log beats), so a run is near-linear in artists x
+        pack size. The cap and the window are never broken: artists who run
+        out of eligible beats get smaller or empty packs.
+        """
+        cap = self.max_artists_per_beat
+        exposure = self.db.get_beat_exposure(days=self.duplicate_prevention_days)
+        heap = [
+            (exposure.get(beat_id, 0), rng.random(), beat_id)
+            for beat_id in catalog.ids
+            if not cap or exposure.get(beat_id, 0) < cap
+        ]
+        heapq.heapify(heap)
+
+        # Random artist order, so no artist always gets first pick
+        order = list(artist_ids)
+        rng.shuffle(order)
+        packs: Dict[int, List[int]] = {}
+        short = 0
+        for artist_id in order:
+            want = rng.randint(self.min_beats, self.max_beats)
+            excluded = recently_sent.get(artist_id, ())
+            picked, skipped = [], []
+            while heap and len(picked) < want:
+                item = heapq.heappop(heap)
+                (skipped if item[2] in excluded else picked).append(item)
+            for item in skipped:
+                heapq.heappush(heap, item)
+            for count, _, beat_id in picked:
+                if not cap or count + 1 < cap:
+                    heapq.heappush(heap, (count + 1, rng.random(), beat_id))
+            packs[artist_id] = [beat_id for _, _, beat_id in picked]
+            if len(picked) < want:
+                short += 1
+        if short:
+            logger.warning(
+                f"{short} artist(s) got short packs: beats at the exposure cap "
+                "or sent recently"
+            )
+        return {artist_id: packs[artist_id] for artist_id in artist_ids}
+
+    def get_alternative_beats(self, artist_id: int, exclude_ids: List[int],
+                              recently_sent: Optional[Set[int]] = None) -> List[dict]:
+        """
+        Beats that could replace a selected beat for an artist.
+
+        Args:
+            artist_id: Artist ID
+            exclude_ids: Beat IDs already in the pack
+            recently_sent: Beat IDs recently sent to the artist, if already loaded
+
+        Returns:
+            Beat dictionaries not recently sent to the artist and not excluded
+        """
+        recently_sent = self._recently_sent(artist_id, recently_sent)
+        excluded = set(exclude_ids)
+        return [
+            b for b in self.catalog.beats
+            if b["id"] not in recently_sent and b["id"] not in excluded
+        ]
+
+
+def _parse_time(value: Optional[str]) -> Optional[float]:
+    """Epoch seconds of an ISO/RFC 3339 timestamp (naive values are UTC), or None."""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
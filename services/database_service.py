@@ -4,120 +4,550 @@ Handles artists, beats, email history, and duplicate prevention.
 """
 import sqlite3
 import json
-from datetime import datetime
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Iterable, Set
 import yaml
 from utils.logger import setup_logger
 
 logger = setup_logger(__name__)
 
+# History rows copied into pack_beats per transaction while migrating legacy databases
+PACK_BEATS_MIGRATION_BATCH = 5000
+
+# Default for epoch-second (UTC) time columns
+EPOCH_NOW_SQL = "(CAST(strftime('%s', 'now') AS INTEGER))"
+
+# Upserts with several ON CONFLICT clauses (upsert_beats) need SQLite 3.35
+MIN_SQLITE_VERSION = (3, 35, 0)
+
+
+class ConnectionManager:
+    """
+    SQLite connections for one database file in WAL mode.
+
+    Each thread reads through its own connection, so reads never wait on a
+    writer; all writes share one connection behind a lock (WAL allows a
+    single writer anyway), which makes the service safe to use from worker
+    threads.
+    """
+
+    def __init__(self, db_path: str, mmap_size: int = 256 * 1024 * 1024,
+                 cache_size: int = 64 * 1024 * 1024, busy_timeout: float = 5.0):
+        """
+        Initialize connection manager.
+
+        Args:
+            db_path: SQLite database file (":memory:" uses the writer for reads too)
+            mmap_size: Bytes of the database file to memory-map
+            cache_size: Page cache size in bytes, per connection
+            busy_timeout: Seconds to wait for a lock held by another process
+        """
+        self.db_path = str(db_path)
+        self.mmap_size = mmap_size
+        self.cache_size = cache_size
+        self.busy_timeout = busy_timeout
+        self.writer: Optional[sqlite3.Connection] = None
+        self._write_lock = threading.RLock()
+        self._write_depth = 0
+        self._readers: Dict[int, sqlite3.Connection] = {}
+        self._readers_lock = threading.Lock()
+
+    def _connect(self, read_only: bool = False) -> sqlite3.Connection:
+        # Connections are only ever used by one thread at a time (readers per thread,
+        # the writer under its lock), so the same-thread check is not needed
+        conn = sqlite3.connect(
+            self.db_path, timeout=self.busy_timeout, check_same_thread=False
+        )
+        conn.row_factory = sqlite3.Row  # Enable column access by name
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        conn.execute(f"PRAGMA cache_size = {-int(self.cache_size // 1024)}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        if read_only:
+            conn.execute("PRAGMA query_only = ON")
+        return conn
+
+    def writer_connection(self) -> sqlite3.Connection:
+        """Get or open the single writer connection (switching the file to WAL)."""
+        with self._write_lock:
+            if self.writer is None:
+                self.writer = self._connect()
+                if self.db_path != ":memory:":
+                    cursor = self.writer.execute("PRAGMA journal_mode = WAL")
+                    mode = cursor.fetchone()[0]
+                    if mode.lower() != "wal":
+                        logger.warning(
+                            f"Could not enable WAL for {self.db_path} "
+                            f"(journal_mode={mode})"
+                        )
+            return self.writer
+
+    @contextmanager
+    def write(self):
+        """
+        Hold the writer for one transaction.
+
+        Commits when the outermost block exits and rolls back on an exception;
+        nested blocks join the enclosing transaction.
+
+        Yields:
+            The writer connection
+        """
+        with self._write_lock:
+            conn = self.writer_connection()
+            self._write_depth += 1
+            try:
+                yield conn
+            except BaseException:
+                if self._write_depth == 1:
+                    conn.rollback()
+                raise
+            else:
+                if self._write_depth == 1:
+                    conn.commit()
+            finally:
+                self._write_depth -= 1
+
+    def reader(self) -> sqlite3.Connection:
+        """
+        Read-only connection for the calling thread.
+
+        Reads see committed data only, not an open transaction on the writer.
+        """
+        if self.db_path == ":memory:":
+            return self.writer_connection()
+        ident = threading.get_ident()
+        conn = self._readers.get(ident)
+        if conn is None:
+            conn = self._connect(read_only=True)
+            with self._readers_lock:
+                self._readers[ident] = conn
+        return conn
+
+    def close(self) -> bool:
+        """
+        Close every connection.
+
+        Returns:
+            True if any connection was open
+        """
+        with self._readers_lock:
+            readers = list(self._readers.values())
+            self._readers.clear()
+        for conn in readers:
+            conn.close()
+        with self._write_lock:
+            writer, self.writer = self.writer, None
+        if writer is not None:
+            writer.close()
+        return bool(readers) or writer is not None
+
 
 class DatabaseService:
     """Service for managing SQLite database operations."""
 
-    def __init__(self, db_path: Optional[str] = None):
+    def __init__(self, db_path: Optional[str] = None, mmap_size_mb: int = 256,
+                 cache_size_mb: int = 64, busy_timeout: float = 5.0):
         """
         Initialize database service.
 
         Args:
-            db_path: Path to SQLite database file. If None, loads from config.
+            db_path: Path to SQLite database file. If None, loads from config
+                (together with the tuning values below).
+            mmap_size_mb: Memory-mapped I/O size per connection
+            cache_size_mb: Page cache size per connection
+            busy_timeout: Seconds to wait for locks held by other processes
         """
         if db_path is None:
             config_path = Path(__file__).parent.parent / 'config' / 'config.yaml'
             with open(config_path, 'r') as f:
                 config = yaml.safe_load(f)
-            db_path = config['database']['path']
+            db_config = config['database']
+            db_path = db_config['path']
+            mmap_size_mb = db_config.get('mmap_size_mb', mmap_size_mb)
+            cache_size_mb = db_config.get('cache_size_mb', cache_size_mb)
+            busy_timeout = db_config.get('busy_timeout', busy_timeout)
+
+        if sqlite3.sqlite_version_info < MIN_SQLITE_VERSION:
+            required = ".".join(map(str, MIN_SQLITE_VERSION))
+            raise RuntimeError(
+                f"SQLite {required}+ is required, found {sqlite3.sqlite_version}; "
+                "use a newer Python build"
+            )
 
         self.db_path = Path(db_path)
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
-        self.connection: Optional[sqlite3.Connection] = None
+        self._manager = ConnectionManager(
+            str(self.db_path),
+            mmap_size=int(mmap_size_mb) * 1024 * 1024,
+            cache_size=int(cache_size_mb) * 1024 * 1024,
+            busy_timeout=busy_timeout,
+        )
+        # Cached get_beats_map() result; cleared by every beat write
+        self._beats_map: Optional[Dict[int, Dict[str, Any]]] = None
         self._initialize_database()
 
+    @property
+    def connection(self) -> Optional[sqlite3.Connection]:
+        """The writer connection, or None while closed."""
+        return self._manager.writer
+
     def _get_connection(self) -> sqlite3.Connection:
-        """Get or create database connection."""
-        if self.connection is None:
-            self.connection = sqlite3.connect(str(self.db_path))
-            self.connection.row_factory = sqlite3.Row  # Enable column access by name
-        return self.connection
+        """Get or create the (writer) database connection."""
+        return self._manager.writer_connection()
+
+    def _write(self):
+        """Context manager: serialized write transaction on the writer connection."""
+        return self._manager.write()
+
+    def _read(self) -> sqlite3.Connection:
+        """Read-only connection for the calling thread."""
+        return self._manager.reader()
 
     def _initialize_database(self):
         """Create database tables if they don't exist."""
-        conn = self._get_connection()
-        cursor = conn.cursor()
+        with self._write() as conn:
+            cursor = conn.cursor()
 
-        # Artists table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS artists (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                email TEXT NOT NULL UNIQUE,
-                added_date TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
-                last_pack_number INTEGER DEFAULT 0
-            )
-        """)
+            # Artists table
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS artists (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL,
+                    email TEXT NOT NULL UNIQUE,
+                    added_date TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                    last_pack_number INTEGER DEFAULT 0,
+                    is_active INTEGER NOT NULL DEFAULT 1
+                )
+            """)
+
+            # Beats table
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS beats (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    filename TEXT NOT NULL UNIQUE,
+                    beat_name TEXT NOT NULL,
+                    bpm INTEGER,
+                    key TEXT,
+                    style_category TEXT,
+                    file_type TEXT NOT NULL,
+                    file_size INTEGER,
+                    added_date TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                    drive_file_id TEXT,
+                    modified_time TEXT,
+                    created_time TEXT,
+                    is_active INTEGER NOT NULL DEFAULT 1,
+                    is_boosted INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+
+            # Email history table
+            cursor.execute(f"""
+                CREATE TABLE IF NOT EXISTS email_history (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    artist_id INTEGER NOT NULL,
+                    sent_at INTEGER NOT NULL DEFAULT {EPOCH_NOW_SQL},
+                    pack_number INTEGER NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'sent',
+                    error_message TEXT,
+                    FOREIGN KEY (artist_id) REFERENCES artists(id)
+                )
+            """)
+
+            # Beats of each history record, in pack order
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS pack_beats (
+                    history_id INTEGER NOT NULL,
+                    beat_id INTEGER NOT NULL,
+                    position INTEGER NOT NULL,
+                    PRIMARY KEY (history_id, position),
+                    FOREIGN KEY (history_id) REFERENCES email_history(id),
+                    FOREIGN KEY (beat_id) REFERENCES beats(id)
+                ) WITHOUT ROWID
+            """)
+
+            # Artist-beat history table (for duplicate prevention)
+            cursor.execute(f"""
+                CREATE TABLE IF NOT EXISTS artist_beat_history (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    artist_id INTEGER NOT NULL,
+                    beat_id INTEGER NOT NULL,
+                    sent_at INTEGER NOT NULL DEFAULT {EPOCH_NOW_SQL},
+                    FOREIGN KEY (artist_id) REFERENCES artists(id),
+                    FOREIGN KEY (beat_id) REFERENCES beats(id),
+                    UNIQUE(artist_id, sent_at, beat_id)
+                )
+            """)
+
+            # Mirror of every file in the vault folder (including unparseable names)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS vault_files (
+                    drive_file_id TEXT PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    size INTEGER,
+                    mime_type TEXT,
+                    modified_time TEXT,
+                    md5_checksum TEXT
+                )
+            """)
+
+            # Key/value state such as the Drive changes page token
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS sync_state (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                )
+            """)
+
+            # Durable send queue: one row per (artist, pack), written around each send
+            cursor.execute(f"""
+                CREATE TABLE IF NOT EXISTS outbox (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    idempotency_key TEXT NOT NULL UNIQUE,
+                    artist_id INTEGER NOT NULL,
+                    pack_number INTEGER NOT NULL,
+                    beat_ids TEXT NOT NULL,
+                    parts TEXT NOT NULL,
+                    linked TEXT NOT NULL,
+                    sent_parts TEXT NOT NULL DEFAULT '{{}}',
+                    status TEXT NOT NULL DEFAULT 'planned',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    error_message TEXT,
+                    next_attempt_at INTEGER,
+                    created_at INTEGER NOT NULL DEFAULT {EPOCH_NOW_SQL},
+                    updated_at INTEGER NOT NULL DEFAULT {EPOCH_NOW_SQL},
+                    FOREIGN KEY (artist_id) REFERENCES artists(id)
+                )
+            """)
+
+            self._migrate_columns(cursor, 'artists', {
+                'is_active': 'INTEGER NOT NULL DEFAULT 1',
+            })
+            self._migrate_columns(cursor, 'beats', {
+                'drive_file_id': 'TEXT',
+                'modified_time': 'TEXT',
+                'is_active': 'INTEGER NOT NULL DEFAULT 1',
+                'is_boosted': 'INTEGER NOT NULL DEFAULT 0',
+                'created_time': 'TEXT',
+            })
+
+            # Create indexes for better query performance
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_artists_email ON artists(email)
+            """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_beats_filename ON beats(filename)
+            """)
+            cursor.execute("""
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_beats_drive_file_id
+                ON beats(drive_file_id)
+            """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_pack_beats_beat
+                ON pack_beats(beat_id, history_id)
+            """)
+
+        self._migrate_pack_beats()
+        self._migrate_timestamps()
+
+        with self._write() as conn:
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_outbox_status ON outbox(status)
+            """)
+            # Time windows are range scans on (artist_id, sent_at); for
+            # artist_beat_history its UNIQUE(artist_id, sent_at, beat_id) index serves
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_email_history_artist_sent
+                ON email_history(artist_id, sent_at)
+            """)
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_email_history_sent
+                ON email_history(sent_at)
+            """)
+            # Exposure windows span all artists; covering, so the table is not read
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_artist_beat_history_sent
+                ON artist_beat_history(sent_at, beat_id, artist_id)
+            """)
 
-        # Beats table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS beats (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                filename TEXT NOT NULL UNIQUE,
-                beat_name TEXT NOT NULL,
-                bpm INTEGER,
-                key TEXT,
-                style_category TEXT,
-                file_type TEXT NOT NULL,
-                file_size INTEGER,
-                added_date TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
+        logger.info("Database initialized successfully")
 
-        # Email history table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS email_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                artist_id INTEGER NOT NULL,
-                timestamp TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
-                pack_number INTEGER NOT NULL,
-                beats_sent TEXT NOT NULL,
-                status TEXT NOT NULL DEFAULT 'sent',
-                error_message TEXT,
-                FOREIGN KEY (artist_id) REFERENCES artists(id)
+    def _migrate_pack_beats(self):
+        """
+        Move beat lists from the legacy email_history.beats_sent JSON column
+        into pack_beats.
+
+        Rows are copied in batches, each in its own transaction, so the write
+        lock is never held for long; progress is kept in sync_state and the
+        copy is idempotent, so an interrupted migration resumes where it
+        stopped. The JSON column is dropped once every row is copied.
+        """
+        conn = self._read()
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(email_history)")}
+        if 'beats_sent' not in columns:
+            return
+
+        last_id = int(self.get_sync_state('pack_beats_migrated_id') or 0)
+        max_id = conn.execute(
+            "SELECT COALESCE(MAX(id), 0) FROM email_history"
+        ).fetchone()[0]
+        while last_id < max_id:
+            upper = last_id + PACK_BEATS_MIGRATION_BATCH
+            with self._write() as wconn:
+                wconn.execute("""
+                    INSERT OR IGNORE INTO pack_beats (history_id, beat_id, position)
+                    SELECT eh.id, CAST(j.value AS INTEGER), CAST(j.key AS INTEGER)
+                    FROM email_history eh, json_each(eh.beats_sent) j
+                    WHERE eh.id > ? AND eh.id <= ?
+                """, (last_id, upper))
+                self.set_sync_state('pack_beats_migrated_id', str(upper))
+            last_id = upper
+
+        with self._write() as wconn:
+            # Supported from SQLite 3.35 (MIN_SQLITE_VERSION)
+            wconn.execute("ALTER TABLE email_history DROP COLUMN beats_sent")
+            self.set_sync_state('pack_beats_migrated_id', None)
+        logger.info(
+            f"Migrated table email_history: beat lists moved to pack_beats "
+            f"({max_id} records)"
+        )
+
+    def _migrate_timestamps(self):
+        """
+        Convert legacy text time columns to epoch seconds (UTC).
+
+        email_history.timestamp and the outbox time columns held
+        CURRENT_TIMESTAMP values (UTC); artist_beat_history.sent_date held
+        either those or local-time isoformat() strings (with a 'T'), which are
+        shifted to UTC. Each table is rebuilt in one transaction.
+        """
+        conn = self._read()
+        history_columns = {
+            row[1] for row in conn.execute("PRAGMA table_info(email_history)")
+        }
+        if 'timestamp' in history_columns:
+            with self._write() as wconn:
+                wconn.execute(f"""
+                    CREATE TABLE email_history_new (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        artist_id INTEGER NOT NULL,
+                        sent_at INTEGER NOT NULL DEFAULT {EPOCH_NOW_SQL},
+                        pack_number INTEGER NOT NULL,
+                        status TEXT NOT NULL DEFAULT 'sent',
+                        error_message TEXT,
+                        FOREIGN KEY (artist_id) REFERENCES artists(id)
+                    )
+                """)
+                wconn.execute(f"""
+                    INSERT INTO email_history_new
+                        (id, artist_id, sent_at, pack_number, status, error_message)
+                    SELECT id, artist_id,
+                           COALESCE(CAST(strftime('%s', timestamp) AS INTEGER),
+                                    {EPOCH_NOW_SQL}),
+                           pack_number, status, error_message
+                    FROM email_history
+                """)
+                wconn.execute("DROP TABLE email_history")
+                wconn.execute("ALTER TABLE email_history_new RENAME TO email_history")
+            logger.info(
+                "Migrated table email_history: timestamp -> sent_at (epoch seconds)"
             )
-        """)
 
-        # Artist-beat history table (for duplicate prevention)
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS artist_beat_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                artist_id INTEGER NOT NULL,
-                beat_id INTEGER NOT NULL,
-                sent_date TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (artist_id) REFERENCES artists(id),
-                FOREIGN KEY (beat_id) REFERENCES beats(id),
-                UNIQUE(artist_id, beat_id, sent_date)
+        beat_history_columns = {
+            row[1]
+            for row in conn.execute("PRAGMA table_info(artist_beat_history)")
+        }
+        if 'sent_date' in beat_history_columns:
+            with self._write() as wconn:
+                wconn.execute(f"""
+                    CREATE TABLE artist_beat_history_new (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        artist_id INTEGER NOT NULL,
+                        beat_id INTEGER NOT NULL,
+                        sent_at INTEGER NOT NULL DEFAULT {EPOCH_NOW_SQL},
+                        FOREIGN KEY (artist_id) REFERENCES artists(id),
+                        FOREIGN KEY (beat_id) REFERENCES beats(id),
+                        UNIQUE(artist_id, sent_at, beat_id)
+                    )
+                """)
+                wconn.execute(f"""
+                    INSERT OR IGNORE INTO artist_beat_history_new
+                        (id, artist_id, beat_id, sent_at)
+                    SELECT id, artist_id, beat_id, COALESCE(CAST(
+                        CASE WHEN sent_date LIKE '%T%'
+                             THEN strftime('%s', sent_date, 'utc')
+                             ELSE strftime('%s', sent_date) END
+                    AS INTEGER), {EPOCH_NOW_SQL})
+                    FROM artist_beat_history
+                """)
+                wconn.execute("DROP TABLE artist_beat_history")
+                wconn.execute(
+                    "ALTER TABLE artist_beat_history_new RENAME TO artist_beat_history"
+                )
+            logger.info(
+                "Migrated table artist_beat_history: sent_date -> sent_at "
+                "(epoch seconds)"
             )
-        """)
 
-        # Create indexes for better query performance
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_artists_email ON artists(email)
-        """)
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_beats_filename ON beats(filename)
-        """)
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_email_history_artist ON email_history(artist_id)
-        """)
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_artist_beat_history_artist ON artist_beat_history(artist_id)
-        """)
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_artist_beat_history_date ON artist_beat_history(sent_date)
-        """)
+        outbox_types = {
+            row[1]: row[2] for row in conn.execute("PRAGMA table_info(outbox)")
+        }
+        if outbox_types.get('created_at') == 'TEXT':
+            with self._write() as wconn:
+                wconn.execute(f"""
+                    CREATE TABLE outbox_new (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        idempotency_key TEXT NOT NULL UNIQUE,
+                        artist_id INTEGER NOT NULL,
+                        pack_number INTEGER NOT NULL,
+                        beat_ids TEXT NOT NULL,
+                        parts TEXT NOT NULL,
+                        linked TEXT NOT NULL,
+                        sent_parts TEXT NOT NULL DEFAULT '{{}}',
+                        status TEXT NOT NULL DEFAULT 'planned',
+                        attempts INTEGER NOT NULL DEFAULT 0,
+                        error_message TEXT,
+                        next_attempt_at INTEGER,
+                        created_at INTEGER NOT NULL DEFAULT {EPOCH_NOW_SQL},
+                        updated_at INTEGER NOT NULL DEFAULT {EPOCH_NOW_SQL},
+                        FOREIGN KEY (artist_id) REFERENCES artists(id)
+                    )
+                """)
+                wconn.execute(f"""
+                    INSERT INTO outbox_new
+                    SELECT id, idempotency_key, artist_id, pack_number, beat_ids, parts,
+                           linked, sent_parts, status, attempts, error_message,
+                           CAST(strftime('%s', next_attempt_at) AS INTEGER),
+                           COALESCE(CAST(strftime('%s', created_at) AS INTEGER),
+                                    {EPOCH_NOW_SQL}),
+                           COALESCE(CAST(strftime('%s', updated_at) AS INTEGER),
+                                    {EPOCH_NOW_SQL})
+                    FROM outbox
+                """)
+                wconn.execute("DROP TABLE outbox")
+                wconn.execute("ALTER TABLE outbox_new RENAME TO outbox")
+            logger.info("Migrated table outbox: time columns -> epoch seconds")
+
+    @staticmethod
+    def _migrate_columns(cursor: sqlite3.Cursor, table: str, columns: Dict[str, str]):
+        """
+        Add columns missing from an existing table (created by an older version).
 
-        conn.commit()
-        logger.info("Database initialized successfully")
+        Args:
+            cursor: Cursor on the open connection
+            table: Table name
+            columns: Mapping of column name to SQL type/constraints
+        """
+        cursor.execute(f"PRAGMA table_info({table})")
+        existing = {row[1] for row in cursor.fetchall()}
+        for name, ddl in columns.items():
+            if name not in existing:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}")
+                logger.info(f"Migrated table {table}: added column {name}")
 
     # ========== Artists CRUD Operations ==========
 
@@ -135,21 +565,20 @@ class DatabaseService:
         Raises:
             sqlite3.IntegrityError: If email already exists
         """
-        conn = self._get_connection()
-        cursor = conn.cursor()
-
-        try:
-            cursor.execute("""
-                INSERT INTO artists (name, email)
-                VALUES (?, ?)
-            """, (name, email))
-            conn.commit()
-            artist_id = cursor.lastrowid
-            logger.info(f"Added artist: {name} ({email}) with ID {artist_id}")
-            return artist_id
-        except sqlite3.IntegrityError as e:
-            logger.warning(f"Artist with email {email} already exists")
-            raise
+        with self._write() as conn:
+            cursor = conn.cursor()
+
+            try:
+                cursor.execute("""
+                    INSERT INTO artists (name, email)
+                    VALUES (?, ?)
+                """, (name, email))
+                artist_id = cursor.lastrowid
+                logger.info(f"Added artist: {name} ({email}) with ID {artist_id}")
+                return artist_id
+            except sqlite3.IntegrityError:
+                logger.warning(f"Artist with email {email} already exists")
+                raise
 
     def get_artist_by_email(self, email: str) -> Optional[Dict[str, Any]]:
         """
@@ -161,7 +590,7 @@ class DatabaseService:
         Returns:
             Dictionary with artist data or None if not found
         """
-        conn = self._get_connection()
+        conn = self._read()
         cursor = conn.cursor()
 
         cursor.execute("""
@@ -173,17 +602,92 @@ class DatabaseService:
             return dict(row)
         return None
 
-    def get_all_artists(self) -> List[Dict[str, Any]]:
+    def get_artists_by_emails(self, emails: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Get many artists by email address in one query.
+
+        Args:
+            emails: Artist email addresses
+
+        Returns:
+            Dict mapping email to artist data (unknown emails are absent)
+        """
+        conn = self._read()
+        cursor = conn.cursor()
+
+        # One JSON array parameter instead of a placeholder per email
+        cursor.execute("""
+            SELECT * FROM artists WHERE email IN (SELECT value FROM json_each(?))
+        """, (json.dumps(list(emails)),))
+
+        return {row['email']: dict(row) for row in cursor.fetchall()}
+
+    def upsert_artists(self, artists: List[Dict[str, Any]],
+                       revoke_missing: bool = True) -> Dict[str, int]:
+        """
+        Insert or update many artists in one transaction.
+
+        Args:
+            artists: Dicts with 'name' and 'email' (e.g. vault folder permissions)
+            revoke_missing: Mark active artists not in the list as inactive
+                (their vault access was revoked)
+
+        Returns:
+            Counts: 'inserted', 'updated', 'unchanged', 'revoked'
+        """
+        with self._write() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute("SELECT id, name, email, is_active FROM artists")
+            existing = {row['email']: row for row in cursor.fetchall()}
+
+            counts = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'revoked': 0}
+            rows = {a['email']: (a['name'], a['email']) for a in artists}
+            params = []
+            for email, (name, _) in rows.items():
+                old = existing.get(email)
+                if old is None:
+                    counts['inserted'] += 1
+                elif old['name'] != name or not old['is_active']:
+                    counts['updated'] += 1
+                else:
+                    counts['unchanged'] += 1
+                    continue
+                params.append((name, email))
+
+            revoked = []
+            if revoke_missing:
+                revoked = [(row['id'],) for email, row in existing.items()
+                           if row['is_active'] and email not in rows]
+                counts['revoked'] = len(revoked)
+
+            cursor.executemany("""
+                INSERT INTO artists (name, email) VALUES (?, ?)
+                ON CONFLICT(email) DO UPDATE SET name = excluded.name, is_active = 1
+                WHERE artists.name IS NOT excluded.name OR artists.is_active = 0
+            """, params)
+            cursor.executemany("UPDATE artists SET is_active = 0 WHERE id = ?", revoked)
+
+            logger.info(f"Upserted artists: {counts}")
+            return counts
+
+    def get_all_artists(self, include_inactive: bool = False) -> List[Dict[str, Any]]:
         """
         Get all artists from database.
 
+        Args:
+            include_inactive: Also return artists whose vault access was revoked
+
         Returns:
             List of artist dictionaries
         """
-        conn = self._get_connection()
+        conn = self._read()
         cursor = conn.cursor()
 
-        cursor.execute("SELECT * FROM artists ORDER BY name")
+        if include_inactive:
+            cursor.execute("SELECT * FROM artists ORDER BY name")
+        else:
+            cursor.execute("SELECT * FROM artists WHERE is_active = 1 ORDER BY name")
         return [dict(row) for row in cursor.fetchall()]
 
     def update_artist_pack_number(self, artist_id: int, pack_number: int):
@@ -194,22 +698,24 @@ class DatabaseService:
             artist_id: Artist ID
             pack_number: New pack number
         """
-        conn = self._get_connection()
-        cursor = conn.cursor()
+        with self._write() as conn:
+            cursor = conn.cursor()
 
-        cursor.execute("""
-            UPDATE artists
-            SET last_pack_number = ?
-            WHERE id = ?
-        """, (pack_number, artist_id))
-        conn.commit()
-        logger.debug(f"Updated pack number for artist {artist_id} to {pack_number}")
+            cursor.execute("""
+                UPDATE artists
+                SET last_pack_number = ?
+                WHERE id = ?
+            """, (pack_number, artist_id))
+            logger.debug(f"Updated pack number for artist {artist_id} to {pack_number}")
 
     # ========== Beats CRUD Operations ==========
 
     def add_beat(self, filename: str, beat_name: str, bpm: Optional[int] = None,
                  key: Optional[str] = None, style_category: Optional[str] = None,
-                 file_type: str = 'mp3', file_size: Optional[int] = None) -> int:
+                 file_type: str = 'mp3', file_size: Optional[int] = None,
+                 drive_file_id: Optional[str] = None,
+                 modified_time: Optional[str] = None,
+                 created_time: Optional[str] = None) -> int:
         """
         Add a new beat to the database.
 
@@ -221,6 +727,9 @@ class DatabaseService:
             style_category: Style/artist category
             file_type: File type (mp3, wav, etc.)
             file_size: File size in bytes
+            drive_file_id: Google Drive file ID
+            modified_time: Drive modifiedTime of the file
+            created_time: Drive createdTime of the file (upload time)
 
         Returns:
             ID of the newly created beat
@@ -228,21 +737,24 @@ class DatabaseService:
         Raises:
             sqlite3.IntegrityError: If filename already exists
         """
-        conn = self._get_connection()
-        cursor = conn.cursor()
-
-        try:
-            cursor.execute("""
-                INSERT INTO beats (filename, beat_name, bpm, key, style_category, file_type, file_size)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (filename, beat_name, bpm, key, style_category, file_type, file_size))
-            conn.commit()
-            beat_id = cursor.lastrowid
-            logger.info(f"Added beat: {beat_name} (ID: {beat_id})")
-            return beat_id
-        except sqlite3.IntegrityError as e:
-            logger.warning(f"Beat with filename {filename} already exists")
-            raise
+        with self._write() as conn:
+            self._beats_map = None
+            cursor = conn.cursor()
+
+            try:
+                cursor.execute("""
+                    INSERT INTO beats (filename, beat_name, bpm, key, style_category,
+                                       file_type, file_size, drive_file_id,
+                                       modified_time, created_time)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (filename, beat_name, bpm, key, style_category, file_type,
+                      file_size, drive_file_id, modified_time, created_time))
+                beat_id = cursor.lastrowid
+                logger.info(f"Added beat: {beat_name} (ID: {beat_id})")
+                return beat_id
+            except sqlite3.IntegrityError:
+                logger.warning(f"Beat with filename {filename} already exists")
+                raise
 
     def get_beat_by_filename(self, filename: str) -> Optional[Dict[str, Any]]:
         """
@@ -254,7 +766,7 @@ class DatabaseService:
         Returns:
             Dictionary with beat data or None if not found
         """
-        conn = self._get_connection()
+        conn = self._read()
         cursor = conn.cursor()
 
         cursor.execute("SELECT * FROM beats WHERE filename = ?", (filename,))
@@ -263,19 +775,253 @@ class DatabaseService:
             return dict(row)
         return None
 
-    def get_all_beats(self) -> List[Dict[str, Any]]:
+    def get_beat_by_drive_file_id(self, drive_file_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get beat by Google Drive file ID.
+
+        Args:
+            drive_file_id: Google Drive file ID
+
+        Returns:
+            Dictionary with beat data or None if not found
+        """
+        conn = self._read()
+        cursor = conn.cursor()
+
+        cursor.execute("SELECT * FROM beats WHERE drive_file_id = ?", (drive_file_id,))
+        row = cursor.fetchone()
+        if row:
+            return dict(row)
+        return None
+
+    def get_all_beats(self, include_inactive: bool = False) -> List[Dict[str, Any]]:
         """
         Get all beats from database.
 
+        Args:
+            include_inactive: Also return beats removed from the vault
+
         Returns:
             List of beat dictionaries
         """
-        conn = self._get_connection()
+        conn = self._read()
         cursor = conn.cursor()
 
-        cursor.execute("SELECT * FROM beats ORDER BY beat_name")
+        if include_inactive:
+            cursor.execute("SELECT * FROM beats ORDER BY beat_name")
+        else:
+            cursor.execute("SELECT * FROM beats WHERE is_active = 1 ORDER BY beat_name")
         return [dict(row) for row in cursor.fetchall()]
 
+    def sync_beat_file(self, drive_file_id: str, filename: str, beat_name: str,
+                       bpm: Optional[int] = None, key: Optional[str] = None,
+                       style_category: Optional[str] = None, file_type: str = 'mp3',
+                       file_size: Optional[int] = None,
+                       modified_time: Optional[str] = None,
+                       created_time: Optional[str] = None) -> str:
+        """
+        Insert or update a beat from a Drive file, matching on drive_file_id.
+
+        Rows created before drive_file_id was tracked are adopted by filename,
+        so renames keep the same beat ID (and its send history).
+
+        Args:
+            drive_file_id: Google Drive file ID
+            filename: Current filename in Drive
+            beat_name: Name of the beat
+            bpm: Beats per minute
+            key: Musical key
+            style_category: Style/artist category
+            file_type: File type (mp3, wav, etc.)
+            file_size: File size in bytes
+            modified_time: Drive modifiedTime of the file
+            created_time: Drive createdTime of the file (upload time)
+
+        Returns:
+            'added', 'updated' or 'unchanged'
+        """
+        with self._write() as conn:
+            self._beats_map = None
+            cursor = conn.cursor()
+
+            existing = self.get_beat_by_drive_file_id(drive_file_id)
+            if existing is None:
+                legacy = self.get_beat_by_filename(filename)
+                if legacy is not None and not legacy.get('drive_file_id'):
+                    existing = legacy
+
+            if existing is None:
+                try:
+                    self.add_beat(filename, beat_name, bpm, key, style_category,
+                                  file_type, file_size, drive_file_id, modified_time,
+                                  created_time)
+                except sqlite3.IntegrityError:
+                    return 'unchanged'
+                return 'added'
+
+            new_values = (filename, beat_name, bpm, key, style_category, file_type,
+                          file_size, drive_file_id, modified_time, created_time, 1)
+            old_values = tuple(existing[c] for c in (
+                'filename', 'beat_name', 'bpm', 'key', 'style_category', 'file_type',
+                'file_size', 'drive_file_id', 'modified_time', 'created_time',
+                'is_active'))
+            if new_values == old_values:
+                return 'unchanged'
+
+            try:
+                cursor.execute("""
+                    UPDATE beats
+                    SET filename = ?, beat_name = ?, bpm = ?, key = ?,
+                        style_category = ?, file_type = ?, file_size = ?,
+                        drive_file_id = ?, modified_time = ?, created_time = ?,
+                        is_active = ?
+                    WHERE id = ?
+                """, new_values + (existing['id'],))
+            except sqlite3.IntegrityError:
+                logger.warning(
+                    f"Cannot rename beat {existing['id']} to {filename}: "
+                    "filename in use"
+                )
+                return 'unchanged'
+            if existing['filename'] != filename:
+                logger.info(
+                    f"Renamed beat {existing['id']}: "
+                    f"{existing['filename']} -> {filename}"
+                )
+            return 'updated'
+
+    BEAT_COLUMNS = ('filename', 'beat_name', 'bpm', 'key', 'style_category',
+                    'file_type', 'file_size', 'drive_file_id', 'modified_time',
+                    'created_time')
+
+    def upsert_beats(self, beats: List[Dict[str, Any]]) -> Dict[str, int]:
+        """
+        Insert or update many beats in one transaction.
+
+        Rows match on drive_file_id, then on filename (adopting rows created
+        before drive_file_id was tracked, as sync_beat_file does). Upserted
+        beats are marked active.
+
+        Args:
+            beats: Dicts with the beats columns (filename and beat_name required;
+                bpm, key, style_category, file_type, file_size, drive_file_id,
+                modified_time, created_time optional)
+
+        Returns:
+            Counts: 'inserted', 'updated', 'unchanged', 'skipped' (filename
+            already used by a different Drive file)
+        """
+        with self._write() as conn:
+            self._beats_map = None
+            cursor = conn.cursor()
+
+            cursor.execute("SELECT * FROM beats")
+            by_file_id, by_filename = {}, {}
+            for row in cursor.fetchall():
+                if row['drive_file_id']:
+                    by_file_id[row['drive_file_id']] = row
+                by_filename[row['filename']] = row
+
+            counts = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'skipped': 0}
+            params = []
+            claimed = set()
+            for b in beats:
+                values = tuple(
+                    b.get(c, 'mp3' if c == 'file_type' else None)
+                    for c in self.BEAT_COLUMNS
+                )
+                filename, drive_file_id = values[0], values[7]
+                named = by_filename.get(filename)
+                if drive_file_id:
+                    old = by_file_id.get(drive_file_id)
+                    if old is None and named is not None and not named['drive_file_id']:
+                        old = named
+                else:
+                    old = named
+                    if old is not None:
+                        # Rows without a Drive ID never clear the one already stored
+                        values = values[:7] + (old['drive_file_id'],) + values[8:]
+                taken = named is not None and (old is None or named['id'] != old['id'])
+                if filename in claimed or taken:
+                    logger.warning(
+                        f"Skipping beat {filename}: filename in use by another file"
+                    )
+                    counts['skipped'] += 1
+                    continue
+                claimed.add(filename)
+                if old is None:
+                    counts['inserted'] += 1
+                elif (tuple(old[c] for c in self.BEAT_COLUMNS) == values
+                      and old['is_active'] == 1):
+                    counts['unchanged'] += 1
+                    continue
+                else:
+                    counts['updated'] += 1
+                params.append(values)
+
+            update = """
+                DO UPDATE SET filename = excluded.filename,
+                    beat_name = excluded.beat_name, bpm = excluded.bpm,
+                    key = excluded.key, style_category = excluded.style_category,
+                    file_type = excluded.file_type, file_size = excluded.file_size,
+                    drive_file_id = excluded.drive_file_id,
+                    modified_time = excluded.modified_time,
+                    created_time = excluded.created_time, is_active = 1
+            """
+            cursor.executemany(f"""
+                INSERT INTO beats ({', '.join(self.BEAT_COLUMNS)})
+                VALUES ({', '.join('?' * len(self.BEAT_COLUMNS))})
+                ON CONFLICT(drive_file_id) {update}
+                ON CONFLICT(filename) {update}
+            """, params)
+
+            logger.info(f"Upserted beats: {counts}")
+            return counts
+
+    def deactivate_beat(self, drive_file_id: str) -> bool:
+        """
+        Mark the beat backed by a Drive file as removed from the vault.
+
+        The row is kept so email and duplicate-prevention history stay valid.
+
+        Args:
+            drive_file_id: Google Drive file ID
+
+        Returns:
+            True if an active beat was deactivated
+        """
+        with self._write() as conn:
+            self._beats_map = None
+            cursor = conn.cursor()
+
+            cursor.execute("""
+                UPDATE beats SET is_active = 0
+                WHERE drive_file_id = ? AND is_active = 1
+            """, (drive_file_id,))
+            if cursor.rowcount:
+                logger.info(f"Deactivated beat for Drive file {drive_file_id}")
+            return cursor.rowcount > 0
+
+    def set_beat_boosted(self, filename: str, boosted: bool = True) -> bool:
+        """
+        Flag a beat for more frequent selection in weighted mode.
+
+        Args:
+            filename: Beat filename
+            boosted: True to boost, False to clear the flag
+
+        Returns:
+            True if the beat exists
+        """
+        with self._write() as conn:
+            self._beats_map = None
+            cursor = conn.cursor()
+
+            cursor.execute("""
+                UPDATE beats SET is_boosted = ? WHERE filename = ?
+            """, (int(boosted), filename))
+            return cursor.rowcount > 0
+
     def get_beats_by_ids(self, beat_ids: List[int]) -> List[Dict[str, Any]]:
         """
         Get beats by their IDs.
@@ -289,7 +1035,7 @@ class DatabaseService:
         if not beat_ids:
             return []
 
-        conn = self._get_connection()
+        conn = self._read()
         cursor = conn.cursor()
 
         placeholders = ','.join('?' * len(beat_ids))
@@ -299,6 +1045,166 @@ class DatabaseService:
 
         return [dict(row) for row in cursor.fetchall()]
 
+    def get_beats_map(self) -> Dict[int, Dict[str, Any]]:
+        """
+        Every beat (active or not) keyed by ID, loaded once and cached.
+
+        The cache is dropped by each beat write through this service, so
+        repeated lookups within a run cost no queries. Treat the result as
+        read-only; it is shared between callers.
+
+        Returns:
+            Dict mapping beat ID to beat dictionary
+        """
+        beats_map = self._beats_map
+        if beats_map is None:
+            conn = self._read()
+            cursor = conn.cursor()
+
+            cursor.execute("SELECT * FROM beats ORDER BY beat_name")
+            beats_map = {row['id']: dict(row) for row in cursor.fetchall()}
+            self._beats_map = beats_map
+        return beats_map
+
+    def deactivate_untracked_beats(self) -> int:
+        """
+        Deactivate beats that no vault file was matched to during a full scan.
+
+        Returns:
+            Number of beats deactivated
+        """
+        with self._write() as conn:
+            self._beats_map = None
+            cursor = conn.cursor()
+
+            cursor.execute("""
+                UPDATE beats SET is_active = 0
+                WHERE drive_file_id IS NULL AND is_active = 1
+            """)
+            return cursor.rowcount
+
+    # ========== Vault Sync Operations ==========
+
+    def upsert_vault_file(self, drive_file_id: str, name: str,
+                          size: Optional[int] = None,
+                          mime_type: Optional[str] = None,
+                          modified_time: Optional[str] = None,
+                          md5_checksum: Optional[str] = None):
+        """
+        Record (or refresh) a file seen in the vault folder.
+
+        Args:
+            drive_file_id: Google Drive file ID
+            name: Filename
+            size: File size in bytes
+            mime_type: MIME type
+            modified_time: Drive modifiedTime
+            md5_checksum: Drive md5Checksum
+        """
+        with self._write() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute("""
+                INSERT INTO vault_files (drive_file_id, name, size, mime_type,
+                                         modified_time, md5_checksum)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(drive_file_id) DO UPDATE SET
+                    name = excluded.name, size = excluded.size,
+                    mime_type = excluded.mime_type,
+                    modified_time = excluded.modified_time,
+                    md5_checksum = excluded.md5_checksum
+            """, (drive_file_id, name, size, mime_type, modified_time, md5_checksum))
+
+    def upsert_vault_files(self, files: List[Dict[str, Any]]):
+        """
+        Insert or update many vault file records in one transaction.
+
+        Args:
+            files: Dicts with drive_file_id, name and optional size, mime_type,
+                modified_time, md5_checksum
+        """
+        with self._write() as conn:
+            cursor = conn.cursor()
+
+            cursor.executemany("""
+                INSERT INTO vault_files (drive_file_id, name, size, mime_type,
+                                         modified_time, md5_checksum)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(drive_file_id) DO UPDATE SET
+                    name = excluded.name, size = excluded.size,
+                    mime_type = excluded.mime_type,
+                    modified_time = excluded.modified_time,
+                    md5_checksum = excluded.md5_checksum
+            """, [
+                (f['drive_file_id'], f['name'], f.get('size'), f.get('mime_type'),
+                 f.get('modified_time'), f.get('md5_checksum'))
+                for f in files
+            ])
+
+    def remove_vault_file(self, drive_file_id: str) -> bool:
+        """
+        Forget a file that was trashed, deleted or moved out of the vault.
+
+        Args:
+            drive_file_id: Google Drive file ID
+
+        Returns:
+            True if the file was known
+        """
+        with self._write() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute(
+                "DELETE FROM vault_files WHERE drive_file_id = ?", (drive_file_id,)
+            )
+            return cursor.rowcount > 0
+
+    def get_vault_files(self) -> List[Dict[str, Any]]:
+        """
+        Get all files currently known to be in the vault folder.
+
+        Returns:
+            List of vault file dictionaries ordered by name
+        """
+        conn = self._read()
+        cursor = conn.cursor()
+
+        cursor.execute("SELECT * FROM vault_files ORDER BY name")
+        return [dict(row) for row in cursor.fetchall()]
+
+    def get_sync_state(self, key: str) -> Optional[str]:
+        """
+        Get a stored sync value (e.g. the Drive changes page token).
+
+        Args:
+            key: State key
+
+        Returns:
+            Stored value or None
+        """
+        conn = self._read()
+        cursor = conn.cursor()
+
+        cursor.execute("SELECT value FROM sync_state WHERE key = ?", (key,))
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+    def set_sync_state(self, key: str, value: Optional[str]):
+        """
+        Store a sync value.
+
+        Args:
+            key: State key
+            value: Value to store
+        """
+        with self._write() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute("""
+                INSERT INTO sync_state (key, value) VALUES (?, ?)
+                ON CONFLICT(key) DO UPDATE SET value = excluded.value
+            """, (key, value))
+
     # ========== Email History Operations ==========
 
     def add_email_history(self, artist_id: int, pack_number: int,
@@ -317,20 +1223,27 @@ class DatabaseService:
         Returns:
             ID of the newly created history record
         """
-        conn = self._get_connection()
-        cursor = conn.cursor()
-
-        beats_json = json.dumps(beats_sent)
+        with self._write() as conn:
+            cursor = conn.cursor()
 
-        cursor.execute("""
-            INSERT INTO email_history (artist_id, pack_number, beats_sent, status, error_message)
-            VALUES (?, ?, ?, ?, ?)
-        """, (artist_id, pack_number, beats_json, status, error_message))
-        conn.commit()
-
-        history_id = cursor.lastrowid
-        logger.info(f"Added email history: artist {artist_id}, pack #{pack_number}, status: {status}")
-        return history_id
+            cursor.execute("""
+                INSERT INTO email_history
+                    (artist_id, sent_at, pack_number, status, error_message)
+                VALUES (?, ?, ?, ?, ?)
+            """, (artist_id, int(time.time()), pack_number, status, error_message))
+
+            history_id = cursor.lastrowid
+            cursor.executemany("""
+                INSERT INTO pack_beats (history_id, beat_id, position) VALUES (?, ?, ?)
+            """, [
+                (history_id, beat_id, position)
+                for position, beat_id in enumerate(beats_sent)
+            ])
+            logger.info(
+                f"Added email history: artist {artist_id}, pack #{pack_number}, "
+                f"status: {status}"
+            )
+            return history_id
 
     def get_email_history(self, artist_id: Optional[int] = None,
                           limit: Optional[int] = None) -> List[Dict[str, Any]]:
@@ -342,15 +1255,18 @@ class DatabaseService:
             limit: Maximum number of records to return
 
         Returns:
-            List of email history dictionaries
+            List of email history dictionaries, newest first, each with
+            'beats_sent' as the list of beat IDs in pack order
         """
-        conn = self._get_connection()
+        conn = self._read()
         cursor = conn.cursor()
 
+        # CROSS JOIN keeps email_history as the outer loop, so the (artist_id,
+        # sent_at) / (sent_at) indexes deliver rows already in order
         query = """
             SELECT eh.*, a.name as artist_name, a.email as artist_email
             FROM email_history eh
-            JOIN artists a ON eh.artist_id = a.id
+            CROSS JOIN artists a ON eh.artist_id = a.id
         """
         params = []
 
@@ -358,51 +1274,366 @@ class DatabaseService:
             query += " WHERE eh.artist_id = ?"
             params.append(artist_id)
 
-        query += " ORDER BY eh.timestamp DESC"
+        query += " ORDER BY eh.sent_at DESC, eh.id DESC"
 
         if limit:
             query += " LIMIT ?"
             params.append(limit)
 
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
+        # Limit the history rows first, then attach their beats in one join
+        cursor.execute(f"""
+            WITH h AS ({query})
+            SELECT h.*, pb.beat_id
+            FROM h
+            LEFT JOIN pack_beats pb ON pb.history_id = h.id
+            ORDER BY h.sent_at DESC, h.id DESC, pb.position
+        """, params)
 
-        # Parse beats_sent JSON
         result = []
-        for row in rows:
-            record = dict(row)
-            record['beats_sent'] = json.loads(record['beats_sent'])
-            result.append(record)
+        for row in cursor:
+            if not result or result[-1]['id'] != row['id']:
+                record = dict(row)
+                del record['beat_id']
+                record['beats_sent'] = []
+                result.append(record)
+            if row['beat_id'] is not None:
+                result[-1]['beats_sent'].append(row['beat_id'])
 
         return result
 
-    # ========== Duplicate Prevention Operations ==========
+    def get_packs_with_beat(
+        self, beat_id: int, limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Get the history records of every pack that contained a beat.
+
+        Args:
+            beat_id: Beat ID
+            limit: Maximum number of records to return
 
-    def add_artist_beat_history(self, artist_id: int, beat_id: int, sent_date: Optional[str] = None):
+        Returns:
+            List of email history dictionaries (without beat lists), newest first
         """
-        Record that a beat was sent to an artist (for duplicate prevention).
+        conn = self._read()
+        cursor = conn.cursor()
+
+        query = """
+            SELECT eh.*, a.name as artist_name, a.email as artist_email
+            FROM pack_beats pb
+            JOIN email_history eh ON eh.id = pb.history_id
+            JOIN artists a ON eh.artist_id = a.id
+            WHERE pb.beat_id = ?
+            ORDER BY eh.sent_at DESC, eh.id DESC
+        """
+        params: List[Any] = [beat_id]
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+
+        cursor.execute(query, params)
+        return [dict(row) for row in cursor.fetchall()]
+
+    def get_beat_send_counts(self, status: str = 'sent') -> Dict[int, int]:
+        """
+        Count how many packs each beat went out in.
+
+        Args:
+            status: History status to count
+
+        Returns:
+            Dict mapping beat ID to number of packs (beats never sent are absent)
+        """
+        conn = self._read()
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            SELECT pb.beat_id, COUNT(*)
+            FROM pack_beats pb
+            JOIN email_history eh ON eh.id = pb.history_id
+            WHERE eh.status = ?
+            GROUP BY pb.beat_id
+        """, (status,))
+        return {row[0]: row[1] for row in cursor.fetchall()}
+
+    # ========== Outbox Operations ==========
+
+    @staticmethod
+    def outbox_key(artist_id: int, pack_number: int) -> str:
+        """Idempotency key for an artist's pack."""
+        return f"{artist_id}:{pack_number}"
+
+    @staticmethod
+    def _outbox_row(row: sqlite3.Row) -> Dict[str, Any]:
+        record = dict(row)
+        for column in ('beat_ids', 'parts', 'linked'):
+            record[column] = json.loads(record[column])
+        sent_parts = json.loads(record['sent_parts'])
+        record['sent_parts'] = {int(k): v for k, v in sent_parts.items()}
+        return record
+
+    def add_outbox_entry(self, artist_id: int, pack_number: int, beat_ids: List[int],
+                         parts: List[List[int]],
+                         linked: Optional[List[int]] = None) -> Dict[str, Any]:
+        """
+        Record a planned pack before anything is sent.
+
+        If the (artist, pack_number) entry already exists it is returned unchanged,
+        so planning the same pack twice never queues it twice.
 
         Args:
             artist_id: Artist ID
-            beat_id: Beat ID
-            sent_date: Date sent (defaults to current timestamp)
+            pack_number: Pack number to send
+            beat_ids: All beat IDs in the pack
+            parts: Beat IDs attached to each message (one list per email)
+            linked: Beat IDs delivered as Drive links
+
+        Returns:
+            Outbox entry dictionary
+        """
+        with self._write() as conn:
+            cursor = conn.cursor()
+
+            key = self.outbox_key(artist_id, pack_number)
+            cursor.execute("""
+                INSERT INTO outbox (idempotency_key, artist_id, pack_number, beat_ids,
+                                    parts, linked)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(idempotency_key) DO NOTHING
+            """, (key, artist_id, pack_number, json.dumps(beat_ids), json.dumps(parts),
+                  json.dumps(linked or [])))
+        return self.get_outbox_entry(artist_id, pack_number)
+
+    def get_outbox_entry(
+        self, artist_id: int, pack_number: int
+    ) -> Optional[Dict[str, Any]]:
         """
-        if sent_date is None:
-            sent_date = datetime.now().isoformat()
+        Get the outbox entry for an artist's pack.
+
+        Args:
+            artist_id: Artist ID
+            pack_number: Pack number
 
-        conn = self._get_connection()
+        Returns:
+            Outbox entry dictionary or None
+        """
+        conn = self._read()
         cursor = conn.cursor()
 
-        try:
+        cursor.execute("SELECT * FROM outbox WHERE idempotency_key = ?",
+                       (self.outbox_key(artist_id, pack_number),))
+        row = cursor.fetchone()
+        return self._outbox_row(row) if row else None
+
+    def get_pending_outbox(self) -> List[Dict[str, Any]]:
+        """
+        Get outbox entries that are not finished.
+
+        Planned, composing, failed and needs_review entries are returned.
+
+        Returns:
+            Outbox entry dictionaries with artist name, email and last_pack_number,
+            plus 'due' (False while a failed entry is still backing off)
+        """
+        conn = self._read()
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            SELECT o.*, a.name AS artist_name, a.email AS artist_email,
+                   a.last_pack_number,
+                   (o.next_attempt_at IS NULL OR o.next_attempt_at <= ?) AS due
+            FROM outbox o
+            JOIN artists a ON o.artist_id = a.id
+            WHERE o.status IN ('planned', 'composing', 'failed', 'needs_review')
+              AND a.is_active = 1
+            ORDER BY o.id
+        """, (int(time.time()),))
+        result = []
+        for row in cursor.fetchall():
+            record = self._outbox_row(row)
+            record['due'] = bool(record['due'])
+            result.append(record)
+        return result
+
+    def mark_outbox_composing(self, outbox_id: int):
+        """
+        Mark an entry as being sent (recorded before the API call).
+
+        Args:
+            outbox_id: Outbox entry ID
+        """
+        with self._write() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute("""
+                UPDATE outbox
+                SET status = 'composing', attempts = attempts + 1, updated_at = ?
+                WHERE id = ?
+            """, (int(time.time()), outbox_id))
+
+    def release_outbox_entry(self, outbox_id: int) -> bool:
+        """
+        Put a 'composing' entry back in the queue when none of its messages went out.
+
+        Used when an aborted run drops sends that were queued but never reached
+        Gmail, so the pack is retried instead of held for review.
+
+        Args:
+            outbox_id: Outbox entry ID
+
+        Returns:
+            True if the entry was returned to 'planned'
+        """
+        with self._write() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute("""
+                UPDATE outbox
+                SET status = 'planned', attempts = MAX(attempts - 1, 0), updated_at = ?
+                WHERE id = ? AND status = 'composing' AND sent_parts = '{}'
+            """, (int(time.time()), outbox_id))
+            return cursor.rowcount > 0
+
+    def mark_outbox_part_sent(self, outbox_id: int, part: int, message_id: str):
+        """
+        Record that one message of a pack was accepted by Gmail.
+
+        Args:
+            outbox_id: Outbox entry ID
+            part: 1-based message number within the pack
+            message_id: Gmail message ID
+        """
+        with self._write() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute("""
+                UPDATE outbox
+                SET sent_parts = json_set(sent_parts, '$."' || ? || '"', ?),
+                    updated_at = ?
+                WHERE id = ?
+            """, (str(part), message_id, int(time.time()), outbox_id))
+
+    def mark_outbox_sent(self, outbox_id: int):
+        """
+        Mark an entry as finished (every message sent and history recorded).
+
+        Args:
+            outbox_id: Outbox entry ID
+        """
+        with self._write() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute("""
+                UPDATE outbox
+                SET status = 'sent', error_message = NULL, next_attempt_at = NULL,
+                    updated_at = ?
+                WHERE id = ?
+            """, (int(time.time()), outbox_id))
+
+    def mark_outbox_failed(
+        self, outbox_id: int, error_message: str, retry_in_seconds: float
+    ):
+        """
+        Mark an entry as failed and schedule its next attempt.
+
+        Args:
+            outbox_id: Outbox entry ID
+            error_message: Reason for the failure
+            retry_in_seconds: Backoff before the entry is due again
+        """
+        now = int(time.time())
+        with self._write() as conn:
+            cursor = conn.cursor()
+
             cursor.execute("""
-                INSERT INTO artist_beat_history (artist_id, beat_id, sent_date)
-                VALUES (?, ?, ?)
-            """, (artist_id, beat_id, sent_date))
-            conn.commit()
-            logger.debug(f"Recorded beat {beat_id} sent to artist {artist_id}")
-        except sqlite3.IntegrityError:
-            # Already recorded, ignore
-            logger.debug(f"Beat {beat_id} to artist {artist_id} already recorded")
+                UPDATE outbox
+                SET status = 'failed', error_message = ?, next_attempt_at = ?,
+                    updated_at = ?
+                WHERE id = ?
+            """, (error_message, now + int(retry_in_seconds), now, outbox_id))
+
+    def mark_outbox_needs_review(self, outbox_id: int, error_message: str):
+        """
+        Hold an entry whose sent state is unknown, so it is not re-sent blindly.
+
+        Args:
+            outbox_id: Outbox entry ID
+            error_message: Why the sent state could not be determined
+        """
+        with self._write() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute("""
+                UPDATE outbox
+                SET status = 'needs_review', error_message = ?, next_attempt_at = NULL,
+                    updated_at = ?
+                WHERE id = ?
+            """, (error_message, int(time.time()), outbox_id))
+
+    def resolve_outbox_review(
+        self, artist_id: int, pack_number: int, sent: bool
+    ) -> bool:
+        """
+        Settle an entry held for review after checking the Sent folder by hand.
+
+        Args:
+            artist_id: Artist ID
+            pack_number: Pack number
+            sent: True if every unsent part did go out (the next run records the
+                pack), False to send the remaining parts again
+
+        Returns:
+            True if an entry was waiting for review
+        """
+        with self._write() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute("""
+                SELECT id, parts, sent_parts FROM outbox
+                WHERE idempotency_key = ? AND status = 'needs_review'
+            """, (self.outbox_key(artist_id, pack_number),))
+            row = cursor.fetchone()
+            if not row:
+                return False
+            sent_parts = json.loads(row['sent_parts'])
+            if sent:
+                for n in range(1, len(json.loads(row['parts'])) + 1):
+                    sent_parts.setdefault(str(n), 'manual')
+            cursor.execute("""
+                UPDATE outbox
+                SET status = 'planned', sent_parts = ?, error_message = NULL,
+                    updated_at = ?
+                WHERE id = ?
+            """, (json.dumps(sent_parts), int(time.time()), row['id']))
+        return True
+
+    # ========== Duplicate Prevention Operations ==========
+
+    def add_artist_beat_history(
+        self, artist_id: int, beat_id: int, sent_at: Optional[int] = None
+    ):
+        """
+        Record that a beat was sent to an artist (for duplicate prevention).
+
+        Args:
+            artist_id: Artist ID
+            beat_id: Beat ID
+            sent_at: Send time in epoch seconds (defaults to now)
+        """
+        if sent_at is None:
+            sent_at = int(time.time())
+
+        with self._write() as conn:
+            cursor = conn.cursor()
+
+            try:
+                cursor.execute("""
+                    INSERT INTO artist_beat_history (artist_id, beat_id, sent_at)
+                    VALUES (?, ?, ?)
+                """, (artist_id, beat_id, sent_at))
+                logger.debug(f"Recorded beat {beat_id} sent to artist {artist_id}")
+            except sqlite3.IntegrityError:
+                # Already recorded, ignore
+                logger.debug(f"Beat {beat_id} to artist {artist_id} already recorded")
 
     def get_recently_sent_beats(self, artist_id: int, days: int = 30) -> List[int]:
         """
@@ -415,18 +1646,66 @@ class DatabaseService:
         Returns:
             List of beat IDs
         """
-        conn = self._get_connection()
+        conn = self._read()
         cursor = conn.cursor()
 
         cursor.execute("""
             SELECT DISTINCT beat_id
             FROM artist_beat_history
-            WHERE artist_id = ?
-            AND date(sent_date) >= date('now', '-' || ? || ' days')
-        """, (artist_id, days))
+            WHERE artist_id = ? AND sent_at >= ?
+        """, (artist_id, int(time.time()) - days * 86400))
 
         return [row[0] for row in cursor.fetchall()]
 
+    def get_recently_sent_beats_for_all(self, artist_ids: Iterable[int],
+                                        days: int = 30) -> Dict[int, Set[int]]:
+        """
+        Get the beats sent within the last N days to each of many artists, in one query.
+
+        Args:
+            artist_ids: Artist IDs
+            days: Number of days to look back
+
+        Returns:
+            Dict mapping every given artist ID to the set of beat IDs sent to it
+        """
+        artist_ids = list(artist_ids)
+        result: Dict[int, Set[int]] = {artist_id: set() for artist_id in artist_ids}
+
+        conn = self._read()
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            SELECT artist_id, beat_id
+            FROM artist_beat_history
+            WHERE artist_id IN (SELECT value FROM json_each(?)) AND sent_at >= ?
+        """, (json.dumps(artist_ids), int(time.time()) - days * 86400))
+
+        for artist_id, beat_id in cursor:
+            result[artist_id].add(beat_id)
+        return result
+
+    def get_beat_exposure(self, days: int = 30) -> Dict[int, int]:
+        """
+        Count the distinct artists each beat was sent to within the last N days.
+
+        Args:
+            days: Number of days to look back
+
+        Returns:
+            Dict mapping beat ID to artist count (beats not sent are absent)
+        """
+        conn = self._read()
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            SELECT beat_id, COUNT(DISTINCT artist_id)
+            FROM artist_beat_history
+            WHERE sent_at >= ?
+            GROUP BY beat_id
+        """, (int(time.time()) - days * 86400,))
+        return {row[0]: row[1] for row in cursor.fetchall()}
+
     def get_last_send_date(self, artist_id: int) -> Optional[str]:
         """
         Get the last date an email was sent to an artist.
@@ -435,29 +1714,88 @@ class DatabaseService:
             artist_id: Artist ID
 
         Returns:
-            ISO format date string or None if never sent
+            ISO format UTC date string or None if never sent
         """
-        conn = self._get_connection()
+        conn = self._read()
         cursor = conn.cursor()
 
         cursor.execute("""
-            SELECT MAX(timestamp) as last_send
+            SELECT MAX(sent_at) as last_send
             FROM email_history
             WHERE artist_id = ?
         """, (artist_id,))
 
         row = cursor.fetchone()
         if row and row[0]:
-            return row[0]
+            return datetime.fromtimestamp(row[0], timezone.utc).isoformat()
         return None
 
+    # ========== Pack Bookkeeping ==========
+
+    def record_pack_sent(self, artist_id: int, pack_number: int, beat_ids: List[int],
+                         status: str = 'sent', error_message: Optional[str] = None,
+                         outbox_id: Optional[int] = None,
+                         retry_in_seconds: Optional[float] = None) -> int:
+        """
+        Record the outcome of a pack in one transaction.
+
+        A sent pack writes its email history row, one duplicate-prevention row
+        per beat, the artist's new pack number and closes its outbox entry; a
+        failed pack writes the history row and schedules the outbox retry.
+        Either everything is written or nothing is.
+
+        Args:
+            artist_id: Artist ID
+            pack_number: Pack number
+            beat_ids: Beat IDs in the pack
+            status: 'sent' or 'failed'
+            error_message: Error message if failed
+            outbox_id: Outbox entry to close (sent) or reschedule (failed)
+            retry_in_seconds: Backoff before a failed outbox entry is due again
+
+        Returns:
+            ID of the email history record
+        """
+        with self._write() as conn:
+            history_id = self.add_email_history(
+                artist_id, pack_number, beat_ids, status, error_message
+            )
+            if status == 'sent':
+                sent_at = int(time.time())
+                conn.executemany("""
+                    INSERT OR IGNORE INTO artist_beat_history
+                        (artist_id, beat_id, sent_at)
+                    VALUES (?, ?, ?)
+                """, [(artist_id, bid, sent_at) for bid in beat_ids])
+                self.update_artist_pack_number(artist_id, pack_number)
+                if outbox_id is not None:
+                    self.mark_outbox_sent(outbox_id)
+            elif outbox_id is not None:
+                self.mark_outbox_failed(
+                    outbox_id, error_message or status, retry_in_seconds or 0
+                )
+        return history_id
+
+    def group_commit(
+        self, max_batch: int = 20, max_delay: float = 5.0
+    ) -> "GroupCommit":
+        """
+        Batch several packs' bookkeeping into one commit.
+
+        Args:
+            max_batch: Packs per transaction
+            max_delay: Seconds a recorded pack may wait before it is committed
+
+        Returns:
+            GroupCommit; use as a context manager so the last batch is flushed
+        """
+        return GroupCommit(self, max_batch, max_delay)
+
     # ========== Utility Methods ==========
 
     def close(self):
-        """Close database connection."""
-        if self.connection:
-            self.connection.close()
-            self.connection = None
+        """Close database connections."""
+        if self._manager.close():
             logger.info("Database connection closed")
 
     def __enter__(self):
@@ -467,3 +1805,102 @@ class DatabaseService:
     def __exit__(self, exc_type, exc_val, exc_tb):
         """Context manager exit."""
         self.close()
+
+
+class GroupCommit:
+    """
+    Buffers record_pack_sent calls and writes them in shared transactions.
+
+    One fsync then covers a whole batch of artists. A timer flushes a batch
+    once its oldest pack has waited max_delay, and failed sends are written
+    at once so their retry schedule is never lost. Sent packs still in the
+    buffer are lost if the process dies; the outbox keeps per-message send
+    state, so such packs are finished (not re-sent) by the next run.
+    """
+
+    def __init__(
+        self, db: DatabaseService, max_batch: int = 20, max_delay: float = 5.0
+    ):
+        """
+        Initialize group commit buffer.
+
+        Args:
+            db: DatabaseService to write to
+            max_batch: Packs per transaction (1 commits every pack immediately)
+            max_delay: Seconds a buffered pack may wait before the batch is flushed
+        """
+        self.db = db
+        self.max_batch = max(1, max_batch)
+        self.max_delay = max_delay
+        self._pending: List[Dict[str, Any]] = []
+        self._lock = threading.RLock()
+        self._timer: Optional[threading.Timer] = None
+        self.commits = 0
+
+    def record_pack_sent(
+        self, artist_id: int, pack_number: int, beat_ids: List[int], **kwargs
+    ):
+        """
+        Queue a DatabaseService.record_pack_sent call.
+
+        The batch is flushed once it is full, when its oldest pack has waited
+        max_delay seconds, or right away when this pack failed.
+
+        Args:
+            artist_id: Artist ID
+            pack_number: Pack number
+            beat_ids: Beat IDs in the pack
+            **kwargs: Remaining record_pack_sent arguments
+        """
+        with self._lock:
+            self._pending.append(dict(
+                artist_id=artist_id, pack_number=pack_number, beat_ids=beat_ids,
+                **kwargs
+            ))
+            failed = kwargs.get("status", "sent") != "sent"
+            if failed or len(self._pending) >= self.max_batch:
+                self.flush()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.max_delay, self._flush_on_timer)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _flush_on_timer(self) -> None:
+        try:
+            self.flush()
+        except Exception as e:
+            # The records stay buffered for the next flush
+            logger.error(f"Group commit timer flush failed: {e}")
+
+    def flush(self) -> int:
+        """
+        Write every buffered pack in one transaction.
+
+        Returns:
+            Number of packs written
+        """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._pending:
+                return 0
+            batch, self._pending = self._pending, []
+            try:
+                with self.db._write():
+                    for record in batch:
+                        self.db.record_pack_sent(**record)
+            except Exception:
+                self._pending = batch + self._pending
+                raise
+            self.commits += 1
+        logger.debug(f"Group commit: {len(batch)} pack(s) in one transaction")
+        return len(batch)
+
+    def __enter__(self):
+        """Context manager entry."""
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Flush remaining records, even when the send loop failed."""
+        self.flush()
@@ -3,7 +3,7 @@ Email template service for generating personalized email content.
 Handles placeholder replacement and formatting.
 """
 from pathlib import Path
-from typing import List, Optional
+from typing import List, Optional, Tuple
 import yaml
 
 
@@ -33,20 +33,40 @@ class EmailTemplateService:
         """Format beat names as a simple comma-separated list."""
         return ", ".join(beat_names)
 
-    def generate_body(self, artist_name: str, beat_names: List[str]) -> str:
+    def format_beat_links(self, beat_links: List[Tuple[str, str]]) -> str:
+        """Format (beat name, URL) pairs as one line per beat."""
+        return "\n".join(f"- {name}: {url}" for name, url in beat_links)
+
+    def generate_body(
+        self,
+        artist_name: str,
+        beat_names: List[str],
+        beat_links: Optional[List[Tuple[str, str]]] = None,
+    ) -> str:
         """
         Generate email body with placeholders replaced.
 
         Args:
             artist_name: Artist display name
             beat_names: List of beat names to include
+            beat_links: (beat name, Drive URL) pairs for beats delivered as links.
+                Rendered at {beat_links} if the template has it, otherwise in place
+                of {beat_list} after the names of the beats that are attached.
 
         Returns:
             Rendered email body
         """
         template = self.load_template()
-        beat_list_str = self.format_beat_list(beat_names)
-        body = template.replace("{artist_name}", artist_name).replace(
-            "{beat_list}", beat_list_str
-        )
-        return body
+        body = template.replace("{artist_name}", artist_name)
+        if beat_links:
+            links_str = self.format_beat_links(beat_links)
+            if "{beat_links}" in body:
+                body = body.replace("{beat_links}", links_str)
+            else:
+                linked_names = {name for name, _ in beat_links}
+                attached = [n for n in beat_names if n not in linked_names]
+                if attached:
+                    links_str = f"{self.format_beat_list(attached)}\n{links_str}"
+                body = body.replace("{beat_list}", links_str)
+        body = body.replace("{beat_list}", self.format_beat_list(beat_names))
+        return body.replace("{beat_links}", "")
@@ -2,22 +2,34 @@
 Gmail service for sending emails with attachments.
 Handles authentication, email composition, and rate limiting.
 """
-import base64
-import time
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from email.mime.base import MIMEBase
-from email import encoders
+import os
 from pathlib import Path
-from typing import List, Optional, Dict, Any
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
 import yaml
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
-from services.auth_service import get_credentials
+from googleapiclient.http import MediaIoBaseUpload
+from services.auth_service import build_service
+from services.mime_builder_service import EncodedPartCache, StreamingMessageWriter
+from services.rate_limiter_service import TokenBucketRateLimiter
 from utils.logger import setup_logger
 
 logger = setup_logger(__name__)
 
+# Messages above this size are sent with a resumable upload
+RESUMABLE_THRESHOLD = 5 * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+def is_quota_error(error: HttpError) -> bool:
+    """True for 429 responses and 403 rateLimitExceeded/userRateLimitExceeded errors."""
+    status = getattr(error.resp, "status", None)
+    if status == 429:
+        return True
+    content = error.content or b""
+    if isinstance(content, str):
+        content = content.encode("utf-8", "replace")
+    return status == 403 and b"ratelimitexceeded" in content.lower()
+
 
 class GmailService:
     """Service for sending emails via Gmail API."""
@@ -25,24 +37,49 @@ class GmailService:
     def __init__(
         self,
         rate_limit_delay: float = 2.0,
-        batch_pause_every: int = 10,
-        batch_pause_seconds: int = 30,
+        burst: int = 10,
+        rate_limit_state: Optional[str] = None,
+        max_retries: int = 3,
+        encoded_cache_bytes: int = 256 * 1024 * 1024,
+        limiter: Optional[TokenBucketRateLimiter] = None,
+        send_workers: int = 1,
     ):
         """
         Initialize Gmail service.
 
         Args:
-            rate_limit_delay: Seconds between each email
-            batch_pause_every: Pause every N emails
-            batch_pause_seconds: Seconds to pause between batches
+            rate_limit_delay: Sustained pace, in seconds per email
+            burst: Emails that may be sent back to back before pacing kicks in
+            rate_limit_state: JSON file so back-to-back runs share one send budget
+            max_retries: Retries per message after quota (429/rateLimitExceeded) errors
+            encoded_cache_bytes: Memory budget for cached base64 attachment parts
+                (0 disables)
+            limiter: Existing rate limiter to share (overrides the pacing arguments)
+            send_workers: Suggested number of concurrent sender threads
+                (see SendExecutor)
+        """
+        self.part_cache = (
+            EncodedPartCache(encoded_cache_bytes) if encoded_cache_bytes else None
+        )
+        self.writer = StreamingMessageWriter(part_cache=self.part_cache)
+        rate = 1.0 / rate_limit_delay if rate_limit_delay > 0 else float("inf")
+        self.limiter = limiter or TokenBucketRateLimiter(
+            rate_per_second=rate,
+            burst=burst,
+            state_path=rate_limit_state,
+        )
+        self.max_retries = max_retries
+        self.send_workers = send_workers
+
+    @property
+    def service(self):
         """
-        creds = get_credentials()
-        if not creds:
-            raise ValueError("Authentication required. Run 'python main.py configure' first.")
-        self.service = build("gmail", "v1", credentials=creds)
-        self.rate_limit_delay = rate_limit_delay
-        self.batch_pause_every = batch_pause_every
-        self.batch_pause_seconds = batch_pause_seconds
+        Gmail client for the calling thread.
+
+        The HTTP transport is not thread-safe, so each sender thread gets its
+        own client; the writer, part cache and rate limiter are shared.
+        """
+        return build_service("gmail", "v1")
 
     @classmethod
     def from_config(cls) -> "GmailService":
@@ -51,56 +88,87 @@ class GmailService:
         with open(config_path, "r") as f:
             config = yaml.safe_load(f)
         gmail_config = config["gmail"]
+        state_path = Path(__file__).parent.parent / gmail_config.get(
+            "rate_limit_state", "database/rate_limit_state.json"
+        )
         return cls(
             rate_limit_delay=gmail_config.get("rate_limit_delay", 2),
-            batch_pause_every=10,
-            batch_pause_seconds=config["gmail"].get("batch_pause", 30),
+            burst=gmail_config.get("burst", 10),
+            rate_limit_state=str(state_path),
+            max_retries=gmail_config.get("max_retries", 3),
+            encoded_cache_bytes=int(gmail_config.get("encoded_cache_mb", 256))
+            * 1024 * 1024,
+            send_workers=gmail_config.get("send_workers", 2),
         )
 
-    def _create_message(
+    def _spool_message(
         self,
         to: str,
         subject: str,
         body_text: str,
         attachments: Optional[List[Dict[str, Any]]] = None,
-    ) -> Dict[str, str]:
+        headers: Optional[Dict[str, str]] = None,
+    ) -> Tuple[BinaryIO, int]:
         """
-        Create a MIME message for sending.
+        Compose a MIME message into a spooled temp file.
+
+        Attachments are base64-encoded chunk by chunk, so the message is never
+        held in memory as a whole.
 
         Args:
             to: Recipient email
             subject: Subject line
             body_text: Plain text body
-            attachments: List of {"filename": str, "content": bytes} or {"filename": str, "path": str}
+            attachments: List of {"filename": str, "content": bytes-like,
+                "key": optional str} or {"filename": str, "path": str}
+            headers: Extra top-level headers
 
         Returns:
-            Dict with 'raw' key (base64url encoded message)
+            Tuple of (file positioned at the start, size in bytes)
+        """
+        return self.writer.spool(to, subject, body_text, attachments, headers)
+
+    def send_message_file(self, fh: BinaryIO, size: int) -> Dict[str, Any]:
         """
-        message = MIMEMultipart()
-        message["to"] = to
-        message["subject"] = subject
-        message.attach(MIMEText(body_text, "plain"))
-
-        if attachments:
-            for att in attachments:
-                filename = att.get("filename", "attachment")
-                content = att.get("content")
-                if content is None and "path" in att:
-                    with open(att["path"], "rb") as f:
-                        content = f.read()
-                if content is None:
+        Upload a complete RFC 822 message through the Gmail media upload endpoint.
+
+        Small messages go as a single uploadType=media request; larger ones use
+        a resumable upload in chunks. Waits on the rate limiter before each
+        attempt and retries quota errors with exponential backoff.
+
+        Args:
+            fh: Readable binary file positioned at the start of the message
+            size: Message size in bytes
+
+        Returns:
+            Gmail API response (includes 'id')
+
+        Raises:
+            HttpError: If API call fails
+        """
+        start = fh.tell()
+        attempt = 0
+        while True:
+            self.limiter.acquire()
+            fh.seek(start)
+            media = MediaIoBaseUpload(
+                fh,
+                mimetype="message/rfc822",
+                chunksize=UPLOAD_CHUNK_SIZE,
+                resumable=size > RESUMABLE_THRESHOLD,
+            )
+            try:
+                sent = self.service.users().messages().send(
+                    userId="me", media_body=media
+                ).execute()
+            except HttpError as error:
+                if attempt < self.max_retries and is_quota_error(error):
+                    attempt += 1
+                    self.limiter.on_quota_error()
                     continue
-                part = MIMEBase("application", "octet-stream")
-                part.set_payload(content)
-                encoders.encode_base64(part)
-                part.add_header(
-                    "Content-Disposition",
-                    f'attachment; filename="{filename}"',
-                )
-                message.attach(part)
-
-        raw = base64.urlsafe_b64encode(message.as_bytes()).decode("utf-8")
-        return {"raw": raw}
+                raise
+            self.limiter.on_success()
+            return sent
 
     def send_email(
         self,
@@ -108,6 +176,7 @@ class GmailService:
         subject: str,
         body: str,
         attachments: Optional[List[Dict[str, Any]]] = None,
+        message_id: Optional[str] = None,
     ) -> Optional[str]:
         """
         Send an email via Gmail API.
@@ -117,22 +186,65 @@ class GmailService:
             subject: Subject line
             body: Plain text body
             attachments: Optional list of attachments
+            message_id: RFC 822 Message-ID to set, so the send can be found
+                again with find_sent_message after a crash
 
         Returns:
-            Message ID if sent, None on failure
+            Gmail message ID if sent, None on failure
         """
+        headers = {"Message-ID": message_id} if message_id else None
+        fh, size = self._spool_message(to, subject, body, attachments, headers)
         try:
-            msg = self._create_message(to, subject, body, attachments)
-            sent = self.service.users().messages().send(userId="me", body=msg).execute()
-            logger.info(f"Email sent to {to}, message id: {sent.get('id')}")
+            sent = self.send_message_file(fh, size)
+            logger.info(
+                f"Email sent to {to} ({size} bytes), message id: {sent.get('id')}"
+            )
             return sent.get("id")
         except HttpError as error:
             logger.error(f"Failed to send to {to}: {error}")
             return None
+        finally:
+            fh.close()
+
+    def send_file(self, path: str, to: str) -> Optional[str]:
+        """
+        Send a message composed earlier (e.g. by MessageSpool).
+
+        Args:
+            path: RFC 822 message file
+            to: Recipient email, for logging
+
+        Returns:
+            Gmail message ID if sent, None on failure
+        """
+        try:
+            with open(path, "rb") as fh:
+                size = os.fstat(fh.fileno()).st_size
+                sent = self.send_message_file(fh, size)
+        except (HttpError, OSError) as error:
+            logger.error(f"Failed to send {path} to {to}: {error}")
+            return None
+        logger.info(
+            f"Spooled email sent to {to} ({size} bytes), message id: {sent.get('id')}"
+        )
+        return sent.get("id")
 
-    def apply_rate_limit(self, email_index: int) -> None:
-        """Apply delay between emails; longer pause every N emails."""
-        time.sleep(self.rate_limit_delay)
-        if self.batch_pause_every and (email_index + 1) % self.batch_pause_every == 0:
-            logger.info(f"Batch pause: waiting {self.batch_pause_seconds}s...")
-            time.sleep(self.batch_pause_seconds)
+    def find_sent_message(self, message_id: str) -> Optional[str]:
+        """
+        Look up a message sent earlier by its RFC 822 Message-ID.
+
+        Args:
+            message_id: Message-ID header value passed to send_email
+
+        Returns:
+            Gmail message ID if the message exists, None otherwise
+
+        Raises:
+            HttpError: If the lookup fails (e.g. 403 when the token only has
+                gmail.send); the message may or may not have been sent
+        """
+        response = self.service.users().messages().list(
+            userId="me", q=f"rfc822msgid:{message_id}", includeSpamTrash=True
+        ).execute()
+        messages = response.get("messages") or []
+        return messages[0]["id"] if messages else None
@@ -2,14 +2,17 @@
 Google Drive service for accessing vault folder.
 Handles authentication, listing artists, and fetching beat files.
 """
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from pathlib import Path
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 from googleapiclient.http import MediaIoBaseDownload
 import io
+import os
+import tempfile
+import threading
 import yaml
-from services.auth_service import get_credentials
+from services.auth_service import build_service
+from services.beat_cache_service import Buffer, BeatFileCache, map_file_readonly
 from utils.logger import setup_logger
 
 logger = setup_logger(__name__)
@@ -18,18 +21,16 @@ logger = setup_logger(__name__)
 class GoogleDriveService:
     """Service for interacting with Google Drive API."""
 
-    def __init__(self, vault_folder_id: Optional[str] = None):
+    def __init__(self, vault_folder_id: Optional[str] = None,
+                 cache: Optional[BeatFileCache] = None):
         """
         Initialize Google Drive service.
 
         Args:
             vault_folder_id: Google Drive folder ID. If None, loads from config.
+            cache: Optional on-disk cache used by download_file
         """
-        creds = get_credentials()
-        if not creds:
-            raise ValueError("Authentication required. Run 'python main.py configure' first.")
-
-        self.drive_service = build('drive', 'v3', credentials=creds)
+        self.drive_service = build_service('drive', 'v3')
 
         if vault_folder_id is None:
             config_path = Path(__file__).parent.parent / 'config' / 'config.yaml'
@@ -38,8 +39,21 @@ class GoogleDriveService:
             vault_folder_id = config['drive']['vault_folder_id']
 
         self.vault_folder_id = vault_folder_id
+        self.cache = cache
+        # Temp files still mapped when download_stream tried to delete them
+        self._leftover_temps: List[str] = []
+        self._leftover_lock = threading.Lock()
         logger.info(f"Google Drive service initialized for folder: {vault_folder_id}")
 
+    def _thread_service(self):
+        """
+        Return a Drive client safe to use from the calling thread.
+
+        The underlying HTTP transport is not thread-safe, so worker threads
+        (e.g. the download prefetcher) each get their own client.
+        """
+        return build_service('drive', 'v3')
+
     def get_folder_permissions(self) -> List[Dict[str, str]]:
         """
         Get list of users with access to the vault folder (artists).
@@ -94,6 +108,8 @@ class GoogleDriveService:
             - size: File size in bytes
             - mimeType: MIME type
             - modifiedTime: Last modified timestamp
+            - createdTime: Upload timestamp
+            - md5Checksum: MD5 of the file contents
 
         Raises:
             HttpError: If API call fails
@@ -108,7 +124,8 @@ class GoogleDriveService:
             while True:
                 results = self.drive_service.files().list(
                     q=query,
-                    fields='nextPageToken, files(id, name, size, mimeType, modifiedTime)',
+                    fields='nextPageToken, files(id, name, size, mimeType, '
+                           'modifiedTime, createdTime, md5Checksum)',
                     pageToken=page_token,
                     orderBy='name'
                 ).execute()
@@ -127,12 +144,75 @@ class GoogleDriveService:
             logger.error(f"Error listing beat files: {error}")
             raise
 
-    def download_file(self, file_id: str) -> bytes:
+    def get_start_page_token(self) -> str:
+        """
+        Get the current Drive changes page token.
+
+        Returns:
+            Token marking "now" in the changes feed
+
+        Raises:
+            HttpError: If API call fails
+        """
+        try:
+            result = self.drive_service.changes().getStartPageToken().execute()
+            return result['startPageToken']
+        except HttpError as error:
+            logger.error(f"Error getting changes start page token: {error}")
+            raise
+
+    def list_changes(self, page_token: str) -> Tuple[List[Dict[str, Any]], str]:
+        """
+        List all Drive changes since a page token.
+
+        Args:
+            page_token: Token from get_start_page_token or a previous call
+
+        Returns:
+            Tuple of (changes, new_start_page_token). Each change has 'fileId',
+            'removed' and, unless removed, 'file' with id, name, size, mimeType,
+            modifiedTime, createdTime, md5Checksum, parents and trashed.
+
+        Raises:
+            HttpError: If API call fails (e.g. the token has expired)
+        """
+        try:
+            changes = []
+            new_start_page_token = None
+
+            while page_token:
+                results = self.drive_service.changes().list(
+                    pageToken=page_token,
+                    spaces='drive',
+                    includeRemoved=True,
+                    fields='nextPageToken, newStartPageToken, changes(fileId, removed, '
+                           'file(id, name, size, mimeType, modifiedTime, createdTime, '
+                           'md5Checksum, parents, trashed))'
+                ).execute()
+
+                changes.extend(results.get('changes', []))
+                new_start_page_token = results.get(
+                    'newStartPageToken', new_start_page_token
+                )
+                page_token = results.get('nextPageToken')
+
+            logger.info(f"Found {len(changes)} Drive changes since last sync")
+            return changes, new_start_page_token
+
+        except HttpError as error:
+            logger.error(f"Error listing Drive changes: {error}")
+            raise
+
+    def download_file(self, file_id: str, version: Optional[str] = None) -> bytes:
         """
         Download a file from Google Drive.
 
+        When a cache is configured and a version is given, unchanged files are
+        read from disk instead of being downloaded again.
+
         Args:
             file_id: Google Drive file ID
+            version: md5Checksum or modifiedTime of the file (enables caching)
 
         Returns:
             File contents as bytes
@@ -140,8 +220,13 @@ class GoogleDriveService:
         Raises:
             HttpError: If API call fails
         """
+        if self.cache is not None and version:
+            cached = self.cache.get(file_id, version)
+            if cached is not None:
+                return cached
+
         try:
-            request = self.drive_service.files().get_media(fileId=file_id)
+            request = self._thread_service().files().get_media(fileId=file_id)
             file_content = io.BytesIO()
             downloader = MediaIoBaseDownload(file_content, request)
 
@@ -151,15 +236,99 @@ class GoogleDriveService:
                 if status:
                     logger.debug(f"Download progress: {int(status.progress() * 100)}%")
 
-            file_content.seek(0)
-            content = file_content.read()
+            content = file_content.getvalue()
             logger.info(f"Downloaded file {file_id} ({len(content)} bytes)")
+            if self.cache is not None and version:
+                self.cache.put(file_id, version, content)
             return content
 
         except HttpError as error:
             logger.error(f"Error downloading file {file_id}: {error}")
             raise
 
+    def download_stream(self, file_id: str, version: Optional[str] = None) -> Buffer:
+        """
+        Download a file straight to disk and return it as a read-only memory map.
+
+        Chunks are written to a temp file as they arrive (inside the cache
+        directory when a cache is configured, so the finished file becomes the
+        cache entry), so the file is never held in memory as a whole.
+
+        Args:
+            file_id: Google Drive file ID
+            version: md5Checksum or modifiedTime of the file (enables caching)
+
+        Returns:
+            Read-only mmap of the contents (b"" for an empty file)
+
+        Raises:
+            HttpError: If API call fails
+        """
+        use_cache = self.cache is not None and bool(version)
+        if use_cache:
+            cached = self.cache.open_mapped(file_id, version)
+            if cached is not None:
+                return cached
+            tmp_name = self.cache.reserve_temp()
+        else:
+            fd, tmp_name = tempfile.mkstemp(prefix="beat-", suffix=".part")
+            os.close(fd)
+
+        try:
+            request = self._thread_service().files().get_media(fileId=file_id)
+            with open(tmp_name, "wb") as fh:
+                downloader = MediaIoBaseDownload(fh, request)
+                done = False
+                while not done:
+                    status, done = downloader.next_chunk()
+                    if status:
+                        progress = int(status.progress() * 100)
+                        logger.debug(f"Download progress: {progress}%")
+
+            path = tmp_name
+            if use_cache:
+                path = self.cache.commit_temp(file_id, version, tmp_name)
+            buffer = map_file_readonly(path)
+            logger.info(f"Downloaded file {file_id} ({len(buffer)} bytes, streamed)")
+            return buffer
+
+        except HttpError as error:
+            logger.error(f"Error downloading file {file_id}: {error}")
+            raise
+
+        finally:
+            # Uncached temp files are unlinked right away; the mapping stays valid
+            if not use_cache or os.path.exists(tmp_name):
+                try:
+                    os.unlink(tmp_name)
+                except OSError:
+                    # Windows refuses to delete a mapped file; retried by
+                    # remove_temp_files once the mapping is closed
+                    with self._leftover_lock:
+                        self._leftover_temps.append(tmp_name)
+
+    def remove_temp_files(self) -> int:
+        """
+        Delete download temp files that could not be removed while mapped.
+
+        Call after the buffers returned by download_stream have been closed.
+
+        Returns:
+            Number of files removed
+        """
+        with self._leftover_lock:
+            pending, self._leftover_temps = self._leftover_temps, []
+        removed = 0
+        for tmp_name in pending:
+            try:
+                os.unlink(tmp_name)
+                removed += 1
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Could not remove temp file {tmp_name}: {e}")
+        return removed
+
     def get_file_metadata(self, file_id: str) -> Dict[str, Any]:
         """
         Get metadata for a specific file.
@@ -185,6 +354,48 @@ class GoogleDriveService:
             logger.error(f"Error getting file metadata for {file_id}: {error}")
             raise
 
+    @staticmethod
+    def get_file_link(file_id: str) -> str:
+        """
+        Get the browser link for a Drive file.
+
+        Args:
+            file_id: Google Drive file ID
+
+        Returns:
+            URL that opens the file in Drive
+        """
+        return f"https://drive.google.com/file/d/{file_id}/view"
+
+    def grant_read_access(self, file_id: str, email: str) -> bool:
+        """
+        Give a user read access to a single file, without a notification email.
+
+        Artists normally already have access through the vault folder; this is
+        for beats shared from outside it. Needs the full Drive scope
+        (https://www.googleapis.com/auth/drive), not drive.readonly.
+
+        Args:
+            file_id: Google Drive file ID
+            email: User to grant access to
+
+        Returns:
+            True if access was granted, False otherwise
+        """
+        try:
+            self.drive_service.permissions().create(
+                fileId=file_id,
+                body={'type': 'user', 'role': 'reader', 'emailAddress': email},
+                sendNotificationEmail=False,
+                fields='id'
+            ).execute()
+            logger.debug(f"Granted {email} read access to {file_id}")
+            return True
+
+        except HttpError as error:
+            logger.warning(f"Could not grant {email} access to {file_id}: {error}")
+            return False
+
     def verify_folder_access(self) -> bool:
         """
         Verify that we have access to the vault folder.
@@ -0,0 +1,259 @@
+"""
+MIME builder service for composing large emails without holding them in memory.
+Writes multipart messages to a spooled temp file, base64-encoding attachments
+chunk by chunk, ready for the Gmail media upload endpoint. Encoded attachment
+parts can be cached so shared beats are only encoded once per run.
+"""
+import base64
+import hashlib
+import tempfile
+import threading
+import uuid
+from collections import OrderedDict
+from email.header import Header
+from email.mime.text import MIMEText
+from email.utils import encode_rfc2231
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+CRLF = b"\r\n"
+# 57 raw bytes encode to exactly one 76-character base64 line
+RAW_LINE_BYTES = 57
+CHUNK_LINES = 1024
+
+
+def _header(name: str, value: str) -> bytes:
+    """Format one header line, RFC 2047-encoding non-ASCII values."""
+    try:
+        value.encode("ascii")
+    except UnicodeEncodeError:
+        value = Header(value, "utf-8").encode()
+    return f"{name}: {value}".encode("ascii") + CRLF
+
+
+def _disposition(filename: str) -> bytes:
+    """Content-Disposition header for an attachment (RFC 2231 for non-ASCII names)."""
+    try:
+        filename.encode("ascii")
+        param = f'filename="{filename}"'
+    except UnicodeEncodeError:
+        param = f"filename*={encode_rfc2231(filename, 'utf-8')}"
+    return f"Content-Disposition: attachment; {param}".encode("ascii") + CRLF
+
+
+def iter_base64_lines(
+    content: Any, chunk_size: int = RAW_LINE_BYTES * CHUNK_LINES
+) -> Iterator[bytes]:
+    """
+    Base64-encode a buffer or binary file in chunks of whole 76-character lines.
+
+    Args:
+        content: bytes-like object (bytes, mmap, memoryview) or readable binary file
+        chunk_size: Raw bytes per chunk; must be a multiple of 57
+
+    Yields:
+        CRLF-terminated base64 lines, several at a time
+    """
+    is_buffer = isinstance(content, (bytes, bytearray, memoryview))
+    if hasattr(content, "read") and not is_buffer:
+        while True:
+            chunk = content.read(chunk_size)
+            if not chunk:
+                break
+            yield base64.encodebytes(chunk).replace(b"\n", CRLF)
+        return
+
+    view = memoryview(content)
+    for start in range(0, len(view), chunk_size):
+        yield base64.encodebytes(view[start:start + chunk_size]).replace(b"\n", CRLF)
+
+
+def attachment_headers(filename: str) -> bytes:
+    """Header block (with the blank separator line) for a base64 attachment part."""
+    return (
+        _header("Content-Type", "application/octet-stream")
+        + _header("MIME-Version", "1.0")
+        + _header("Content-Transfer-Encoding", "base64")
+        + _disposition(filename)
+        + CRLF
+    )
+
+
+class EncodedPartCache:
+    """LRU cache of fully encoded attachment parts, ready to splice into messages."""
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024):
+        """
+        Initialize encoded part cache.
+
+        Args:
+            max_bytes: Memory budget for encoded parts; least recently used are
+                dropped above it
+        """
+        self.max_bytes = max_bytes
+        self._parts: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def content_key(content: Any) -> str:
+        """Hash a buffer's contents (used when the caller has no stable key)."""
+        return hashlib.blake2b(memoryview(content), digest_size=20).hexdigest()
+
+    def get_or_encode(
+        self, filename: str, content: Any, key: Optional[str] = None
+    ) -> bytes:
+        """
+        Return the encoded MIME part for an attachment, encoding it on first use.
+
+        Args:
+            filename: Attachment filename (part of the cached headers)
+            content: bytes-like attachment contents
+            key: Stable identity for the contents (e.g. Drive file ID and version);
+                 falls back to a hash of the contents
+
+        Returns:
+            Attachment headers followed by CRLF-terminated base64 lines
+        """
+        cache_key = (key or self.content_key(content), filename)
+        with self._lock:
+            part = self._parts.get(cache_key)
+            if part is not None:
+                self._parts.move_to_end(cache_key)
+                self.hits += 1
+                return part
+
+        part = attachment_headers(filename) + b"".join(iter_base64_lines(content))
+
+        with self._lock:
+            self.misses += 1
+            if len(part) <= self.max_bytes and cache_key not in self._parts:
+                self._parts[cache_key] = part
+                self._size += len(part)
+                while self._size > self.max_bytes:
+                    _, evicted = self._parts.popitem(last=False)
+                    self._size -= len(evicted)
+        return part
+
+    @property
+    def size_bytes(self) -> int:
+        """Bytes of encoded parts currently cached."""
+        return self._size
+
+
+class StreamingMessageWriter:
+    """Writes multipart/mixed MIME messages incrementally to a file object."""
+
+    def __init__(self, spool_max_size: int = 1024 * 1024,
+                 part_cache: Optional[EncodedPartCache] = None):
+        """
+        Initialize message writer.
+
+        Args:
+            spool_max_size: Messages larger than this spill from memory to a temp file
+            part_cache: Optional cache of encoded attachment parts shared across
+                messages
+        """
+        self.spool_max_size = spool_max_size
+        self.part_cache = part_cache
+
+    def write(
+        self,
+        fh: BinaryIO,
+        to: str,
+        subject: str,
+        body_text: str,
+        attachments: Optional[List[Dict[str, Any]]] = None,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> int:
+        """
+        Write a complete message to a binary file object.
+
+        Args:
+            fh: Writable binary file
+            to: Recipient email
+            subject: Subject line
+            body_text: Plain text body
+            attachments: List of {"filename": str, "content": bytes-like,
+                "key": optional str} or {"filename": str, "path": str}. With a
+                part cache, in-memory contents are encoded once and spliced into
+                later messages.
+            headers: Extra top-level headers (e.g. Message-ID)
+
+        Returns:
+            Number of bytes written
+        """
+        boundary = f"==============={uuid.uuid4().hex}=="
+        delimiter = b"--" + boundary.encode("ascii")
+        written = 0
+
+        def emit(data: bytes):
+            nonlocal written
+            fh.write(data)
+            written += len(data)
+
+        emit(_header("Content-Type", f'multipart/mixed; boundary="{boundary}"'))
+        emit(_header("MIME-Version", "1.0"))
+        emit(_header("to", to))
+        emit(_header("subject", subject))
+        for name, value in (headers or {}).items():
+            emit(_header(name, value))
+        emit(CRLF)
+
+        text_part = MIMEText(body_text, "plain", "utf-8").as_bytes()
+        text_part = text_part.replace(b"\n", CRLF)
+        emit(delimiter + CRLF + text_part + CRLF)
+
+        for att in attachments or []:
+            filename = att.get("filename", "attachment")
+            content = att.get("content")
+            if content is None and "path" in att:
+                with open(att["path"], "rb") as f:
+                    emit(delimiter + CRLF)
+                    emit(attachment_headers(filename))
+                    for lines in iter_base64_lines(f):
+                        emit(lines)
+                continue
+            if content is None:
+                continue
+            emit(delimiter + CRLF)
+            if self.part_cache is not None:
+                emit(self.part_cache.get_or_encode(filename, content, att.get("key")))
+                continue
+            emit(attachment_headers(filename))
+            for lines in iter_base64_lines(content):
+                emit(lines)
+
+        emit(delimiter + b"--" + CRLF)
+        return written
+
+    def spool(
+        self,
+        to: str,
+        subject: str,
+        body_text: str,
+        attachments: Optional[List[Dict[str, Any]]] = None,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> Tuple[BinaryIO, int]:
+        """
+        Write a message to a spooled temp file.
+
+        Args:
+            to: Recipient email
+            subject: Subject line
+            body_text: Plain text body
+            attachments: Attachments as accepted by write()
+            headers: Extra top-level headers
+
+        Returns:
+            Tuple of (file positioned at the start, size in bytes). Caller
+            closes the file.
+        """
+        fh = tempfile.SpooledTemporaryFile(max_size=self.spool_max_size)
+        size = self.write(fh, to, subject, body_text, attachments, headers)
+        fh.seek(0)
+        return fh, size
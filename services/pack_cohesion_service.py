@@ -0,0 +1,218 @@
+"""
+Pack cohesion service for building harmonically coherent beat packs.
+Maps parsed keys onto the Camelot wheel and precomputes an inverted index
+(style and key groups sorted by BPM), so a cohesive pack is a few bisects
+and set lookups rather than a scan over every beat.
+"""
+import random
+import re
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+KEY_PATTERN = re.compile(r"^([A-G])([#b]?)\s*(major|maj|minor|min|m)?$", re.IGNORECASE)
+PITCH_CLASSES = {"C": 0, "D": 2, "E": 4, "F": 5, "G": 7, "A": 9, "B": 11}
+
+
+def camelot_code(key: Optional[str]) -> Optional[str]:
+    """
+    Camelot wheel code of a musical key.
+
+    Args:
+        key: Key as written in beat filenames (e.g. "Cmin", "F#maj", "Bbm", "A")
+
+    Returns:
+        Code such as "5A" (minor) or "8B" (major), or None if unrecognised
+    """
+    if not key:
+        return None
+    match = KEY_PATTERN.match(key.strip().replace("♯", "#").replace("♭", "b"))
+    if not match:
+        return None
+    letter, accidental, quality = match.groups()
+    pitch = PITCH_CLASSES[letter.upper()] + {"#": 1, "b": -1}.get(accidental, 0)
+    # "m" is minor but "M" is major; spelled-out qualities are case-insensitive
+    minor = quality is not None and (
+        quality == "m" or quality.lower() in ("min", "minor")
+    )
+    # Each step of a fifth is one step round the wheel; A minor and C major are 8A/8B
+    number = (pitch * 7 + (4 if minor else 7)) % 12 + 1
+    return f"{number}{'A' if minor else 'B'}"
+
+
+def compatible_codes(code: str) -> List[str]:
+    """
+    Keys that mix with a Camelot code: itself, its neighbours and its relative key.
+
+    Args:
+        code: Camelot code (e.g. "8A")
+
+    Returns:
+        List of four Camelot codes
+    """
+    number, letter = int(code[:-1]), code[-1]
+    other = "B" if letter == "A" else "A"
+    return [
+        code,
+        f"{number % 12 + 1}{letter}",
+        f"{(number - 2) % 12 + 1}{letter}",
+        f"{number}{other}",
+    ]
+
+
+class _BpmGroup:
+    """Beat IDs sorted by BPM, for range lookups."""
+
+    __slots__ = ("bpms", "ids")
+
+    def __init__(self, members: List[Tuple[int, int]]):
+        members.sort()
+        self.bpms = [bpm for bpm, _ in members]
+        self.ids = [beat_id for _, beat_id in members]
+
+    def window(self, bpm: int, tolerance: int) -> Tuple[List[int], int, int]:
+        start = bisect_left(self.bpms, bpm - tolerance)
+        stop = bisect_right(self.bpms, bpm + tolerance)
+        return self.ids, start, stop
+
+
+class CohesionIndex:
+    """Inverted index over beats by style, Camelot key and BPM."""
+
+    def __init__(self, beats: Iterable[Dict[str, Any]], bpm_tolerance: int = 6):
+        """
+        Build the index.
+
+        Args:
+            beats: Beat dictionaries (id, bpm, key, style_category)
+            bpm_tolerance: Largest BPM difference from the pack's first beat
+        """
+        self.bpm_tolerance = bpm_tolerance
+        self.ids: List[int] = []
+        self.meta: Dict[int, Tuple[Optional[str], Optional[str], Optional[int]]] = {}
+        by_style_key: Dict[Tuple[str, str], List[Tuple[int, int]]] = {}
+        by_key: Dict[str, List[Tuple[int, int]]] = {}
+        by_style: Dict[str, List[int]] = {}
+        for beat in beats:
+            beat_id = beat["id"]
+            style = (beat.get("style_category") or "").strip().lower() or None
+            code = camelot_code(beat.get("key"))
+            bpm = beat.get("bpm")
+            self.ids.append(beat_id)
+            self.meta[beat_id] = (style, code, bpm)
+            if style:
+                by_style.setdefault(style, []).append(beat_id)
+            if code and bpm is not None:
+                by_key.setdefault(code, []).append((bpm, beat_id))
+                if style:
+                    by_style_key.setdefault((style, code), []).append((bpm, beat_id))
+        self.by_style_key = {k: _BpmGroup(v) for k, v in by_style_key.items()}
+        self.by_key = {k: _BpmGroup(v) for k, v in by_key.items()}
+        self.by_style = by_style
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def candidates(
+        self, anchor_id: int, same_style: bool = True
+    ) -> List[Tuple[List[int], int, int]]:
+        """
+        Slices of beats that fit with an anchor beat.
+
+        Args:
+            anchor_id: Beat the pack is built around
+            same_style: Require the anchor's style as well as key and BPM
+
+        Returns:
+            List of (ids, start, stop) slices; empty if the anchor lacks metadata
+        """
+        style, code, bpm = self.meta[anchor_id]
+        if code is None or bpm is None or (same_style and style is None):
+            return []
+        slices = []
+        for compatible in compatible_codes(code):
+            if same_style:
+                group = self.by_style_key.get((style, compatible))
+            else:
+                group = self.by_key.get(compatible)
+            if group is not None:
+                slices.append(group.window(bpm, self.bpm_tolerance))
+        return slices
+
+    def build_pack(
+        self, count: int, excluded: Set[int], rng: Any = random
+    ) -> List[int]:
+        """
+        Pick a pack around a random anchor, relaxing constraints only as needed.
+
+        Beats are taken first from the anchor's style with a compatible key
+        within the BPM tolerance, then from any style with a compatible key and
+        BPM, then from the anchor's style, and finally from the whole catalog.
+
+        Args:
+            count: Pack size
+            excluded: Beat IDs that must not be picked
+            rng: random.Random-like source
+
+        Returns:
+            List of beat IDs, anchor first (shorter if too few beats are eligible)
+        """
+        anchor = _draw([(self.ids, 0, len(self.ids))], 1, excluded, rng)
+        if not anchor:
+            return []
+        pack = anchor
+        taken = set(pack) | set(excluded)
+        style = self.meta[pack[0]][0]
+        levels = [
+            lambda: self.candidates(pack[0], same_style=True),
+            lambda: self.candidates(pack[0], same_style=False),
+            lambda: (
+                [(self.by_style[style], 0, len(self.by_style[style]))]
+                if style else []
+            ),
+            lambda: [(self.ids, 0, len(self.ids))],
+        ]
+        for level in levels:
+            if len(pack) >= count:
+                break
+            picked = _draw(level(), count - len(pack), taken, rng)
+            pack.extend(picked)
+            taken.update(picked)
+        return pack
+
+
+def _draw(
+    slices: List[Tuple[List[int], int, int]], count: int, blocked: Set[int], rng: Any
+) -> List[int]:
+    """Up to count distinct IDs drawn uniformly from slices, skipping blocked ones."""
+    sizes = [stop - start for _, start, stop in slices]
+    total = sum(sizes)
+    if total <= 0 or count <= 0:
+        return []
+    picked: List[int] = []
+    seen: Set[int] = set()
+    attempts = 8 * count + 16
+    # Rejection sampling keeps large slices from being copied
+    while len(picked) < count and attempts and total > 4 * count:
+        attempts -= 1
+        offset = rng.randrange(total)
+        for (ids, start, _), size in zip(slices, sizes):
+            if offset < size:
+                beat_id = ids[start + offset]
+                break
+            offset -= size
+        if beat_id in blocked or beat_id in seen:
+            continue
+        seen.add(beat_id)
+        picked.append(beat_id)
+    if len(picked) < count:
+        pool = list(dict.fromkeys(
+            beat_id
+            for ids, start, stop in slices
+            for beat_id in ids[start:stop]
+            if beat_id not in blocked and beat_id not in seen
+        ))
+        picked.extend(rng.sample(pool, min(count - len(picked), len(pool))))
+    return picked
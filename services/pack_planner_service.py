@@ -0,0 +1,199 @@
+"""
+Pack planner service for keeping beat packs under Gmail's message size limit.
+Predicts the encoded message size from stored file sizes before anything is
+downloaded, and splits, re-picks or links packs that would be too large.
+"""
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import yaml
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+GMAIL_MAX_MESSAGE_BYTES = 25 * 1024 * 1024
+# Headers, boundaries and the text part of a message
+MESSAGE_OVERHEAD_BYTES = 4 * 1024
+# Per-attachment part headers (Content-Type, Disposition with filename, ...)
+PART_OVERHEAD_BYTES = 512
+STRATEGIES = ("split", "repick", "links")
+
+
+def encoded_size(raw_size: int) -> int:
+    """
+    Size of a base64 MIME body for raw_size bytes, including CRLF line breaks.
+
+    Args:
+        raw_size: Unencoded size in bytes
+
+    Returns:
+        Encoded size in bytes
+    """
+    b64 = 4 * ((raw_size + 2) // 3)
+    lines = (b64 + 75) // 76
+    return b64 + 2 * lines
+
+
+class PackPlanner:
+    """Service for fitting beat packs into messages under a size limit."""
+
+    def __init__(
+        self,
+        max_message_bytes: int = GMAIL_MAX_MESSAGE_BYTES,
+        strategy: str = "split",
+        unknown_size: int = 8 * 1024 * 1024,
+    ):
+        """
+        Initialize pack planner.
+
+        Args:
+            max_message_bytes: Largest encoded message to send
+            strategy: What to do with oversized packs: 'split' across several
+                messages, 'repick' smaller beats, or send 'links' instead
+            unknown_size: Size assumed for beats without a stored file_size
+        """
+        if strategy not in STRATEGIES:
+            raise ValueError(
+                f"Unknown pack strategy '{strategy}', expected one of {STRATEGIES}"
+            )
+        self.max_message_bytes = max_message_bytes
+        self.strategy = strategy
+        self.unknown_size = unknown_size
+
+    @classmethod
+    def from_config(cls) -> "PackPlanner":
+        """Create planner from config.yaml."""
+        config_path = Path(__file__).parent.parent / "config" / "config.yaml"
+        with open(config_path, "r") as f:
+            config = yaml.safe_load(f)
+        email_config = config["email"]
+        return cls(
+            max_message_bytes=int(email_config.get("max_message_mb", 25)) * 1024 * 1024,
+            strategy=email_config.get("oversize_strategy", "split"),
+        )
+
+    def beat_bytes(self, beat: Dict[str, Any]) -> int:
+        """Predicted encoded bytes a beat adds to a message."""
+        raw = beat.get("file_size")
+        if raw is None:
+            raw = self.unknown_size
+        return encoded_size(raw) + PART_OVERHEAD_BYTES + len(beat.get("filename", ""))
+
+    def message_size(self, beats: List[Dict[str, Any]], extra_bytes: int = 0) -> int:
+        """
+        Predict the encoded size of one message carrying these beats.
+
+        Args:
+            beats: Beat dictionaries (file_size, filename)
+            extra_bytes: Encoded size of everything else (body, agreement)
+
+        Returns:
+            Predicted message size in bytes
+        """
+        beat_bytes = sum(self.beat_bytes(b) for b in beats)
+        return MESSAGE_OVERHEAD_BYTES + extra_bytes + beat_bytes
+
+    def fits(self, beats: List[Dict[str, Any]], extra_bytes: int = 0) -> bool:
+        """True if all beats fit in a single message."""
+        return self.message_size(beats, extra_bytes) <= self.max_message_bytes
+
+    def plan(
+        self,
+        beats: List[Dict[str, Any]],
+        extra_bytes: int = 0,
+        alternatives: Optional[List[Dict[str, Any]]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Decide how a pack is delivered.
+
+        Args:
+            beats: Selected beat dictionaries
+            extra_bytes: Encoded size of the body and agreement attachment
+            alternatives: Other eligible beats, used by the 'repick' strategy
+
+        Returns:
+            Dict with:
+            - delivery: 'attachments' or 'links'
+            - beats: final beat list (differs from input only after a repick)
+            - messages: list of beat lists, one per message to send
+            - linked: beats too large to attach at all, to be sent as links
+        """
+        if self.fits(beats, extra_bytes):
+            return {
+                "delivery": "attachments", "beats": beats, "messages": [beats],
+                "linked": [],
+            }
+
+        if self.strategy == "links":
+            logger.info(
+                f"Pack of {len(beats)} beats too large to attach; sending links"
+            )
+            return {
+                "delivery": "links", "beats": beats, "messages": [[]],
+                "linked": list(beats),
+            }
+
+        if self.strategy == "repick" and alternatives:
+            repicked = self._repick(beats, extra_bytes, alternatives)
+            if repicked is not None:
+                return {
+                    "delivery": "attachments", "beats": repicked,
+                    "messages": [repicked], "linked": [],
+                }
+            logger.info("No smaller beats fit the size limit; splitting pack instead")
+
+        messages, linked = self._split(beats, extra_bytes)
+        if len(messages) > 1:
+            logger.info(
+                f"Split pack of {len(beats)} beats into {len(messages)} messages"
+            )
+        return {
+            "delivery": "attachments", "beats": beats, "messages": messages,
+            "linked": linked,
+        }
+
+    def _repick(
+        self, beats, extra_bytes, alternatives
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Swap the largest beats for the largest alternatives that still fit."""
+        chosen = sorted(beats, key=self.beat_bytes)
+        chosen_ids = {b["id"] for b in chosen}
+        pool = sorted(
+            (b for b in alternatives if b["id"] not in chosen_ids),
+            key=self.beat_bytes,
+        )
+        while not self.fits(chosen, extra_bytes):
+            largest = chosen.pop()
+            budget = self.max_message_bytes - self.message_size(chosen, extra_bytes)
+            replacement = None
+            # Prefer the biggest beat that fits, keeping packs close to the original
+            for idx in range(len(pool) - 1, -1, -1):
+                size = self.beat_bytes(pool[idx])
+                if size <= budget and size < self.beat_bytes(largest):
+                    replacement = pool.pop(idx)
+                    break
+            if replacement is None:
+                return None
+            chosen.insert(0, replacement)
+            chosen.sort(key=self.beat_bytes)
+        return chosen
+
+    def _split(self, beats, extra_bytes):
+        """First-fit decreasing bin packing of beats into messages."""
+        messages: List[List[Dict[str, Any]]] = []
+        sizes: List[int] = []
+        linked = []
+        empty = self.message_size([], extra_bytes)
+        for beat in sorted(beats, key=self.beat_bytes, reverse=True):
+            size = self.beat_bytes(beat)
+            if empty + size > self.max_message_bytes:
+                linked.append(beat)
+                continue
+            for idx, used in enumerate(sizes):
+                if used + size <= self.max_message_bytes:
+                    messages[idx].append(beat)
+                    sizes[idx] += size
+                    break
+            else:
+                messages.append([beat])
+                sizes.append(empty + size)
+        return messages or [[]], linked
@@ -0,0 +1,162 @@
+"""
+Prefetch service for downloading beat attachments ahead of the send loop.
+Runs downloads on a bounded thread pool so network latency overlaps with
+composing and sending the current message.
+"""
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Optional
+import yaml
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+DEFAULT_FILE_SIZE = 8 * 1024 * 1024
+
+
+class BeatPrefetcher:
+    """Bounded concurrent downloader with per-file futures and an in-flight byte cap."""
+
+    def __init__(
+        self,
+        fetch: Callable[[str, Optional[str]], bytes],
+        max_workers: int = 4,
+        max_inflight_bytes: int = 64 * 1024 * 1024,
+    ):
+        """
+        Initialize beat prefetcher.
+
+        Args:
+            fetch: Function (file_id, version) -> bytes, e.g. AttachmentStore.get
+            max_workers: Maximum concurrent downloads
+            max_inflight_bytes: Maximum bytes being downloaded at once
+        """
+        self.fetch = fetch
+        self.max_inflight_bytes = max_inflight_bytes
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="prefetch"
+        )
+        self._futures: Dict[str, Future] = {}
+        self._cancelled: set = set()
+        self._lock = threading.Lock()
+        self._budget = threading.Condition()
+        self._inflight_bytes = 0
+
+    @classmethod
+    def from_config(
+        cls, fetch: Callable[[str, Optional[str]], bytes]
+    ) -> "BeatPrefetcher":
+        """Create prefetcher from config.yaml."""
+        config_path = Path(__file__).parent.parent / "config" / "config.yaml"
+        with open(config_path, "r") as f:
+            config = yaml.safe_load(f)
+        downloads_config = config.get("downloads") or {}
+        return cls(
+            fetch=fetch,
+            max_workers=downloads_config.get("workers", 4),
+            max_inflight_bytes=int(downloads_config.get("max_inflight_mb", 64))
+            * 1024 * 1024,
+        )
+
+    def prefetch(self, file_id: str, version: Optional[str] = None,
+                 size: Optional[int] = None) -> Future:
+        """
+        Start downloading a file in the background if it is not already pending.
+
+        Args:
+            file_id: Google Drive file ID
+            version: md5Checksum or modifiedTime, passed to fetch
+            size: Expected size in bytes, used for the in-flight cap
+
+        Returns:
+            Future resolving to the file contents
+        """
+        with self._lock:
+            future = self._futures.get(file_id)
+            if future is not None and not future.cancelled():
+                return future
+            self._cancelled.discard(file_id)
+            future = self._executor.submit(self._download, file_id, version, size)
+            self._futures[file_id] = future
+        # Completed futures are dropped so their bytes are only held by the fetch layer
+        future.add_done_callback(lambda f, fid=file_id: self._forget(fid, f))
+        return future
+
+    def get(self, file_id: str, version: Optional[str] = None,
+            size: Optional[int] = None) -> bytes:
+        """
+        Return file contents, waiting for a pending prefetch or downloading now.
+
+        Args:
+            file_id: Google Drive file ID
+            version: md5Checksum or modifiedTime, passed to fetch
+            size: Expected size in bytes
+
+        Returns:
+            File contents as bytes
+
+        Raises:
+            Exception: Whatever fetch raised for this file
+        """
+        return self.prefetch(file_id, version, size).result()
+
+    def cancel(self, file_id: str) -> bool:
+        """
+        Cancel a pending download. Downloads already running are allowed to finish.
+
+        Args:
+            file_id: Google Drive file ID
+
+        Returns:
+            True if the download was cancelled before it started
+        """
+        with self._lock:
+            future = self._futures.pop(file_id, None)
+            if future is None:
+                return False
+            self._cancelled.add(file_id)
+        return future.cancel()
+
+    def shutdown(self, cancel_pending: bool = True) -> None:
+        """
+        Stop the worker pool.
+
+        Args:
+            cancel_pending: Cancel downloads that have not started yet
+        """
+        with self._lock:
+            if cancel_pending:
+                self._cancelled.update(self._futures)
+            self._futures.clear()
+        self._executor.shutdown(wait=True, cancel_futures=cancel_pending)
+
+    @property
+    def inflight_bytes(self) -> int:
+        """Bytes currently reserved by running downloads."""
+        return self._inflight_bytes
+
+    def _forget(self, file_id: str, future: Future) -> None:
+        with self._lock:
+            if self._futures.get(file_id) is future:
+                del self._futures[file_id]
+
+    def _download(
+        self, file_id: str, version: Optional[str], size: Optional[int]
+    ) -> bytes:
+        """Worker body: reserve byte budget, fetch, release."""
+        # A single file larger than the cap still runs, just on its own
+        reserve = min(size or DEFAULT_FILE_SIZE, self.max_inflight_bytes)
+        with self._budget:
+            while self._inflight_bytes + reserve > self.max_inflight_bytes:
+                self._budget.wait()
+            self._inflight_bytes += reserve
+        try:
+            with self._lock:
+                if file_id in self._cancelled:
+                    raise RuntimeError(f"Download of {file_id} was cancelled")
+            return self.fetch(file_id, version)
+        finally:
+            with self._budget:
+                self._inflight_bytes -= reserve
+                self._budget.notify_all()
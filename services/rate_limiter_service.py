@@ -0,0 +1,151 @@
+"""
+Rate limiter service for pacing Gmail sends.
+Token bucket with a burst allowance and a sustained refill rate, exponential
+backoff with jitter on quota errors, and state persisted between runs.
+"""
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Optional
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class TokenBucketRateLimiter:
+    """Thread-safe token bucket that only sleeps for the time actually owed."""
+
+    def __init__(
+        self,
+        rate_per_second: float,
+        burst: int = 10,
+        state_path: Optional[str] = None,
+        backoff_base: float = 2.0,
+        max_backoff: float = 300.0,
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        """
+        Initialize rate limiter.
+
+        Args:
+            rate_per_second: Sustained rate (tokens added per second)
+            burst: Bucket capacity, i.e. how many sends may go back to back
+            state_path: JSON file for sharing the budget across runs
+                (None = in-memory only)
+            backoff_base: Initial backoff in seconds after a quota error
+            max_backoff: Upper bound for a single backoff
+            clock: Wall-clock time source (wall clock so saved state survives restarts)
+            sleep: Sleep function
+        """
+        self.rate = rate_per_second
+        self.capacity = max(1, burst)
+        self.state_path = Path(state_path) if state_path else None
+        self.backoff_base = backoff_base
+        self.max_backoff = max_backoff
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+
+        self.tokens = float(self.capacity)
+        self.updated_at = self._clock()
+        self.backoff_until = 0.0
+        self.backoff_level = 0
+        self._load_state()
+
+    def _load_state(self) -> None:
+        """Restore bucket state written by a previous run, if any."""
+        if not self.state_path or not self.state_path.exists():
+            return
+        try:
+            with open(self.state_path, "r") as f:
+                state = json.load(f)
+            self.tokens = min(float(state["tokens"]), self.capacity)
+            self.updated_at = min(float(state["updated_at"]), self._clock())
+            self.backoff_until = float(state.get("backoff_until", 0.0))
+            self.backoff_level = int(state.get("backoff_level", 0))
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(
+                f"Ignoring unreadable rate limit state {self.state_path}: {e}"
+            )
+
+    def _save_state(self) -> None:
+        """Atomically write bucket state so the next run continues the same budget."""
+        if not self.state_path:
+            return
+        state = {
+            "tokens": self.tokens,
+            "updated_at": self.updated_at,
+            "backoff_until": self.backoff_until,
+            "backoff_level": self.backoff_level,
+        }
+        try:
+            self.state_path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_name = tempfile.mkstemp(dir=self.state_path.parent, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(state, f)
+            os.replace(tmp_name, self.state_path)
+        except OSError as e:
+            logger.warning(f"Could not save rate limit state: {e}")
+
+    def _refill(self, now: float) -> None:
+        elapsed = max(0.0, now - self.updated_at)
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated_at = now
+
+    def acquire(self) -> float:
+        """
+        Take one token, sleeping only as long as needed (including any backoff).
+
+        Returns:
+            Seconds spent waiting
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._refill(now)
+                wait = max(0.0, self.backoff_until - now)
+                if wait == 0.0:
+                    if self.tokens >= 1.0:
+                        self.tokens -= 1.0
+                        self._save_state()
+                        return waited
+                    wait = (1.0 - self.tokens) / self.rate
+            if wait > 5:
+                logger.info(f"Rate limit: waiting {wait:.1f}s...")
+            self._sleep(wait)
+            waited += wait
+
+    def on_quota_error(self) -> float:
+        """
+        Record a 429/rateLimitExceeded response and schedule an exponential backoff.
+
+        Returns:
+            Backoff delay in seconds
+        """
+        with self._lock:
+            ceiling = min(
+                self.max_backoff, self.backoff_base * (2 ** self.backoff_level)
+            )
+            # Equal jitter: at least half the ceiling, so retries never stampede
+            delay = ceiling / 2 + random.uniform(0, ceiling / 2)
+            self.backoff_level += 1
+            self.backoff_until = max(self.backoff_until, self._clock() + delay)
+            self.tokens = 0.0
+            self._save_state()
+        logger.warning(
+            f"Gmail quota error; backing off {delay:.1f}s (level {self.backoff_level})"
+        )
+        return delay
+
+    def on_success(self) -> None:
+        """Reset the backoff level after a successful send."""
+        with self._lock:
+            if self.backoff_level:
+                self.backoff_level = 0
+                self._save_state()
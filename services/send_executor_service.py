@@ -0,0 +1,161 @@
+"""
+Send executor service for sending composed emails on worker threads.
+Lets uploads overlap while a shared rate limiter keeps the overall pace, and
+hands per-message results back to the caller's thread for DB bookkeeping.
+"""
+import queue
+import threading
+from typing import Any, Dict, Iterator, List, Optional
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+_STOP = object()
+
+
+class SendExecutor:
+    """Bounded pool of sender threads fed from a queue of composed messages."""
+
+    def __init__(self, gmail: Any, workers: int = 2, max_pending: Optional[int] = None):
+        """
+        Initialize send executor.
+
+        Args:
+            gmail: Thread-safe GmailService (anything with
+                send_email(to, subject, body, attachments))
+            workers: Number of concurrent senders
+            max_pending: Queue bound; submit() blocks when this many jobs are
+                waiting (defaults to 2 x workers, which bounds memory held by
+                queued attachments)
+        """
+        self.gmail = gmail
+        self.workers = max(1, workers)
+        self._jobs: "queue.Queue[Any]" = queue.Queue(
+            maxsize=max_pending or self.workers * 2
+        )
+        self._results: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+        self._threads: List[threading.Thread] = []
+        for n in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"sender-{n}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        self._submitted = 0
+        self._collected = 0
+
+    def submit(self, job_id: Any, to: str, subject: str, body: str,
+               attachments: Optional[List[Dict[str, Any]]] = None,
+               message_id: Optional[str] = None) -> None:
+        """
+        Queue a message for sending (blocks while the queue is full).
+
+        Args:
+            job_id: Caller's identifier, returned with the result
+            to: Recipient email
+            subject: Subject line
+            body: Plain text body
+            attachments: Attachments as accepted by GmailService.send_email
+            message_id: Optional RFC 822 Message-ID for the message
+        """
+        self._jobs.put({
+            "job_id": job_id,
+            "to": to,
+            "subject": subject,
+            "body": body,
+            "attachments": attachments,
+            "message_id": message_id,
+        })
+        self._submitted += 1
+
+    def submit_file(self, job_id: Any, to: str, path: str) -> None:
+        """
+        Queue an already composed message file for sending.
+
+        Args:
+            job_id: Caller's identifier, returned with the result
+            to: Recipient email
+            path: RFC 822 message file, as accepted by GmailService.send_file
+        """
+        self._jobs.put({"job_id": job_id, "to": to, "path": path})
+        self._submitted += 1
+
+    def completed(self) -> Iterator[Dict[str, Any]]:
+        """
+        Yield results that are already available, without blocking.
+
+        Yields:
+            Dicts with 'job_id', 'message_id' (None on failure) and 'error'
+        """
+        while True:
+            try:
+                result = self._results.get_nowait()
+            except queue.Empty:
+                return
+            self._collected += 1
+            yield result
+
+    def drain(self) -> Iterator[Dict[str, Any]]:
+        """
+        Wait for every submitted message and yield the remaining results.
+
+        Yields:
+            Result dicts as from completed()
+        """
+        while self._collected < self._submitted:
+            result = self._results.get()
+            self._collected += 1
+            yield result
+
+    def shutdown(self, cancel_pending: bool = False) -> List[Any]:
+        """
+        Stop the worker threads.
+
+        Args:
+            cancel_pending: Drop queued jobs that have not started (on abort);
+                otherwise the workers finish everything queued first. Results
+                of sends that did run stay available from completed().
+
+        Returns:
+            Job IDs of the dropped jobs
+        """
+        dropped = []
+        while cancel_pending:
+            try:
+                job = self._jobs.get_nowait()
+            except queue.Empty:
+                break
+            dropped.append(job["job_id"])
+            self._submitted -= 1
+        if dropped:
+            logger.warning(f"Dropped {len(dropped)} queued message(s) before sending")
+        for _ in self._threads:
+            self._jobs.put(_STOP)
+        for t in self._threads:
+            t.join()
+        self._threads = []
+        return dropped
+
+    def _worker(self) -> None:
+        while True:
+            job = self._jobs.get()
+            if job is _STOP:
+                return
+            message_id, error = None, None
+            try:
+                if "path" in job:
+                    message_id = self.gmail.send_file(job["path"], job["to"])
+                else:
+                    message_id = self.gmail.send_email(
+                        to=job["to"],
+                        subject=job["subject"],
+                        body=job["body"],
+                        attachments=job["attachments"],
+                        message_id=job["message_id"],
+                    )
+                if not message_id:
+                    error = "Send failed"
+            except Exception as e:
+                logger.error(f"Sender crashed on {job['to']}: {e}")
+                error = str(e)
+            self._results.put(
+                {"job_id": job["job_id"], "message_id": message_id, "error": error}
+            )
@@ -0,0 +1,169 @@
+"""
+Spool service for composing beat pack emails ahead of sending.
+Fully built RFC 822 messages are written to a local directory with an
+append-only manifest, so a separate drain step can send them later (and again
+after a failed send) without re-downloading or re-encoding anything.
+"""
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import yaml
+from services.mime_builder_service import EncodedPartCache, StreamingMessageWriter
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+MANIFEST_NAME = "manifest.jsonl"
+
+
+class MessageSpool:
+    """Directory of composed messages keyed by outbox entry and part number."""
+
+    def __init__(
+        self, spool_dir: str = "spool", writer: Optional[StreamingMessageWriter] = None
+    ):
+        """
+        Initialize message spool.
+
+        Args:
+            spool_dir: Directory for .eml files and the manifest
+            writer: Message writer (defaults to one with its own encoded part cache)
+        """
+        self.spool_dir = Path(spool_dir)
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        self.manifest_path = self.spool_dir / MANIFEST_NAME
+        self.writer = writer or StreamingMessageWriter(part_cache=EncodedPartCache())
+
+    @classmethod
+    def from_config(cls) -> "MessageSpool":
+        """Create spool from config.yaml."""
+        config_path = Path(__file__).parent.parent / "config" / "config.yaml"
+        with open(config_path, "r") as f:
+            config = yaml.safe_load(f)
+        spool_config = config.get("spool") or {}
+        cache_mb = (config.get("gmail") or {}).get("encoded_cache_mb", 256)
+        part_cache = EncodedPartCache(int(cache_mb) * 1024 * 1024) if cache_mb else None
+        spool_dir = Path(__file__).parent.parent / spool_config.get("dir", "spool")
+        return cls(
+            spool_dir=str(spool_dir),
+            writer=StreamingMessageWriter(part_cache=part_cache),
+        )
+
+    def path_for(self, outbox_id: int, part: int) -> Path:
+        """Spool file for one email of an outbox entry."""
+        return self.spool_dir / f"{outbox_id}-{part}.eml"
+
+    def has(self, outbox_id: int, part: int) -> bool:
+        """True if the email is already composed."""
+        return self.path_for(outbox_id, part).exists()
+
+    def write(
+        self,
+        outbox_id: int,
+        part: int,
+        to: str,
+        subject: str,
+        body_text: str,
+        attachments: Optional[List[Dict[str, Any]]] = None,
+        message_id: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Compose a message into the spool and append it to the manifest.
+
+        The file is written under a temporary name and renamed into place, so
+        a crash never leaves a truncated message that looks complete.
+
+        Args:
+            outbox_id: Outbox entry ID
+            part: 1-based message number within the pack
+            to: Recipient email
+            subject: Subject line
+            body_text: Plain text body
+            attachments: Attachments as accepted by StreamingMessageWriter.write
+            message_id: RFC 822 Message-ID header
+
+        Returns:
+            Manifest record
+        """
+        path = self.path_for(outbox_id, part)
+        headers = {"Message-ID": message_id} if message_id else None
+        fd, tmp_name = tempfile.mkstemp(dir=self.spool_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                size = self.writer.write(
+                    fh, to, subject, body_text, attachments, headers
+                )
+            os.replace(tmp_name, path)
+        except BaseException:
+            _unlink_quietly(Path(tmp_name))
+            raise
+
+        record = {
+            "outbox_id": outbox_id,
+            "part": part,
+            "to": to,
+            "subject": subject,
+            "message_id": message_id,
+            "file": path.name,
+            "size": size,
+            "composed_at": time.time(),
+        }
+        with open(self.manifest_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+        logger.debug(f"Spooled {path.name} for {to} ({size} bytes)")
+        return record
+
+    def records(self) -> Dict[Tuple[int, int], Dict[str, Any]]:
+        """
+        Manifest records whose message file is still in the spool.
+
+        Returns:
+            Dict mapping (outbox_id, part) to the latest record for it
+        """
+        result: Dict[Tuple[int, int], Dict[str, Any]] = {}
+        if not self.manifest_path.exists():
+            return result
+        with open(self.manifest_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A torn last line from a crash mid-append
+                    continue
+                if (self.spool_dir / record["file"]).exists():
+                    result[(record["outbox_id"], record["part"])] = record
+        return result
+
+    def remove(self, outbox_id: int, part: int) -> None:
+        """Delete a spooled message once sent (the manifest is compacted later)."""
+        _unlink_quietly(self.path_for(outbox_id, part))
+
+    def discard_entry(self, outbox_id: int) -> None:
+        """Delete every spooled message of an outbox entry."""
+        for path in self.spool_dir.glob(f"{outbox_id}-*.eml"):
+            _unlink_quietly(path)
+
+    def compact(self) -> int:
+        """
+        Rewrite the manifest with only messages still waiting to be sent.
+
+        Returns:
+            Number of messages left in the spool
+        """
+        remaining = self.records()
+        fd, tmp_name = tempfile.mkstemp(dir=self.spool_dir, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            for record in remaining.values():
+                f.write(json.dumps(record) + "\n")
+        os.replace(tmp_name, self.manifest_path)
+        return len(remaining)
+
+
+def _unlink_quietly(path: Path) -> None:
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        pass
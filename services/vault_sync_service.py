@@ -0,0 +1,175 @@
+"""
+Vault sync service for keeping the beats table in step with the Drive vault.
+Uses the Drive changes feed so only added, renamed, modified or trashed files
+are processed after the first full scan.
+"""
+from typing import Any, Dict, Optional
+from googleapiclient.errors import HttpError
+from services.beat_parser_service import BeatParser
+from services.database_service import DatabaseService
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+CHANGES_TOKEN_KEY = "drive_changes_page_token"
+BEAT_MIME_TYPE = "audio/mpeg"
+
+
+class VaultSyncService:
+    """Service for syncing vault files and beats from Google Drive into SQLite."""
+
+    def __init__(self, drive: Any, db: DatabaseService):
+        """
+        Initialize vault sync service.
+
+        Args:
+            drive: GoogleDriveService (or any object with the same list/changes methods)
+            db: DatabaseService instance
+        """
+        self.drive = drive
+        self.db = db
+
+    def sync(self, full: bool = False) -> Dict[str, int]:
+        """
+        Bring the database up to date with the vault folder.
+
+        Runs a full scan on first use (no stored page token), when `full` is
+        set, or when the stored token has expired; otherwise applies only
+        the changes since the last sync.
+
+        Args:
+            full: Force a full scan of the vault folder
+
+        Returns:
+            Counts: 'added', 'updated', 'removed', 'unchanged', 'full_scan' (0/1)
+        """
+        token = None if full else self.db.get_sync_state(CHANGES_TOKEN_KEY)
+        if token:
+            try:
+                changes, new_token = self.drive.list_changes(token)
+            except HttpError as e:
+                logger.warning(
+                    f"Changes feed unavailable ({e}); falling back to full scan"
+                )
+            else:
+                counts = self._apply_changes(changes)
+                if new_token:
+                    self.db.set_sync_state(CHANGES_TOKEN_KEY, new_token)
+                return counts
+
+        return self._full_scan()
+
+    def _full_scan(self) -> Dict[str, int]:
+        """List the whole vault and reconcile the database against it."""
+        # Take the token first so changes made during the scan are replayed next time
+        new_token = self.drive.get_start_page_token()
+        files = self.drive.list_beat_files()
+
+        counts = self._empty_counts()
+        counts["full_scan"] = 1
+        seen = set()
+        vault_rows, beat_rows, unparseable = [], [], []
+        for f in files:
+            seen.add(f["id"])
+            vault_rows.append(self._vault_row(f))
+            beat = self._beat_row(f)
+            if beat is None:
+                unparseable.append(f["id"])
+            else:
+                beat_rows.append(beat)
+
+        # One transaction per table instead of a commit per file
+        self.db.upsert_vault_files(vault_rows)
+        upserted = self.db.upsert_beats(beat_rows)
+        counts["added"] += upserted["inserted"]
+        counts["updated"] += upserted["updated"]
+        counts["unchanged"] += upserted["unchanged"] + upserted["skipped"]
+        for file_id in unparseable:
+            counts["removed" if self.db.deactivate_beat(file_id) else "unchanged"] += 1
+
+        for known in self.db.get_vault_files():
+            if known["drive_file_id"] not in seen:
+                self._remove_file(known["drive_file_id"])
+                counts["removed"] += 1
+        counts["removed"] += self.db.deactivate_untracked_beats()
+
+        self.db.set_sync_state(CHANGES_TOKEN_KEY, new_token)
+        logger.info(f"Full vault sync: {counts}")
+        return counts
+
+    def _apply_changes(self, changes) -> Dict[str, int]:
+        """Apply a list of Drive change records."""
+        # The feed can report the same file several times; only the latest matters
+        latest = {}
+        for change in changes:
+            if change.get("fileId"):
+                latest[change["fileId"]] = change
+
+        counts = self._empty_counts()
+        for file_id, change in latest.items():
+            f = change.get("file") or {}
+            in_vault = (
+                not change.get("removed")
+                and not f.get("trashed")
+                and f.get("mimeType") == BEAT_MIME_TYPE
+                and self.drive.vault_folder_id in (f.get("parents") or [])
+            )
+            if in_vault:
+                counts[self._apply_file(f)] += 1
+            elif self._remove_file(file_id):
+                counts["removed"] += 1
+
+        logger.info(f"Incremental vault sync: {counts}")
+        return counts
+
+    def _apply_file(self, f: Dict[str, Any]) -> str:
+        """Record a vault file and upsert its beat row. Returns the change kind."""
+        self.db.upsert_vault_file(**self._vault_row(f))
+
+        beat = self._beat_row(f)
+        if beat is None:
+            # Renamed to something unparseable: stop sending it until fixed
+            return "removed" if self.db.deactivate_beat(f["id"]) else "unchanged"
+
+        return self.db.sync_beat_file(**beat)
+
+    @staticmethod
+    def _vault_row(f: Dict[str, Any]) -> Dict[str, Any]:
+        """vault_files columns for a Drive file."""
+        return {
+            "drive_file_id": f["id"],
+            "name": f["name"],
+            "size": int(f["size"]) if f.get("size") else None,
+            "mime_type": f.get("mimeType"),
+            "modified_time": f.get("modifiedTime"),
+            "md5_checksum": f.get("md5Checksum"),
+        }
+
+    @staticmethod
+    def _beat_row(f: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """beats columns for a Drive file, or None if its name does not parse."""
+        parsed = BeatParser.parse_filename(f["name"])
+        if not parsed:
+            return None
+        return {
+            "drive_file_id": f["id"],
+            "filename": f["name"],
+            "beat_name": parsed["beat_name"],
+            "bpm": BeatParser.parse_bpm(parsed["bpm"]),
+            "key": parsed.get("key"),
+            "style_category": parsed.get("style_category"),
+            "file_type": parsed.get("file_type", "mp3"),
+            "file_size": int(f["size"]) if f.get("size") else None,
+            "modified_time": f.get("modifiedTime"),
+            "created_time": f.get("createdTime"),
+        }
+
+    def _remove_file(self, file_id: str) -> bool:
+        """Forget a vault file and deactivate its beat. True if anything changed."""
+        known = self.db.remove_vault_file(file_id)
+        deactivated = self.db.deactivate_beat(file_id)
+        return known or deactivated
+
+    @staticmethod
+    def _empty_counts() -> Dict[str, int]:
+        return {"added": 0, "updated": 0, "removed": 0, "unchanged": 0, "full_scan": 0}
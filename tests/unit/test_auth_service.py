@@ -0,0 +1,63 @@
+"""Unit tests for the shared API client factory."""
+from datetime import datetime, timedelta, timezone
+from unittest.mock import Mock, patch
+import services.auth_service as auth_service
+
+
+def _creds(minutes_left):
+    creds = Mock()
+    creds.valid = True
+    creds.refresh_token = "refresh"
+    # Naive UTC, as google-auth stores it
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    creds.expiry = now + timedelta(minutes=minutes_left)
+    return creds
+
+
+def setup_function():
+    auth_service.reset_clients()
+
+
+@patch("services.auth_service.get_credentials")
+def test_credentials_loaded_once(mock_get_creds):
+    """token.json/config are only read on first use."""
+    mock_get_creds.return_value = _creds(60)
+    first = auth_service.get_shared_credentials()
+    second = auth_service.get_shared_credentials()
+    assert first is second
+    mock_get_creds.assert_called_once()
+
+
+@patch("services.auth_service._save_token")
+@patch("services.auth_service.get_credentials")
+def test_credentials_refreshed_ahead_of_expiry(mock_get_creds, mock_save):
+    """Tokens expiring within the margin are refreshed before use."""
+    creds = _creds(2)
+    mock_get_creds.return_value = creds
+    auth_service.get_shared_credentials()
+    creds.refresh.assert_called_once()
+    mock_save.assert_called_once_with(creds)
+
+
+@patch("services.auth_service.build")
+@patch("services.auth_service.get_credentials")
+def test_build_service_reuses_client_and_transport(mock_get_creds, mock_build):
+    """Services are built once per thread on one transport, with static discovery."""
+    mock_get_creds.return_value = _creds(60)
+    drive = auth_service.build_service("drive", "v3")
+    assert auth_service.build_service("drive", "v3") is drive
+    auth_service.build_service("gmail", "v1")
+
+    assert mock_build.call_count == 2
+    transports = {c.kwargs["http"] for c in mock_build.call_args_list}
+    assert len(transports) == 1
+    assert all(c.kwargs["static_discovery"] for c in mock_build.call_args_list)
+
+
+def test_needs_refresh_accepts_aware_expiry():
+    """Timezone-aware expiry values are compared in UTC too."""
+    creds = _creds(0)
+    creds.expiry = datetime.now(timezone.utc) + timedelta(minutes=2)
+    assert auth_service._needs_refresh(creds) is True
+    creds.expiry = datetime.now(timezone.utc) + timedelta(hours=1)
+    assert auth_service._needs_refresh(creds) is False
@@ -0,0 +1,104 @@
+"""Unit tests for beat file cache."""
+import os
+import time
+from services.beat_cache_service import AttachmentStore, BeatFileCache
+
+
+def test_put_and_get_roundtrip(tmp_path):
+    """Stored content is returned for the same file ID and version."""
+    cache = BeatFileCache(cache_dir=str(tmp_path))
+    cache.put("file1", "md5-a", b"beat bytes")
+    assert cache.get("file1", "md5-a") == b"beat bytes"
+
+
+def test_get_misses_on_new_version(tmp_path):
+    """A changed md5/modifiedTime is a cache miss and replaces the old entry."""
+    cache = BeatFileCache(cache_dir=str(tmp_path))
+    cache.put("file1", "md5-a", b"old")
+    assert cache.get("file1", "md5-b") is None
+
+    cache.put("file1", "md5-b", b"new")
+    assert cache.get("file1", "md5-a") is None
+    assert cache.get("file1", "md5-b") == b"new"
+    assert len(list(tmp_path.glob("file1.*.bin"))) == 1
+
+
+def test_evicts_least_recently_used(tmp_path):
+    """Oldest entries are evicted once the size cap is exceeded."""
+    cache = BeatFileCache(cache_dir=str(tmp_path), max_size_bytes=10)
+    cache.put("a", "v", b"12345")
+    old = time.time() - 100
+    os.utime(cache._path_for("a", "v"), (old, old))
+    cache.put("b", "v", b"12345")
+    os.utime(cache._path_for("b", "v"), (old + 10, old + 10))
+
+    cache.get("a", "v")  # touch a, so b becomes least recently used
+    cache.put("c", "v", b"12345")
+
+    assert cache.get("a", "v") == b"12345"
+    assert cache.get("b", "v") is None
+    assert cache.get("c", "v") == b"12345"
+    assert cache.size_bytes() <= 10
+
+
+def test_no_temp_files_left_behind(tmp_path):
+    """Atomic writes leave only finished entries in the cache directory."""
+    cache = BeatFileCache(cache_dir=str(tmp_path))
+    cache.put("file1", "v1", b"x" * 1000)
+    assert [p.name for p in tmp_path.iterdir() if p.name.startswith(".tmp-")] == []
+
+
+def test_stale_temp_files_swept_on_start(tmp_path):
+    """Temp files left by an earlier run are removed; recent ones are kept."""
+    stale = tmp_path / ".tmp-old.part"
+    fresh = tmp_path / ".tmp-new.part"
+    stale.write_bytes(b"x")
+    fresh.write_bytes(b"y")
+    two_hours_ago = time.time() - 7200
+    os.utime(stale, (two_hours_ago, two_hours_ago))
+
+    BeatFileCache(cache_dir=str(tmp_path))
+    assert sorted(p.name for p in tmp_path.iterdir()) == [".tmp-new.part"]
+
+
+class _FakeDrive:
+    """Counts download_file calls."""
+
+    def __init__(self):
+        self.calls = []
+
+    def download_file(self, file_id, version=None):
+        self.calls.append(file_id)
+        return f"content-{file_id}".encode() * 10
+
+
+def test_attachment_store_downloads_once_and_shares_buffer():
+    """Repeated requests for a beat reuse the same bytes object."""
+    drive = _FakeDrive()
+    store = AttachmentStore(drive)
+    first = store.get("file1", "v1")
+    second = store.get("file1", "v1")
+    assert first is second
+    assert drive.calls == ["file1"]
+    assert store.downloads == 1 and store.hits == 1
+
+
+def test_attachment_store_respects_memory_budget():
+    """Least recently used beats are released above the budget."""
+    drive = _FakeDrive()
+    store = AttachmentStore(drive, max_bytes=200)
+    store.get("a")
+    store.get("b")
+    store.get("c")
+    assert store.size_bytes <= 200
+    store.get("a")
+    assert drive.calls.count("a") == 2
+
+
+def test_open_mapped_returns_readonly_view(tmp_path):
+    """Cached files can be mapped instead of read into memory."""
+    cache = BeatFileCache(cache_dir=str(tmp_path))
+    cache.put("file1", "v1", b"beat bytes")
+    mapped = cache.open_mapped("file1", "v1")
+    assert mapped[:] == b"beat bytes"
+    assert cache.open_mapped("file1", "v2") is None
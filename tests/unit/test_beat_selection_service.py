@@ -55,3 +55,209 @@ def test_select_beats_handles_insufficient_beats(db_with_beats):
     selector = BeatSelectionService(db_with_beats, min_beats=3, max_beats=5)
     selected = selector.select_beats_for_artist(artist_id)
     assert len(selected) >= 1
+
+
+def test_alternative_beats_skip_pack_and_recent(db_with_beats):
+    """Alternatives exclude beats already in the pack and recently sent ones."""
+    artist_id = 1
+    db_with_beats.add_artist_beat_history(artist_id, 1)
+    selector = BeatSelectionService(db_with_beats)
+    alternatives = selector.get_alternative_beats(artist_id, [2, 3])
+    assert sorted(b["id"] for b in alternatives) == [4, 5]
+
+
+def test_catalog_is_built_once_per_beat_snapshot(db_with_beats):
+    """The catalog is reused across artists and rebuilt only after beats change."""
+    selector = BeatSelectionService(db_with_beats, min_beats=2, max_beats=2)
+    catalog = selector.catalog
+    selector.select_beats_for_artist(1)
+    assert selector.catalog is catalog
+    assert len(catalog) == 5
+
+    db_with_beats.add_beat("beat5.mp3", "Beat 5", file_type="mp3")
+    assert selector.catalog is not catalog
+    assert len(selector.catalog) == 6
+
+
+def test_catalog_sample_respects_exclusions():
+    """Sampling never returns excluded or repeated beats, however many are excluded."""
+    import random
+    from services.beat_selection_service import BeatCatalog
+    catalog = BeatCatalog({"id": i} for i in range(1, 101))
+    rng = random.Random(7)
+    for excluded in ({1, 2, 3}, set(range(1, 96))):
+        picked = catalog.sample(5, excluded, rng)
+        assert len(picked) == 5
+        assert len(set(picked)) == 5
+        assert not set(picked) & excluded
+    assert catalog.sample(5, set(range(1, 101)), rng) == []
+    assert sorted(catalog.sample(5, set(range(1, 99)), rng)) == [99, 100]
+
+
+def _check_packs(packs, artist_ids, recent, min_beats, max_beats):
+    for artist_id in artist_ids:
+        pack = packs[artist_id]
+        assert min_beats <= len(pack) <= max_beats
+        assert len(set(pack)) == len(pack)
+        assert not set(pack) & recent.get(artist_id, set())
+
+
+@pytest.fixture
+def db_with_many_beats(temp_db):
+    """Database with 30 beats."""
+    for i in range(30):
+        temp_db.add_beat(f"beat{i}.mp3", f"Beat {i:02d}", file_type="mp3")
+    return temp_db
+
+
+def test_select_packs_vectorized_is_seeded(db_with_many_beats, monkeypatch):
+    """Batch selection honours exclusions and pack sizes and is reproducible."""
+    pytest.importorskip("numpy")
+    import services.beat_selection_service as selection
+    monkeypatch.setattr(selection, "SELECT_PACKS_CHUNK_CELLS", 64)  # several blocks
+    selector = BeatSelectionService(
+        db_with_many_beats, min_beats=3, max_beats=5, seed=42
+    )
+    artist_ids = list(range(1, 21))
+    recent = {artist_id: set(range(1, 26)) for artist_id in artist_ids[:5]}
+    recent[6] = set(range(1, 31))  # everything sent: falls back to all beats
+
+    packs = selector.select_packs(artist_ids, recent)
+    assert set(packs) == set(artist_ids)
+    _check_packs(packs, artist_ids[:5] + artist_ids[6:], recent, 3, 5)
+    assert 3 <= len(packs[6]) <= 5
+    assert selector.select_packs(artist_ids, recent) == packs
+    assert selector.select_packs(artist_ids, recent, seed=7) != packs
+
+
+def test_select_packs_without_numpy(db_with_many_beats, monkeypatch):
+    """Without NumPy, batch selection falls back to seeded per-artist sampling."""
+    import services.beat_selection_service as selection
+    monkeypatch.setattr(selection, "np", None)
+    selector = BeatSelectionService(
+        db_with_many_beats, min_beats=2, max_beats=4, seed=1
+    )
+    artist_ids = [1, 2, 3]
+    recent = {1: set(range(1, 20))}
+    packs = selector.select_packs(artist_ids, recent)
+    _check_packs(packs, artist_ids, recent, 2, 4)
+    assert selector.select_packs(artist_ids, recent) == packs
+
+
+def test_balanced_mode_caps_and_spreads_exposure(db_with_many_beats):
+    """Balanced packs respect the per-beat cap and use every beat before reusing one."""
+    selector = BeatSelectionService(
+        db_with_many_beats, min_beats=3, max_beats=3, seed=5,
+        mode="balanced", max_artists_per_beat=2,
+    )
+    artist_ids = list(range(1, 21))
+    recent = {1: set(range(1, 11))}
+    packs = selector.select_packs(artist_ids, recent)
+
+    counts = {}
+    for artist_id, pack in packs.items():
+        assert len(set(pack)) == len(pack)
+        assert not set(pack) & recent.get(artist_id, set())
+        for beat_id in pack:
+            counts[beat_id] = counts.get(beat_id, 0) + 1
+    assert max(counts.values()) <= 2
+    # 30 beats x cap 2 = 60 slots for 20 artists x 3 beats: every beat used
+    # exactly twice
+    assert sum(counts.values()) == 60
+    assert selector.select_packs(artist_ids, recent) == packs
+
+
+def test_balanced_mode_prefers_least_exposed(db_with_many_beats):
+    """Beats sent to other artists in the window are picked last."""
+    artist_id = db_with_many_beats.add_artist("Other", "other@example.com")
+    for beat_id in range(1, 28):
+        db_with_many_beats.add_artist_beat_history(artist_id, beat_id)
+    selector = BeatSelectionService(
+        db_with_many_beats, min_beats=3, max_beats=3, seed=1, mode="balanced"
+    )
+    packs = selector.select_packs([100], {100: set()})
+    assert sorted(packs[100]) == [28, 29, 30]
+
+
+def test_unknown_selection_mode_rejected(temp_db):
+    """Unknown modes fail fast."""
+    with pytest.raises(ValueError):
+        BeatSelectionService(temp_db, mode="fair")
+
+
+def test_alias_table_matches_weights():
+    """Alias table draws follow the weights."""
+    import random
+    from services.beat_selection_service import AliasTable
+    table = AliasTable([1.0, 3.0, 0.0, 4.0])
+    rng = random.Random(3)
+    counts = [0, 0, 0, 0]
+    for _ in range(40000):
+        counts[table.draw(rng)] += 1
+    assert counts[2] == 0
+    assert abs(counts[0] / 40000 - 0.125) < 0.01
+    assert abs(counts[1] / 40000 - 0.375) < 0.015
+    assert abs(counts[3] / 40000 - 0.5) < 0.015
+
+
+def test_weighted_mode_favours_boosted_and_new_beats(db_with_many_beats):
+    """Boosted and recently uploaded beats weigh more and are picked more often."""
+    db_with_many_beats.set_beat_boosted("beat0.mp3")
+    selector = BeatSelectionService(
+        db_with_many_beats, min_beats=1, max_beats=1, seed=2, mode="weighted",
+        boost_factor=10.0,
+    )
+    boosted = db_with_many_beats.get_beat_by_filename("beat0.mp3")
+    unboosted = {"added_date": boosted["added_date"]}
+    assert selector.beat_weight(boosted) == pytest.approx(
+        10 * selector.beat_weight(unboosted)
+    )
+    old = {"created_time": "2000-01-01T00:00:00.000Z"}
+    new = {"created_time": "2999-01-01T00:00:00Z"}
+    assert selector.beat_weight(new) > selector.beat_weight(old) == pytest.approx(1.0)
+
+    artist_ids = list(range(1, 601))
+    recent = {1: {boosted["id"]}}
+    packs = selector.select_packs(artist_ids, recent)
+    assert boosted["id"] not in packs[1]
+    hits = sum(pack == [boosted["id"]] for pack in packs.values())
+    # 10 / (10 + 29) of draws on average, versus 1 / 30 without the boost
+    assert hits > 100
+    assert selector.select_packs(artist_ids, recent) == packs
+
+
+def test_weighted_mode_ignores_recent_edits_to_old_beats(temp_db):
+    """An old beat that was just renamed or edited gets no recency bonus."""
+    selector = BeatSelectionService(temp_db, mode="weighted")
+    renamed = {
+        "created_time": "2020-01-01T00:00:00.000Z",
+        "modified_time": "2999-01-01T00:00:00.000Z",
+        "added_date": "2999-01-01 00:00:00",
+    }
+    assert selector.beat_weight(renamed) == pytest.approx(1.0)
+
+
+def test_cohesive_mode_builds_matching_packs(temp_db):
+    """Cohesive packs stay within one style, compatible keys and the BPM tolerance."""
+    from services.pack_cohesion_service import camelot_code, compatible_codes
+    for i in range(40):
+        style = "trap" if i % 2 else "drill"
+        key = ["Amin", "Emin", "Cmaj", "F#min"][i % 4]
+        temp_db.add_beat(
+            f"b{i}.mp3", f"B{i}", bpm=130 + i % 10, key=key, style_category=style
+        )
+    selector = BeatSelectionService(
+        temp_db, min_beats=3, max_beats=3, seed=4, mode="cohesive", bpm_tolerance=4
+    )
+    beats = temp_db.get_beats_map()
+    packs = selector.select_packs(list(range(1, 31)), {})
+    for pack in packs.values():
+        assert len(pack) == 3
+        anchor = beats[pack[0]]
+        for beat_id in pack[1:]:
+            beat = beats[beat_id]
+            assert beat["style_category"] == anchor["style_category"]
+            anchor_code = camelot_code(anchor["key"])
+            assert camelot_code(beat["key"]) in compatible_codes(anchor_code)
+            assert abs(beat["bpm"] - anchor["bpm"]) <= 4
+    assert selector.select_packs(list(range(1, 31)), {}) == packs
@@ -189,3 +189,506 @@ class TestDatabaseService:
         finally:
             if os.path.exists(db_path):
                 os.unlink(db_path)
+
+
+def test_migrates_legacy_beats_table():
+    """Databases created before vault sync gain the new beats columns."""
+    import sqlite3
+    with tempfile.NamedTemporaryFile(suffix='.db', delete=False) as f:
+        db_path = f.name
+    try:
+        conn = sqlite3.connect(db_path)
+        conn.execute("""
+            CREATE TABLE beats (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                filename TEXT NOT NULL UNIQUE,
+                beat_name TEXT NOT NULL,
+                bpm INTEGER,
+                key TEXT,
+                style_category TEXT,
+                file_type TEXT NOT NULL,
+                file_size INTEGER,
+                added_date TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        conn.execute(
+            "INSERT INTO beats (filename, beat_name, file_type) "
+            "VALUES ('a.mp3', 'A', 'mp3')"
+        )
+        conn.commit()
+        conn.close()
+
+        with DatabaseService(db_path=db_path) as db:
+            beats = db.get_all_beats()
+            assert len(beats) == 1
+            assert beats[0]['is_active'] == 1
+            assert beats[0]['drive_file_id'] is None
+    finally:
+        os.unlink(db_path)
+
+
+def test_outbox_entry_lifecycle(temp_db):
+    """Outbox entries are idempotent per (artist, pack) and track sent parts."""
+    artist_id = temp_db.add_artist("Artist", "a@example.com")
+    entry = temp_db.add_outbox_entry(artist_id, 1, [1, 2, 3], [[1, 2], [3]])
+    again = temp_db.add_outbox_entry(artist_id, 1, [4, 5], [[4, 5]])
+    assert again["id"] == entry["id"]
+    assert again["beat_ids"] == [1, 2, 3]
+    assert entry["status"] == "planned"
+
+    temp_db.mark_outbox_composing(entry["id"])
+    temp_db.mark_outbox_part_sent(entry["id"], 1, "m1")
+    pending = temp_db.get_pending_outbox()
+    assert len(pending) == 1
+    assert pending[0]["status"] == "composing"
+    assert pending[0]["attempts"] == 1
+    assert pending[0]["sent_parts"] == {1: "m1"}
+    assert pending[0]["artist_email"] == "a@example.com"
+
+    temp_db.mark_outbox_sent(entry["id"])
+    assert temp_db.get_pending_outbox() == []
+
+
+def test_outbox_failed_entry_backs_off(temp_db):
+    """Failed entries stay pending but are not due until the backoff passes."""
+    artist_id = temp_db.add_artist("Artist", "a@example.com")
+    entry = temp_db.add_outbox_entry(artist_id, 1, [1], [[1]])
+    temp_db.mark_outbox_failed(entry["id"], "boom", 3600)
+    pending = temp_db.get_pending_outbox()
+    assert pending[0]["status"] == "failed"
+    assert pending[0]["due"] is False
+
+    temp_db.mark_outbox_failed(entry["id"], "boom", 0)
+    assert temp_db.get_pending_outbox()[0]["due"] is True
+
+
+def test_outbox_needs_review_is_held_until_resolved(temp_db):
+    """An entry with unknown sent state stays pending until settled by hand."""
+    artist_id = temp_db.add_artist("Artist", "a@example.com")
+    entry = temp_db.add_outbox_entry(artist_id, 1, [1, 2], [[1], [2]])
+    temp_db.mark_outbox_part_sent(entry["id"], 1, "m1")
+    temp_db.mark_outbox_needs_review(entry["id"], "403")
+    pending = temp_db.get_pending_outbox()
+    assert pending[0]["status"] == "needs_review"
+    again = temp_db.add_outbox_entry(artist_id, 1, [3], [[3]])
+    assert again["status"] == "needs_review"
+
+    assert temp_db.resolve_outbox_review(artist_id, 2, sent=True) is False
+    assert temp_db.resolve_outbox_review(artist_id, 1, sent=True) is True
+    resolved = temp_db.get_pending_outbox()[0]
+    assert resolved["status"] == "planned"
+    assert resolved["sent_parts"] == {1: "m1", 2: "manual"}
+    assert temp_db.resolve_outbox_review(artist_id, 1, sent=False) is False
+
+
+def test_upsert_artists_counts_and_revokes(temp_db):
+    """Bulk artist sync reports counts and deactivates artists no longer shared."""
+    temp_db.add_artist("Old Name", "a@example.com")
+    temp_db.add_artist("Same", "b@example.com")
+    temp_db.add_artist("Gone", "c@example.com")
+
+    counts = temp_db.upsert_artists([
+        {"name": "New Name", "email": "a@example.com"},
+        {"name": "Same", "email": "b@example.com"},
+        {"name": "Fresh", "email": "d@example.com"},
+    ])
+    assert counts == {"inserted": 1, "updated": 1, "unchanged": 1, "revoked": 1}
+    assert temp_db.get_artist_by_email("a@example.com")["name"] == "New Name"
+    emails = {a["email"] for a in temp_db.get_all_artists()}
+    assert emails == {"a@example.com", "b@example.com", "d@example.com"}
+    assert len(temp_db.get_all_artists(include_inactive=True)) == 4
+
+    # Access granted again: reactivated
+    counts = temp_db.upsert_artists(
+        [{"name": "Gone", "email": "c@example.com"}], revoke_missing=False
+    )
+    assert counts["updated"] == 1
+    assert temp_db.get_artist_by_email("c@example.com")["is_active"] == 1
+
+
+def test_upsert_beats_counts_and_adoption(temp_db):
+    """Bulk beat sync inserts, updates, adopts legacy rows and skips name clashes."""
+    temp_db.add_beat("legacy.mp3", "Legacy")
+    temp_db.add_beat("known.mp3", "Known", drive_file_id="f1", file_size=10)
+
+    beats = [
+        {"filename": "legacy.mp3", "beat_name": "Legacy", "drive_file_id": "f0"},
+        {"filename": "known.mp3", "beat_name": "Known", "drive_file_id": "f1",
+         "file_size": 10},
+        {"filename": "renamed.mp3", "beat_name": "Renamed", "drive_file_id": "f1",
+         "file_size": 10},
+        {"filename": "new.mp3", "beat_name": "New", "drive_file_id": "f2"},
+        {"filename": "new.mp3", "beat_name": "Duplicate", "drive_file_id": "f3"},
+    ]
+    counts = temp_db.upsert_beats(beats[:1] + beats[3:])
+    assert counts == {"inserted": 1, "updated": 1, "unchanged": 0, "skipped": 1}
+    assert temp_db.get_beat_by_filename("legacy.mp3")["drive_file_id"] == "f0"
+
+    assert temp_db.upsert_beats([beats[1]])["unchanged"] == 1
+    assert temp_db.upsert_beats([beats[2]])["updated"] == 1
+    assert temp_db.get_beat_by_drive_file_id("f1")["filename"] == "renamed.mp3"
+    assert len(temp_db.get_all_beats()) == 3
+
+
+def test_wal_mode_and_pragmas(temp_db):
+    """Connections run in WAL mode with relaxed sync, and readers are read-only."""
+    import sqlite3
+    writer = temp_db._get_connection()
+    assert writer.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert writer.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+    reader = temp_db._read()
+    assert reader is not writer
+    with pytest.raises(sqlite3.OperationalError):
+        reader.execute("DELETE FROM artists")
+
+
+def test_concurrent_writes_from_threads(temp_db):
+    """Worker threads can write and read through one service instance."""
+    import threading
+    artist_id = temp_db.add_artist("Artist", "a@example.com")
+    errors = []
+
+    def worker(n):
+        try:
+            for i in range(20):
+                beat_id = temp_db.add_beat(f"t{n}-{i}.mp3", f"Beat {n}-{i}")
+                temp_db.add_artist_beat_history(artist_id, beat_id)
+                temp_db.get_all_beats()
+        except Exception as e:  # pragma: no cover - surfaced by the assert below
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    assert len(temp_db.get_all_beats()) == 80
+    assert len(temp_db.get_recently_sent_beats(artist_id)) == 80
+
+
+def test_nested_write_rolls_back_as_one(temp_db):
+    """A failure inside a write block undoes the enclosing transaction."""
+    with pytest.raises(RuntimeError):
+        with temp_db._write():
+            temp_db.add_artist("Artist", "a@example.com")
+            raise RuntimeError("boom")
+    assert temp_db.get_artist_by_email("a@example.com") is None
+
+
+def test_record_pack_sent_writes_everything(temp_db):
+    """A sent pack records history, duplicate prevention, pack number and outbox."""
+    artist_id = temp_db.add_artist("Artist", "a@example.com")
+    b1 = temp_db.add_beat("one.mp3", "One")
+    b2 = temp_db.add_beat("two.mp3", "Two")
+    entry = temp_db.add_outbox_entry(artist_id, 1, [b1, b2], [[b1, b2]])
+
+    history_id = temp_db.record_pack_sent(artist_id, 1, [b1, b2], outbox_id=entry["id"])
+    assert history_id > 0
+    assert temp_db.get_email_history(artist_id)[0]["status"] == "sent"
+    assert set(temp_db.get_recently_sent_beats(artist_id)) == {b1, b2}
+    assert temp_db.get_artist_by_email("a@example.com")["last_pack_number"] == 1
+    assert temp_db.get_pending_outbox() == []
+
+
+def test_record_pack_sent_is_atomic(temp_db, monkeypatch):
+    """A failure part way through leaves no partial bookkeeping behind."""
+    artist_id = temp_db.add_artist("Artist", "a@example.com")
+    b1 = temp_db.add_beat("one.mp3", "One")
+
+    def fail(*args):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(temp_db, "update_artist_pack_number", fail)
+    with pytest.raises(RuntimeError):
+        temp_db.record_pack_sent(artist_id, 1, [b1])
+    assert temp_db.get_recently_sent_beats(artist_id) == []
+    assert temp_db.get_email_history(artist_id) == []
+    assert temp_db.get_artist_by_email("a@example.com")["last_pack_number"] == 0
+
+
+def test_group_commit_batches_packs(temp_db):
+    """Group commit buffers packs until the batch is full or the block ends."""
+    artist_ids = [temp_db.add_artist(f"A{n}", f"a{n}@example.com") for n in range(5)]
+    beat_id = temp_db.add_beat("one.mp3", "One")
+    with temp_db.group_commit(max_batch=3, max_delay=60) as group:
+        for artist_id in artist_ids:
+            group.record_pack_sent(artist_id, 1, [beat_id])
+        assert group.commits == 1
+        assert len(temp_db.get_email_history()) == 3
+    assert group.commits == 2
+    assert len(temp_db.get_email_history()) == 5
+
+
+def test_group_commit_flushes_after_max_delay(temp_db):
+    """A buffered pack is committed by the timer without a further record."""
+    import time
+    artist_id = temp_db.add_artist("Artist", "a@example.com")
+    beat_id = temp_db.add_beat("one.mp3", "One")
+    with temp_db.group_commit(max_batch=20, max_delay=0.05) as group:
+        group.record_pack_sent(artist_id, 1, [beat_id])
+        deadline = time.monotonic() + 5
+        while not group.commits and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert group.commits == 1
+        assert len(temp_db.get_email_history()) == 1
+
+
+def test_group_commit_writes_failures_immediately(temp_db):
+    """A failed pack is committed at once, with the sent packs buffered before it."""
+    artist_ids = [temp_db.add_artist(f"A{n}", f"a{n}@example.com") for n in range(2)]
+    beat_id = temp_db.add_beat("one.mp3", "One")
+    entry = temp_db.add_outbox_entry(artist_ids[1], 1, [beat_id], [[beat_id]])
+    temp_db.mark_outbox_composing(entry["id"])
+    with temp_db.group_commit(max_batch=20, max_delay=60) as group:
+        group.record_pack_sent(artist_ids[0], 1, [beat_id])
+        assert group.commits == 0
+        group.record_pack_sent(
+            artist_ids[1], 1, [beat_id], status="failed", error_message="boom",
+            outbox_id=entry["id"], retry_in_seconds=60,
+        )
+        assert group.commits == 1
+        assert len(temp_db.get_email_history()) == 2
+        assert temp_db.get_pending_outbox()[0]["status"] == "failed"
+
+
+def test_migrates_history_beats_to_pack_beats(monkeypatch):
+    """Legacy JSON beat lists move to pack_beats in batches; the column is dropped."""
+    import sqlite3
+    import services.database_service as database_service
+    monkeypatch.setattr(database_service, "PACK_BEATS_MIGRATION_BATCH", 2)
+    with tempfile.NamedTemporaryFile(suffix='.db', delete=False) as f:
+        db_path = f.name
+    try:
+        conn = sqlite3.connect(db_path)
+        conn.execute("""
+            CREATE TABLE email_history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                artist_id INTEGER NOT NULL,
+                timestamp TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                pack_number INTEGER NOT NULL,
+                beats_sent TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'sent',
+                error_message TEXT
+            )
+        """)
+        conn.executemany(
+            "INSERT INTO email_history (artist_id, timestamp, pack_number, beats_sent)"
+            " VALUES (1, ?, ?, ?)",
+            [
+                (f"2024-01-0{n} 00:00:00", n, f"[{n}, {n + 10}, {n + 20}]")
+                for n in range(1, 6)
+            ],
+        )
+        conn.commit()
+        conn.close()
+
+        with DatabaseService(db_path=db_path) as db:
+            db.add_artist("Artist", "a@example.com")
+            history = db.get_email_history()
+            assert [h['beats_sent'] for h in history] == [
+                [n, n + 10, n + 20] for n in range(5, 0, -1)
+            ]
+            columns = {
+                row[1]
+                for row in db._read().execute("PRAGMA table_info(email_history)")
+            }
+            assert 'beats_sent' not in columns
+            assert db.get_sync_state('pack_beats_migrated_id') is None
+    finally:
+        os.unlink(db_path)
+
+
+def test_pack_beat_queries(temp_db):
+    """Packs can be looked up by beat and beats counted across packs."""
+    artist_id = temp_db.add_artist("Artist", "a@example.com")
+    b1, b2, b3 = (temp_db.add_beat(f"{n}.mp3", str(n)) for n in range(3))
+    temp_db.add_email_history(artist_id, 1, [b2, b1])
+    temp_db.add_email_history(artist_id, 2, [b1, b3])
+    temp_db.add_email_history(artist_id, 3, [b1], status='failed', error_message='boom')
+
+    history = temp_db.get_email_history(limit=2)
+    assert [h['beats_sent'] for h in history] == [[b1], [b1, b3]]
+    assert [h['pack_number'] for h in temp_db.get_packs_with_beat(b1)] == [3, 2, 1]
+    assert temp_db.get_packs_with_beat(b2)[0]['artist_email'] == "a@example.com"
+    assert temp_db.get_beat_send_counts() == {b1: 2, b2: 1, b3: 1}
+
+
+def test_migrates_text_timestamps_to_epoch():
+    """Legacy UTC and local-time text timestamps become epoch seconds."""
+    import sqlite3
+    import time
+    from datetime import datetime, timezone
+    with tempfile.NamedTemporaryFile(suffix='.db', delete=False) as f:
+        db_path = f.name
+    local = datetime(2024, 3, 1, 12, 0, 0)
+    try:
+        conn = sqlite3.connect(db_path)
+        conn.execute("""
+            CREATE TABLE email_history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                artist_id INTEGER NOT NULL,
+                timestamp TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                pack_number INTEGER NOT NULL,
+                status TEXT NOT NULL DEFAULT 'sent',
+                error_message TEXT
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE artist_beat_history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                artist_id INTEGER NOT NULL,
+                beat_id INTEGER NOT NULL,
+                sent_date TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE(artist_id, beat_id, sent_date)
+            )
+        """)
+        conn.execute(
+            "INSERT INTO email_history (artist_id, timestamp, pack_number)"
+            " VALUES (1, '2024-03-01 12:00:00', 1)"
+        )
+        conn.execute(
+            "INSERT INTO artist_beat_history (artist_id, beat_id, sent_date)"
+            " VALUES (1, 1, '2024-03-01 12:00:00')"
+        )
+        conn.execute(
+            "INSERT INTO artist_beat_history (artist_id, beat_id, sent_date)"
+            " VALUES (1, 2, ?)",
+            (local.isoformat(),),
+        )
+        conn.commit()
+        conn.close()
+
+        with DatabaseService(db_path=db_path) as db:
+            utc = datetime(2024, 3, 1, 12, 0, 0, tzinfo=timezone.utc)
+            utc_epoch = int(utc.timestamp())
+            assert db.get_last_send_date(1) == "2024-03-01T12:00:00+00:00"
+            rows = dict(db._read().execute(
+                "SELECT beat_id, sent_at FROM artist_beat_history"
+            ).fetchall())
+            assert rows == {1: utc_epoch, 2: int(time.mktime(local.timetuple()))}
+    finally:
+        os.unlink(db_path)
+
+
+def test_migrates_outbox_text_timestamps_to_epoch():
+    """Legacy outbox rows keep their entries, with time columns as epoch seconds."""
+    import sqlite3
+    from datetime import datetime, timezone
+    with tempfile.NamedTemporaryFile(suffix='.db', delete=False) as f:
+        db_path = f.name
+    try:
+        conn = sqlite3.connect(db_path)
+        conn.execute("""
+            CREATE TABLE outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                idempotency_key TEXT NOT NULL UNIQUE,
+                artist_id INTEGER NOT NULL,
+                pack_number INTEGER NOT NULL,
+                beat_ids TEXT NOT NULL,
+                parts TEXT NOT NULL,
+                linked TEXT NOT NULL,
+                sent_parts TEXT NOT NULL DEFAULT '{}',
+                status TEXT NOT NULL DEFAULT 'planned',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                error_message TEXT,
+                next_attempt_at TEXT,
+                created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                updated_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        conn.execute("""
+            INSERT INTO outbox (idempotency_key, artist_id, pack_number, beat_ids,
+                                parts, linked, status, next_attempt_at, created_at)
+            VALUES ('1:1', 1, 1, '[1]', '[[1]]', '[]', 'failed',
+                    '2024-03-01 13:00:00', '2024-03-01 12:00:00')
+        """)
+        conn.commit()
+        conn.close()
+
+        with DatabaseService(db_path=db_path) as db:
+            db.add_artist("Artist", "a@example.com")
+            entry = db.get_outbox_entry(1, 1)
+            created = int(
+                datetime(2024, 3, 1, 12, 0, 0, tzinfo=timezone.utc).timestamp()
+            )
+            assert entry["created_at"] == created
+            assert entry["next_attempt_at"] == created + 3600
+            assert db.get_pending_outbox()[0]["due"] is True
+    finally:
+        os.unlink(db_path)
+
+
+def test_recent_beats_window_uses_index(temp_db):
+    """The recent-beats window is an index range scan and excludes older sends."""
+    import time
+    artist_id = temp_db.add_artist("Artist", "a@example.com")
+    old = temp_db.add_beat("old.mp3", "Old")
+    new = temp_db.add_beat("new.mp3", "New")
+    forty_days_ago = int(time.time()) - 40 * 86400
+    temp_db.add_artist_beat_history(artist_id, old, sent_at=forty_days_ago)
+    temp_db.add_artist_beat_history(artist_id, new)
+    assert temp_db.get_recently_sent_beats(artist_id, days=30) == [new]
+
+    plan = " ".join(row[3] for row in temp_db._read().execute("""
+        EXPLAIN QUERY PLAN SELECT DISTINCT beat_id FROM artist_beat_history
+        WHERE artist_id = ? AND sent_at >= ?
+    """, (artist_id, 0)))
+    assert "INDEX" in plan
+    assert "artist_id=? AND sent_at>?" in plan
+
+
+def test_beat_exposure_window_uses_index(temp_db):
+    """The exposure window across all artists is a range scan on sent_at."""
+    import time
+    a1 = temp_db.add_artist("One", "one@example.com")
+    a2 = temp_db.add_artist("Two", "two@example.com")
+    beat = temp_db.add_beat("one.mp3", "One")
+    old = temp_db.add_beat("old.mp3", "Old")
+    temp_db.add_artist_beat_history(a1, beat)
+    temp_db.add_artist_beat_history(a2, beat)
+    temp_db.add_artist_beat_history(a1, old, sent_at=int(time.time()) - 40 * 86400)
+    assert temp_db.get_beat_exposure(days=30) == {beat: 2}
+
+    plan = " ".join(row[3] for row in temp_db._read().execute("""
+        EXPLAIN QUERY PLAN SELECT beat_id, COUNT(DISTINCT artist_id)
+        FROM artist_beat_history WHERE sent_at >= ? GROUP BY beat_id
+    """, (0,)))
+    assert "COVERING INDEX idx_artist_beat_history_sent (sent_at>?)" in plan
+
+
+def test_batch_read_apis(temp_db):
+    """Artists, recent beats and beats are loaded for many artists at once."""
+    import time
+    a1 = temp_db.add_artist("One", "one@example.com")
+    a2 = temp_db.add_artist("Two", "two@example.com")
+    b1 = temp_db.add_beat("one.mp3", "One")
+    b2 = temp_db.add_beat("two.mp3", "Two")
+    temp_db.add_artist_beat_history(a1, b1)
+    temp_db.add_artist_beat_history(a1, b2, sent_at=int(time.time()) - 40 * 86400)
+
+    artists = temp_db.get_artists_by_emails(
+        ["one@example.com", "two@example.com", "nobody@example.com"]
+    )
+    assert {email: a["id"] for email, a in artists.items()} == {
+        "one@example.com": a1, "two@example.com": a2
+    }
+    recent = temp_db.get_recently_sent_beats_for_all([a1, a2], days=30)
+    assert recent == {a1: {b1}, a2: set()}
+
+    beats = temp_db.get_beats_map()
+    assert set(beats) == {b1, b2}
+    assert temp_db.get_beats_map() is beats
+    temp_db.deactivate_untracked_beats()
+    refreshed = temp_db.get_beats_map()
+    assert refreshed is not beats
+    assert refreshed[b1]["is_active"] == 0
+
+
+def test_rejects_sqlite_older_than_minimum(monkeypatch, tmp_path):
+    """Startup fails clearly on an SQLite without multi-clause upserts."""
+    import sqlite3
+    monkeypatch.setattr(sqlite3, "sqlite_version_info", (3, 31, 1))
+    monkeypatch.setattr(sqlite3, "sqlite_version", "3.31.1")
+    with pytest.raises(RuntimeError, match="SQLite 3.35.0"):
+        DatabaseService(db_path=str(tmp_path / "test.db"))
@@ -20,3 +20,32 @@ def test_generate_body_replaces_placeholders():
     assert "tundra, hope" in body
     assert "{artist_name}" not in body
     assert "{beat_list}" not in body
+
+
+def test_generate_body_with_links_replaces_beat_list():
+    """In link delivery mode each beat is listed with its Drive URL."""
+    tpl = EmailTemplateService(template_path="templates/email_template.txt")
+    body = tpl.generate_body(
+        "Artist One",
+        ["tundra", "hope"],
+        [
+            ("tundra", "https://drive.google.com/file/d/f1/view"),
+            ("hope", "https://drive.google.com/file/d/f2/view"),
+        ],
+    )
+    assert "- tundra: https://drive.google.com/file/d/f1/view" in body
+    assert "- hope: https://drive.google.com/file/d/f2/view" in body
+    assert "{beat_list}" not in body
+
+
+def test_generate_body_lists_attached_beats_by_name():
+    """In a split pack only the oversized beat gets a link; the rest are named."""
+    tpl = EmailTemplateService(template_path="templates/email_template.txt")
+    body = tpl.generate_body(
+        "Artist One",
+        ["tundra", "hope", "huge"],
+        [("huge", "https://drive.google.com/file/d/f3/view")],
+    )
+    assert "tundra, hope\n- huge: https://drive.google.com/file/d/f3/view" in body
+    assert "tundra:" not in body
+    assert "hope:" not in body
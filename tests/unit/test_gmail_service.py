@@ -0,0 +1,85 @@
+"""Unit tests for Gmail service."""
+import pytest
+from unittest.mock import Mock, patch
+from googleapiclient.http import MediaIoBaseUpload
+from services.gmail_service import GmailService
+
+
+@patch("services.gmail_service.build_service")
+def test_send_email_uses_media_upload(mock_build):
+    """Messages are uploaded as message/rfc822 media, not as a raw field."""
+    service = Mock()
+    messages = service.users.return_value.messages.return_value
+    messages.send.return_value.execute.return_value = {"id": "m1"}
+    mock_build.return_value = service
+
+    gmail = GmailService()
+    attachments = [{"filename": "b.mp3", "content": b"x" * 10}]
+    sent_id = gmail.send_email("a@example.com", "Subject", "Body", attachments)
+
+    assert sent_id == "m1"
+    kwargs = service.users.return_value.messages.return_value.send.call_args.kwargs
+    assert "body" not in kwargs
+    assert isinstance(kwargs["media_body"], MediaIoBaseUpload)
+    assert kwargs["media_body"].mimetype() == "message/rfc822"
+    assert kwargs["media_body"].resumable() is False
+
+
+@patch("services.gmail_service.build_service")
+def test_quota_errors_are_retried_with_backoff(mock_build):
+    """429 responses trigger a limiter backoff and a retry of the same message."""
+    from googleapiclient.errors import HttpError
+
+    resp = Mock(status=429, reason="Too Many Requests")
+    send = Mock()
+    send.return_value.execute.side_effect = [
+        HttpError(resp, b"rateLimitExceeded"), {"id": "m2"},
+    ]
+    service = Mock()
+    service.users.return_value.messages.return_value.send = send
+    mock_build.return_value = service
+
+    limiter = Mock()
+    gmail = GmailService(limiter=limiter)
+    assert gmail.send_email("a@example.com", "S", "B") == "m2"
+    assert limiter.acquire.call_count == 2
+    limiter.on_quota_error.assert_called_once()
+    limiter.on_success.assert_called_once()
+
+
+@patch("services.gmail_service.build_service")
+def test_message_id_header_and_lookup(mock_build):
+    """A caller-supplied Message-ID is written and can be searched for later."""
+    uploaded = {}
+
+    def send(userId, media_body):
+        uploaded["data"] = media_body.getbytes(0, media_body.size())
+        return Mock(execute=Mock(return_value={"id": "m3"}))
+
+    service = Mock()
+    messages = service.users.return_value.messages.return_value
+    messages.send.side_effect = send
+    messages.list.return_value.execute.return_value = {"messages": [{"id": "m3"}]}
+    mock_build.return_value = service
+
+    gmail = GmailService()
+    assert gmail.send_email("a@example.com", "S", "B", message_id="<pack-1@x>") == "m3"
+    assert b"Message-ID: <pack-1@x>\r\n" in uploaded["data"]
+    assert gmail.find_sent_message("<pack-1@x>") == "m3"
+    assert messages.list.call_args.kwargs["q"] == "rfc822msgid:<pack-1@x>"
+
+
+@patch("services.gmail_service.build_service")
+def test_lookup_errors_are_raised(mock_build):
+    """A failed lookup (e.g. 403 with only gmail.send) is not reported as unsent."""
+    from googleapiclient.errors import HttpError
+
+    service = Mock()
+    messages = service.users.return_value.messages.return_value
+    messages.list.return_value.execute.side_effect = HttpError(
+        Mock(status=403, reason="Forbidden"), b"insufficientPermissions"
+    )
+    mock_build.return_value = service
+
+    with pytest.raises(HttpError):
+        GmailService().find_sent_message("<pack-1@x>")
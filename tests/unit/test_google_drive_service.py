@@ -6,14 +6,6 @@ from unittest.mock import Mock, patch, MagicMock
 from services.google_drive_service import GoogleDriveService
 
 
-@pytest.fixture
-def mock_credentials():
-    """Mock Google credentials."""
-    creds = Mock()
-    creds.valid = True
-    return creds
-
-
 @pytest.fixture
 def mock_drive_service():
     """Mock Google Drive service."""
@@ -64,11 +56,9 @@ def mock_drive_service():
     return service
 
 
-@patch('services.google_drive_service.get_credentials')
-@patch('services.google_drive_service.build')
-def test_get_folder_permissions(mock_build, mock_get_creds, mock_credentials, mock_drive_service):
+@patch('services.google_drive_service.build_service')
+def test_get_folder_permissions(mock_build, mock_drive_service):
     """Test getting folder permissions (artists)."""
-    mock_get_creds.return_value = mock_credentials
     mock_build.return_value = mock_drive_service
 
     service = GoogleDriveService(vault_folder_id='test_folder_id')
@@ -81,11 +71,9 @@ def test_get_folder_permissions(mock_build, mock_get_creds, mock_credentials, mo
     assert artists[1]['name'] == 'Artist Two'
 
 
-@patch('services.google_drive_service.get_credentials')
-@patch('services.google_drive_service.build')
-def test_list_beat_files(mock_build, mock_get_creds, mock_credentials, mock_drive_service):
+@patch('services.google_drive_service.build_service')
+def test_list_beat_files(mock_build, mock_drive_service):
     """Test listing beat files."""
-    mock_get_creds.return_value = mock_credentials
     mock_build.return_value = mock_drive_service
 
     service = GoogleDriveService(vault_folder_id='test_folder_id')
@@ -97,11 +85,9 @@ def test_list_beat_files(mock_build, mock_get_creds, mock_credentials, mock_driv
     assert beats[1]['name'] == 'beat2.mp3'
 
 
-@patch('services.google_drive_service.get_credentials')
-@patch('services.google_drive_service.build')
-def test_verify_folder_access(mock_build, mock_get_creds, mock_credentials, mock_drive_service):
+@patch('services.google_drive_service.build_service')
+def test_verify_folder_access(mock_build, mock_drive_service):
     """Test verifying folder access."""
-    mock_get_creds.return_value = mock_credentials
     mock_build.return_value = mock_drive_service
 
     # Mock folder get
@@ -116,3 +102,108 @@ def test_verify_folder_access(mock_build, mock_get_creds, mock_credentials, mock
     result = service.verify_folder_access()
 
     assert result is True
+
+
+@patch('services.google_drive_service.build_service')
+def test_download_file_uses_cache(mock_build, mock_drive_service, tmp_path):
+    """Cached files are returned without hitting the Drive API."""
+    from services.beat_cache_service import BeatFileCache
+    mock_build.return_value = mock_drive_service
+
+    cache = BeatFileCache(cache_dir=str(tmp_path))
+    cache.put('file1', 'md5-a', b'cached bytes')
+    service = GoogleDriveService(vault_folder_id='test_folder_id', cache=cache)
+
+    assert service.download_file('file1', version='md5-a') == b'cached bytes'
+    mock_drive_service.files.return_value.get_media.assert_not_called()
+
+
+class _FakeDownloader:
+    """Writes two chunks into the target file handle like MediaIoBaseDownload."""
+
+    def __init__(self, fh, request):
+        self.fh = fh
+        self.chunks = [b'abc', b'def']
+
+    def next_chunk(self):
+        self.fh.write(self.chunks.pop(0))
+        return None, not self.chunks
+
+
+@patch('services.google_drive_service.MediaIoBaseDownload', _FakeDownloader)
+@patch('services.google_drive_service.build_service')
+def test_download_stream_returns_readonly_buffer(
+    mock_build, mock_drive_service, tmp_path
+):
+    """Streamed downloads land in the cache and come back as a read-only mapping."""
+    from services.beat_cache_service import BeatFileCache
+    mock_build.return_value = mock_drive_service
+
+    cache = BeatFileCache(cache_dir=str(tmp_path))
+    service = GoogleDriveService(vault_folder_id='test_folder_id', cache=cache)
+    buffer = service.download_stream('file1', version='v1')
+
+    assert bytes(buffer) == b'abcdef'
+    with pytest.raises(TypeError):
+        buffer[0] = 0
+    assert cache.get('file1', 'v1') == b'abcdef'
+    assert [p for p in tmp_path.iterdir() if p.name.startswith('.tmp-')] == []
+
+
+@patch('services.google_drive_service.MediaIoBaseDownload', _FakeDownloader)
+@patch('services.google_drive_service.build_service')
+def test_download_stream_larger_than_cache(mock_build, mock_drive_service, tmp_path):
+    """A file over the cache cap is served from its temp file and not cached."""
+    from services.beat_cache_service import BeatFileCache
+    mock_build.return_value = mock_drive_service
+
+    cache = BeatFileCache(cache_dir=str(tmp_path), max_size_bytes=4)
+    service = GoogleDriveService(vault_folder_id='test_folder_id', cache=cache)
+
+    assert bytes(service.download_stream('file1', version='v1')) == b'abcdef'
+    assert cache.get('file1', 'v1') is None
+    assert list(tmp_path.iterdir()) == []
+
+
+@patch('services.google_drive_service.MediaIoBaseDownload', _FakeDownloader)
+@patch('services.google_drive_service.build_service')
+def test_mapped_temp_file_removed_after_store_clear(
+    mock_build, mock_drive_service, tmp_path
+):
+    """A temp file that cannot be deleted while mapped is removed on clear()."""
+    from services.beat_cache_service import AttachmentStore, BeatFileCache
+    mock_build.return_value = mock_drive_service
+
+    cache = BeatFileCache(cache_dir=str(tmp_path), max_size_bytes=4)
+    service = GoogleDriveService(vault_folder_id='test_folder_id', cache=cache)
+    store = AttachmentStore(service, streaming=True)
+    # Deleting a mapped file fails on Windows
+    with patch('services.google_drive_service.os.unlink', side_effect=PermissionError):
+        buffer = store.get('file1', version='v1')
+    assert bytes(buffer) == b'abcdef'
+    assert len(list(tmp_path.glob('.tmp-*.part'))) == 1
+
+    store.clear()
+    assert buffer.closed
+    assert list(tmp_path.iterdir()) == []
+
+
+@patch('services.google_drive_service.build_service')
+def test_grant_read_access_creates_silent_reader_permission(
+    mock_build, mock_drive_service
+):
+    """Link delivery can share a beat without Drive sending its own email."""
+    mock_build.return_value = mock_drive_service
+    create = mock_drive_service.permissions.return_value.create
+    create.return_value.execute.return_value = {'id': 'p1'}
+
+    service = GoogleDriveService(vault_folder_id='test_folder_id')
+    assert service.grant_read_access('file1', 'artist@example.com') is True
+
+    kwargs = create.call_args.kwargs
+    assert kwargs['body'] == {
+        'type': 'user', 'role': 'reader', 'emailAddress': 'artist@example.com',
+    }
+    assert kwargs['sendNotificationEmail'] is False
+    link = service.get_file_link('file1')
+    assert link == 'https://drive.google.com/file/d/file1/view'
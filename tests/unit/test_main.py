@@ -0,0 +1,98 @@
+"""Unit tests for send-beats helpers in main."""
+import threading
+from unittest.mock import Mock
+from googleapiclient.errors import HttpError
+from main import _pack_message_id, _recover_sent_parts, _release_dropped_packs
+from services.database_service import DatabaseService
+from services.send_executor_service import SendExecutor
+
+
+def _entry():
+    return {
+        "id": 7, "artist_id": 1, "pack_number": 3, "created_at": 0, "sent_parts": {},
+    }
+
+
+def test_recover_records_parts_found_in_gmail():
+    """Parts found by Message-ID are recorded as sent."""
+    gmail, db = Mock(), Mock()
+    gmail.find_sent_message.side_effect = ["m1", None]
+    entry = _entry()
+
+    assert _recover_sent_parts(gmail, db, entry, [1, 2]) is True
+    db.mark_outbox_part_sent.assert_called_once_with(7, 1, "m1")
+    assert entry["sent_parts"] == {1: "m1"}
+
+
+def test_recover_holds_pack_when_lookup_fails():
+    """A 403 on lookup holds the pack for review and nothing is sent again."""
+    gmail, db = Mock(), Mock()
+    gmail.find_sent_message.side_effect = HttpError(
+        Mock(status=403, reason="Forbidden"), b"insufficientPermissions"
+    )
+
+    assert _recover_sent_parts(gmail, db, _entry(), [1, 2]) is False
+    db.mark_outbox_needs_review.assert_called_once()
+    db.mark_outbox_part_sent.assert_not_called()
+    gmail.send_email.assert_not_called()
+    gmail.send_file.assert_not_called()
+
+
+def test_message_id_matches_legacy_text_timestamp():
+    """Epoch created_at yields the same Message-ID as the former text timestamp."""
+    entry = {"id": 7, "artist_id": 1, "pack_number": 3, "created_at": 1709294400}
+    expected = "<pack-1-3-2.7.20240301120000@contact-automation>"
+    assert _pack_message_id(entry, 2) == expected
+
+
+class _BlockingGmail:
+    """Holds the first send until released, so later jobs stay queued."""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def send_email(self, to, subject, body, attachments=None, message_id=None):
+        self.started.set()
+        self.release.wait(5)
+        return f"id-{to}"
+
+
+def test_abort_returns_unsent_packs_to_queue(tmp_path):
+    """Packs whose sends were all dropped on abort go back to 'planned'."""
+    db = DatabaseService(db_path=str(tmp_path / "test.db"))
+    try:
+        plan = []
+        for n in range(1, 4):
+            artist_id = db.add_artist(f"Artist {n}", f"a{n}@example.com")
+            parts = [[1], [2]] if n == 1 else [[n]]
+            entry = db.add_outbox_entry(artist_id, 1, [1, 2, 3], parts)
+            db.mark_outbox_composing(entry["id"])
+            plan.append({"outbox": entry, "email": f"a{n}@example.com"})
+
+        gmail = _BlockingGmail()
+        sender = SendExecutor(gmail, workers=1, max_pending=4)
+        sender.submit((0, 1), plan[0]["email"], "S", "B")
+        assert gmail.started.wait(5)
+        sender.submit((0, 2), plan[0]["email"], "S", "B")
+        sender.submit((1, 1), plan[1]["email"], "S", "B")
+        sender.submit((2, 1), plan[2]["email"], "S", "B")
+        threading.Timer(0.1, gmail.release.set).start()
+
+        dropped = sender.shutdown(cancel_pending=True)
+        assert sorted(dropped) == [(0, 2), (1, 1), (2, 1)]
+        for result in sender.completed():
+            i, n = result["job_id"]
+            db.mark_outbox_part_sent(plan[i]["outbox"]["id"], n, result["message_id"])
+
+        assert _release_dropped_packs(db, plan, dropped) == 2
+        pending = {e["id"]: e for e in db.get_pending_outbox()}
+        first, second, third = (pending[item["outbox"]["id"]] for item in plan)
+        # Part 1 went out, so the pack is still recovered by Message-ID on resume
+        assert first["status"] == "composing"
+        assert first["sent_parts"] == {1: "id-a1@example.com"}
+        for entry in (second, third):
+            assert entry["status"] == "planned"
+            assert entry["attempts"] == 0
+    finally:
+        db.close()
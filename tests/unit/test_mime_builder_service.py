@@ -0,0 +1,84 @@
+"""Unit tests for the streaming MIME builder."""
+import base64
+import email
+import io
+import mmap
+from email import policy
+from services.mime_builder_service import StreamingMessageWriter, iter_base64_lines
+
+
+def _parse(fh):
+    return email.message_from_binary_file(fh, policy=policy.default)
+
+
+def test_spooled_message_round_trips():
+    """Body and attachments decode back to the original content."""
+    payload = bytes(range(256)) * 1000
+    writer = StreamingMessageWriter()
+    fh, size = writer.spool(
+        "artist@example.com",
+        "Exclusive Beat pack #1",
+        "Hey Artist",
+        [{"filename": "beat.mp3", "content": payload},
+         {"filename": "Beat_Usage_Agreement.txt", "content": b"terms"}],
+    )
+    raw = fh.read()
+    assert len(raw) == size
+
+    msg = _parse(io.BytesIO(raw))
+    assert msg["to"] == "artist@example.com"
+    assert msg["subject"] == "Exclusive Beat pack #1"
+    parts = list(msg.iter_parts())
+    assert parts[0].get_content().strip() == "Hey Artist"
+    assert parts[1].get_filename() == "beat.mp3"
+    assert parts[1].get_content() == payload
+    assert parts[2].get_content() == b"terms"
+
+
+def test_non_ascii_headers_are_encoded():
+    """Subjects and filenames outside ASCII are RFC 2047/2231 encoded."""
+    fh, _ = StreamingMessageWriter().spool(
+        "a@example.com", "Pack für dich", "Hi",
+        [{"filename": "naïve.mp3", "content": b"x"}],
+    )
+    msg = _parse(fh)
+    assert msg["subject"] == "Pack für dich"
+    assert list(msg.iter_parts())[1].get_filename() == "naïve.mp3"
+
+
+def test_base64_lines_accept_mmap(tmp_path):
+    """Memory-mapped attachments are encoded without converting to bytes first."""
+    path = tmp_path / "beat.bin"
+    path.write_bytes(b"a" * 1000)
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    encoded = b"".join(iter_base64_lines(mapped, chunk_size=57 * 2))
+    lines = encoded.split(b"\r\n")
+    assert all(len(line) <= 76 for line in lines)
+    assert base64.b64decode(encoded) == b"a" * 1000
+
+
+def test_part_cache_encodes_each_attachment_once():
+    """Shared attachments are encoded once and spliced into later messages."""
+    from services.mime_builder_service import EncodedPartCache
+    cache = EncodedPartCache()
+    writer = StreamingMessageWriter(part_cache=cache)
+    beat = b"beat" * 5000
+    for to in ("a@example.com", "b@example.com", "c@example.com"):
+        attachments = [{"filename": "beat.mp3", "content": beat, "key": "file1:v1"}]
+        fh, _ = writer.spool(to, "Pack", "Hi", attachments)
+        msg = _parse(fh)
+        assert msg["to"] == to
+        assert list(msg.iter_parts())[1].get_content() == beat
+    assert cache.misses == 1
+    assert cache.hits == 2
+
+
+def test_part_cache_falls_back_to_content_hash():
+    """Without a key, identical contents still share one encoded part."""
+    from services.mime_builder_service import EncodedPartCache
+    cache = EncodedPartCache()
+    first = cache.get_or_encode("terms.txt", b"terms")
+    second = cache.get_or_encode("terms.txt", bytearray(b"terms"))
+    assert first is second
+    assert cache.get_or_encode("terms.txt", b"other") is not first
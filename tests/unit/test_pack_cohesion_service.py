@@ -0,0 +1,61 @@
+"""Unit tests for pack cohesion service."""
+import random
+import pytest
+from services.pack_cohesion_service import CohesionIndex, camelot_code, compatible_codes
+
+
+@pytest.mark.parametrize("key,code", [
+    ("Cmin", "5A"), ("Amin", "8A"), ("Am", "8A"), ("Cmaj", "8B"), ("C", "8B"),
+    ("F#min", "11A"), ("Bbm", "3A"), ("Abmin", "1A"), ("Bmaj", "1B"), ("Emaj", "12B"),
+    ("Dbmajor", "3B"), ("gmin", "6A"),
+])
+def test_camelot_code(key, code):
+    """Keys as written in filenames map onto the Camelot wheel."""
+    assert camelot_code(key) == code
+
+
+def test_camelot_code_rejects_unknown():
+    """Unparseable keys have no code."""
+    assert camelot_code("H#min") is None
+    assert camelot_code("") is None
+    assert camelot_code(None) is None
+
+
+def test_compatible_codes_wrap_around():
+    """Neighbours wrap from 12 to 1 and include the relative key."""
+    assert compatible_codes("12A") == ["12A", "1A", "11A", "12B"]
+    assert compatible_codes("1B") == ["1B", "2B", "12B", "1A"]
+
+
+def _beat(beat_id, bpm, key, style):
+    return {"id": beat_id, "bpm": bpm, "key": key, "style_category": style}
+
+
+def test_build_pack_prefers_matching_beats():
+    """Packs are filled with same-style, key-compatible beats within BPM tolerance."""
+    beats = [
+        _beat(1, 140, "Amin", "trap"),
+        _beat(2, 143, "Emin", "trap"),   # 9A: neighbour
+        _beat(3, 138, "Cmaj", "trap"),   # 8B: relative major
+        _beat(4, 141, "Amin", "drill"),  # other style
+        _beat(5, 160, "Amin", "trap"),   # too fast
+        _beat(6, 140, "F#min", "trap"),  # 11A: not compatible
+    ]
+    index = CohesionIndex(beats, bpm_tolerance=5)
+    pack = index.build_pack(3, {4, 5, 6}, random.Random(0))
+    assert sorted(pack) == [1, 2, 3]
+
+    # Anchored on beat 1 with the rest of its style excluded: the other style comes next
+    pack = index.build_pack(2, {2, 3, 5, 6}, random.Random(0))
+    assert sorted(pack) == [1, 4]
+
+
+def test_build_pack_falls_back_to_catalog():
+    """Beats without metadata still fill packs; exclusions always hold."""
+    beats = [{"id": n} for n in range(1, 11)]
+    index = CohesionIndex(beats)
+    pack = index.build_pack(4, {1, 2}, random.Random(1))
+    assert len(pack) == 4
+    assert len(set(pack)) == 4
+    assert not {1, 2} & set(pack)
+    assert index.build_pack(4, set(range(1, 11)), random.Random(1)) == []
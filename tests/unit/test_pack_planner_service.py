@@ -0,0 +1,89 @@
+"""Unit tests for pack planner service."""
+import pytest
+from services.mime_builder_service import iter_base64_lines
+from services.pack_planner_service import PackPlanner, encoded_size
+
+MB = 1024 * 1024
+
+
+def beat(beat_id, size_mb):
+    return {
+        "id": beat_id, "filename": f"beat{beat_id}.mp3", "file_size": int(size_mb * MB),
+    }
+
+
+def test_encoded_size_matches_mime_encoding():
+    """Prediction equals the bytes the MIME writer actually emits."""
+    for n in (0, 1, 56, 57, 58, 1000, 123457):
+        data = b"x" * n
+        assert encoded_size(n) == len(b"".join(iter_base64_lines(data)))
+
+
+def test_pack_under_limit_is_one_message():
+    """Packs that fit are sent unchanged."""
+    planner = PackPlanner(max_message_bytes=25 * MB)
+    beats = [beat(1, 4), beat(2, 4), beat(3, 4)]
+    result = planner.plan(beats)
+    assert result["delivery"] == "attachments"
+    assert result["messages"] == [beats]
+    assert result["linked"] == []
+
+
+def test_split_oversized_pack():
+    """Split strategy spreads beats over messages that each fit."""
+    planner = PackPlanner(max_message_bytes=25 * MB, strategy="split")
+    beats = [beat(i, 8) for i in range(1, 5)]
+    result = planner.plan(beats)
+    assert len(result["messages"]) == 2
+    assert sorted(b["id"] for part in result["messages"] for b in part) == [1, 2, 3, 4]
+    for part in result["messages"]:
+        assert planner.fits(part)
+
+
+def test_split_links_beats_too_large_for_any_message():
+    """A single beat over the limit is delivered as a link."""
+    planner = PackPlanner(max_message_bytes=25 * MB, strategy="split")
+    result = planner.plan([beat(1, 30), beat(2, 3)])
+    assert [b["id"] for b in result["linked"]] == [1]
+    assert [[b["id"] for b in part] for part in result["messages"]] == [[2]]
+
+
+def test_repick_swaps_largest_for_smaller():
+    """Repick strategy keeps the pack size but replaces large beats."""
+    planner = PackPlanner(max_message_bytes=25 * MB, strategy="repick")
+    beats = [beat(1, 12), beat(2, 4), beat(3, 4)]
+    alternatives = [beat(4, 2), beat(5, 20)]
+    result = planner.plan(beats, alternatives=alternatives)
+    assert sorted(b["id"] for b in result["beats"]) == [2, 3, 4]
+    assert len(result["messages"]) == 1
+    assert planner.fits(result["beats"])
+
+
+def test_repick_falls_back_to_split():
+    """Without small enough alternatives the pack is split instead."""
+    planner = PackPlanner(max_message_bytes=25 * MB, strategy="repick")
+    beats = [beat(1, 12), beat(2, 12)]
+    result = planner.plan(beats, alternatives=[beat(3, 15)])
+    assert result["beats"] == beats
+    assert len(result["messages"]) == 2
+
+
+def test_links_strategy():
+    """Links strategy switches the whole pack to Drive links."""
+    planner = PackPlanner(max_message_bytes=25 * MB, strategy="links")
+    beats = [beat(1, 20), beat(2, 20)]
+    result = planner.plan(beats)
+    assert result["delivery"] == "links"
+    assert result["linked"] == beats
+
+
+def test_unknown_size_is_assumed():
+    """Beats without a stored size count as unknown_size."""
+    planner = PackPlanner(max_message_bytes=25 * MB, unknown_size=10 * MB)
+    beats = [{"id": i, "filename": f"b{i}.mp3", "file_size": None} for i in range(3)]
+    assert not planner.fits(beats)
+
+
+def test_invalid_strategy_rejected():
+    with pytest.raises(ValueError):
+        PackPlanner(strategy="shrink")
@@ -0,0 +1,76 @@
+"""Unit tests for beat prefetch service."""
+import threading
+import time
+from services.prefetch_service import BeatPrefetcher
+
+
+def test_get_returns_fetched_content():
+    """get() returns what the fetch function produced."""
+    prefetcher = BeatPrefetcher(lambda fid, ver: f"{fid}:{ver}".encode())
+    try:
+        assert prefetcher.get("file1", "v1") == b"file1:v1"
+    finally:
+        prefetcher.shutdown()
+
+
+def test_prefetch_deduplicates_pending_downloads():
+    """A file already in flight is not downloaded twice."""
+    calls = []
+    release = threading.Event()
+
+    def fetch(fid, ver):
+        calls.append(fid)
+        release.wait(2)
+        return b"data"
+
+    prefetcher = BeatPrefetcher(fetch, max_workers=2)
+    try:
+        first = prefetcher.prefetch("file1")
+        second = prefetcher.prefetch("file1")
+        assert first is second
+        release.set()
+        assert first.result(2) == b"data"
+        assert calls == ["file1"]
+    finally:
+        prefetcher.shutdown()
+
+
+def test_inflight_byte_cap_limits_concurrency():
+    """Downloads wait when the in-flight byte budget is used up."""
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def fetch(fid, ver):
+        with lock:
+            active.append(fid)
+            peak.append(len(active))
+        time.sleep(0.05)
+        with lock:
+            active.remove(fid)
+        return b"x"
+
+    prefetcher = BeatPrefetcher(fetch, max_workers=4, max_inflight_bytes=100)
+    try:
+        futures = [prefetcher.prefetch(f"f{i}", size=60) for i in range(4)]
+        for f in futures:
+            f.result(2)
+        assert max(peak) == 1
+    finally:
+        prefetcher.shutdown()
+
+
+def test_cancel_pending_download():
+    """Queued downloads can be cancelled before they start."""
+    release = threading.Event()
+    prefetcher = BeatPrefetcher(
+        lambda fid, ver: release.wait(2) and b"x", max_workers=1
+    )
+    try:
+        prefetcher.prefetch("busy")
+        queued = prefetcher.prefetch("queued")
+        assert prefetcher.cancel("queued") is True
+        assert queued.cancelled()
+    finally:
+        release.set()
+        prefetcher.shutdown()
@@ -0,0 +1,80 @@
+"""Unit tests for the token-bucket rate limiter."""
+import pytest
+from services.rate_limiter_service import TokenBucketRateLimiter
+
+
+class FakeClock:
+    """Deterministic clock whose sleep advances time."""
+
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+        self.slept = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+def _limiter(clock, **kwargs):
+    return TokenBucketRateLimiter(clock=clock.time, sleep=clock.sleep, **kwargs)
+
+
+def test_burst_goes_out_without_sleeping():
+    """Up to `burst` sends are allowed back to back."""
+    clock = FakeClock()
+    limiter = _limiter(clock, rate_per_second=0.5, burst=3)
+    for _ in range(3):
+        limiter.acquire()
+    assert clock.slept == []
+
+
+def test_sustained_rate_after_burst():
+    """Once the bucket is empty, sends are paced at the sustained rate."""
+    clock = FakeClock()
+    limiter = _limiter(clock, rate_per_second=0.5, burst=1)
+    limiter.acquire()
+    limiter.acquire()
+    assert sum(clock.slept) == pytest.approx(2.0)
+
+
+def test_time_spent_sending_counts_toward_the_delay():
+    """A slow send earns tokens, so no extra sleep is added afterwards."""
+    clock = FakeClock()
+    limiter = _limiter(clock, rate_per_second=0.5, burst=1)
+    limiter.acquire()
+    clock.now += 5  # upload took longer than the pacing interval
+    limiter.acquire()
+    assert clock.slept == []
+
+
+def test_quota_error_backs_off_exponentially():
+    """Each quota error roughly doubles the backoff until a success resets it."""
+    clock = FakeClock()
+    limiter = _limiter(
+        clock, rate_per_second=100, burst=5, backoff_base=2.0, max_backoff=60
+    )
+    first = limiter.on_quota_error()
+    second = limiter.on_quota_error()
+    assert 1.0 <= first <= 2.0
+    assert 2.0 <= second <= 4.0
+
+    limiter.acquire()
+    assert sum(clock.slept) == pytest.approx(second)
+    limiter.on_success()
+    assert limiter.backoff_level == 0
+
+
+def test_state_is_shared_across_runs(tmp_path):
+    """A second run starts with the tokens the first run left behind."""
+    state = tmp_path / "rate.json"
+    clock = FakeClock()
+    first = _limiter(clock, rate_per_second=0.1, burst=2, state_path=str(state))
+    first.acquire()
+    first.acquire()
+
+    second = _limiter(clock, rate_per_second=0.1, burst=2, state_path=str(state))
+    second.acquire()
+    assert sum(clock.slept) == pytest.approx(10.0)
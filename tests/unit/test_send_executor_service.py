@@ -0,0 +1,87 @@
+"""Unit tests for the concurrent send executor."""
+import threading
+import time
+from services.send_executor_service import SendExecutor
+
+
+class FakeGmail:
+    """Records concurrency and fails for one address."""
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def send_email(self, to, subject, body, attachments=None, message_id=None):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(self.delay)
+        with self.lock:
+            self.active -= 1
+        if to == "bad@example.com":
+            return None
+        return f"id-{to}"
+
+    def send_file(self, path, to):
+        return f"file-{path}"
+
+
+def test_results_are_reported_for_every_job():
+    """Each submitted message yields exactly one result with its job id."""
+    gmail = FakeGmail(delay=0)
+    sender = SendExecutor(gmail, workers=2)
+    try:
+        for i, to in enumerate(["a@example.com", "bad@example.com", "c@example.com"]):
+            sender.submit(i, to, "S", "B")
+        results = {r["job_id"]: r for r in sender.drain()}
+    finally:
+        sender.shutdown()
+
+    assert set(results) == {0, 1, 2}
+    assert results[0]["message_id"] == "id-a@example.com"
+    assert results[1]["message_id"] is None
+    assert results[1]["error"] == "Send failed"
+
+
+def test_sends_overlap_up_to_worker_count():
+    """Uploads run in parallel, bounded by the number of workers."""
+    gmail = FakeGmail(delay=0.05)
+    sender = SendExecutor(gmail, workers=3)
+    try:
+        for i in range(6):
+            sender.submit(i, f"{i}@example.com", "S", "B")
+        list(sender.drain())
+    finally:
+        sender.shutdown()
+    assert 1 < gmail.peak <= 3
+
+
+def test_spooled_files_are_sent_with_send_file():
+    """Jobs queued with submit_file go through send_file."""
+    sender = SendExecutor(FakeGmail(delay=0), workers=1)
+    try:
+        sender.submit_file("job", "a@example.com", "spool/1-1.eml")
+        results = list(sender.drain())
+    finally:
+        sender.shutdown()
+    assert results == [
+        {"job_id": "job", "message_id": "file-spool/1-1.eml", "error": None}
+    ]
+
+
+def test_cancelled_shutdown_drops_queued_jobs():
+    """On abort, jobs not yet started are dropped and finished ones are reported."""
+    gmail = FakeGmail(delay=0.05)
+    sender = SendExecutor(gmail, workers=1, max_pending=10)
+    for i in range(5):
+        sender.submit(i, f"{i}@example.com", "S", "B")
+    time.sleep(0.01)
+    dropped = sender.shutdown(cancel_pending=True)
+    results = list(sender.completed())
+
+    assert dropped
+    assert len(results) + len(dropped) == 5
+    assert {r["job_id"] for r in results}.isdisjoint(dropped)
+    assert all(r["message_id"] for r in results)
@@ -0,0 +1,44 @@
+"""Unit tests for message spool service."""
+import email
+from email import policy
+from services.spool_service import MessageSpool
+
+
+def test_write_and_list_records(tmp_path):
+    """Composed messages are complete RFC 822 files listed in the manifest."""
+    spool = MessageSpool(str(tmp_path))
+    record = spool.write(7, 1, "a@example.com", "Pack", "Hello",
+                         [{"filename": "b.mp3", "content": b"x" * 100}],
+                         message_id="<p-7-1@x>")
+
+    assert spool.has(7, 1)
+    assert spool.records() == {(7, 1): record}
+    raw = spool.path_for(7, 1).read_bytes()
+    msg = email.message_from_bytes(raw, policy=policy.default)
+    assert msg["Message-ID"] == "<p-7-1@x>"
+    assert [p.get_filename() for p in msg.iter_attachments()] == ["b.mp3"]
+    assert record["size"] == spool.path_for(7, 1).stat().st_size
+
+
+def test_removed_messages_drop_out_and_compact(tmp_path):
+    """Sent messages disappear from records and compaction rewrites the manifest."""
+    spool = MessageSpool(str(tmp_path))
+    spool.write(1, 1, "a@example.com", "S", "B")
+    spool.write(1, 2, "a@example.com", "S", "B")
+    spool.write(2, 1, "b@example.com", "S", "B")
+
+    spool.remove(1, 1)
+    assert set(spool.records()) == {(1, 2), (2, 1)}
+    spool.discard_entry(1)
+    assert spool.compact() == 1
+    lines = spool.manifest_path.read_text().splitlines()
+    assert len(lines) == 1
+
+
+def test_torn_manifest_line_is_ignored(tmp_path):
+    """A partial line from a crash mid-append does not break reading."""
+    spool = MessageSpool(str(tmp_path))
+    spool.write(1, 1, "a@example.com", "S", "B")
+    with open(spool.manifest_path, "a") as f:
+        f.write('{"outbox_id": 2, "par')
+    assert set(spool.records()) == {(1, 1)}
@@ -0,0 +1,147 @@
+"""Unit tests for vault sync service, using a local fake of the Drive changes feed."""
+import pytest
+import tempfile
+import os
+from services.database_service import DatabaseService
+from services.vault_sync_service import VaultSyncService
+
+VAULT = "vault_folder"
+
+
+class FakeChangesFeed:
+    """In-memory stand-in for GoogleDriveService's listing and changes API."""
+
+    def __init__(self, vault_folder_id=VAULT):
+        self.vault_folder_id = vault_folder_id
+        self.files = {}
+        self.log = []  # list of change records; the page token is an index into it
+        self.list_calls = 0
+
+    def _record(self, file_id, removed=False):
+        f = self.files.get(file_id)
+        self.log.append(
+            {"fileId": file_id, "removed": removed, "file": dict(f) if f else None}
+        )
+
+    def add(self, file_id, name, modified="2025-01-01T00:00:00Z", size="1000"):
+        self.files[file_id] = {
+            "id": file_id, "name": name, "size": size, "mimeType": "audio/mpeg",
+            "modifiedTime": modified, "createdTime": "2025-01-01T00:00:00Z",
+            "parents": [self.vault_folder_id], "trashed": False,
+        }
+        self._record(file_id)
+
+    def rename(self, file_id, name):
+        self.files[file_id]["name"] = name
+        self.files[file_id]["modifiedTime"] = "2025-06-01T00:00:00Z"
+        self._record(file_id)
+
+    def trash(self, file_id):
+        self.files[file_id]["trashed"] = True
+        self._record(file_id)
+
+    def delete(self, file_id):
+        del self.files[file_id]
+        self._record(file_id, removed=True)
+
+    def get_start_page_token(self):
+        return str(len(self.log))
+
+    def list_beat_files(self):
+        self.list_calls += 1
+        return [dict(f) for f in self.files.values() if not f["trashed"]]
+
+    def list_changes(self, page_token):
+        return self.log[int(page_token):], str(len(self.log))
+
+
+@pytest.fixture
+def temp_db():
+    """Create a temporary database for testing."""
+    with tempfile.NamedTemporaryFile(suffix=".db", delete=False) as f:
+        db_path = f.name
+    db = DatabaseService(db_path=db_path)
+    yield db
+    db.close()
+    if os.path.exists(db_path):
+        os.unlink(db_path)
+
+
+def test_first_sync_is_full_scan(temp_db):
+    """With no stored page token the whole vault is listed."""
+    feed = FakeChangesFeed()
+    feed.add("f1", "@zobi - tundra - 136 - Cmin - travis.mp3")
+    feed.add("f2", "bad name.mp3")
+
+    counts = VaultSyncService(feed, temp_db).sync()
+
+    assert counts["full_scan"] == 1
+    assert counts["added"] == 1
+    assert len(temp_db.get_all_beats()) == 1
+    assert len(temp_db.get_vault_files()) == 2
+
+
+def test_incremental_sync_only_processes_changes(temp_db):
+    """Later syncs read the changes feed, not the full listing."""
+    feed = FakeChangesFeed()
+    feed.add("f1", "@zobi - tundra - 136 - Cmin - travis.mp3")
+    sync = VaultSyncService(feed, temp_db)
+    sync.sync()
+
+    feed.add("f2", "@zobi - hope - 140 - Amin - drake.mp3")
+    counts = sync.sync()
+
+    assert feed.list_calls == 1
+    assert counts["full_scan"] == 0
+    assert counts["added"] == 1
+    assert {b["beat_name"] for b in temp_db.get_all_beats()} == {"tundra", "hope"}
+
+
+def test_rename_keeps_beat_id(temp_db):
+    """A renamed file updates the existing beat instead of orphaning it."""
+    feed = FakeChangesFeed()
+    feed.add("f1", "@zobi - tundra - 136 - Cmin - travis.mp3")
+    sync = VaultSyncService(feed, temp_db)
+    sync.sync()
+    beat_id = temp_db.get_beat_by_drive_file_id("f1")["id"]
+
+    feed.rename("f1", "@zobi - tundra v2 - 138 - Cmin - travis.mp3")
+    counts = sync.sync()
+
+    beat = temp_db.get_beat_by_drive_file_id("f1")
+    assert counts["updated"] == 1
+    assert beat["id"] == beat_id
+    assert beat["beat_name"] == "tundra v2"
+    assert beat["bpm"] == 138
+    assert beat["created_time"] == "2025-01-01T00:00:00Z"
+
+
+def test_trash_and_delete_deactivate_beats(temp_db):
+    """Trashed or deleted files stop being selectable but keep their rows."""
+    feed = FakeChangesFeed()
+    feed.add("f1", "@zobi - tundra - 136 - Cmin - travis.mp3")
+    feed.add("f2", "@zobi - hope - 140 - Amin - drake.mp3")
+    sync = VaultSyncService(feed, temp_db)
+    sync.sync()
+
+    feed.trash("f1")
+    feed.delete("f2")
+    counts = sync.sync()
+
+    assert counts["removed"] == 2
+    assert temp_db.get_all_beats() == []
+    assert len(temp_db.get_all_beats(include_inactive=True)) == 2
+    assert temp_db.get_vault_files() == []
+
+
+def test_legacy_beat_rows_are_adopted_by_filename(temp_db):
+    """Beats added before drive_file_id was tracked are linked, not duplicated."""
+    name = "@zobi - tundra - 136 - Cmin - travis.mp3"
+    legacy_id = temp_db.add_beat(name, "tundra", file_type="mp3")
+    feed = FakeChangesFeed()
+    feed.add("f1", name)
+
+    VaultSyncService(feed, temp_db).sync()
+
+    assert temp_db.get_beat_by_drive_file_id("f1")["id"] == legacy_id
+    assert len(temp_db.get_all_beats()) == 1